@@ -9,7 +9,9 @@ from flask_wtf.csrf import CSRFProtect
 from time import time
 import os
 
-db = SQLAlchemy()
+from app.db_routing import RoutingSession, replica_router
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 csrf = CSRFProtect()
@@ -26,9 +28,28 @@ except ImportError as e:
     telegram_bot = None
 # ====================================
 
+def tag_connections(engine, base_name):
+    """Подписывает соединения PostgreSQL как application_name '<имя>:<pid воркера>'.
+
+    pid берётся в момент подключения, поэтому после fork gunicorn каждый
+    воркер виден в pg_stat_activity отдельно.
+    """
+    if engine.dialect.name != 'postgresql':
+        return
+
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'do_connect')
+    def set_application_name(dialect, conn_rec, cargs, cparams):
+        cparams['application_name'] = f"{base_name}:{os.getpid()}"
+
 def create_app():
     app = Flask(__name__)
     app.config.from_object('config.Config')
+
+    # jsonify / get_json через orjson (если установлен)
+    from app import json_provider
+    json_provider.init_app(app)
     
     # Инициализация расширений
     db.init_app(app)
@@ -36,12 +57,41 @@ def create_app():
     login_manager.init_app(app)
     csrf.init_app(app)
     # mail.init_app(app) # Отключено, используем smtplib в app/email.py
-    
+
+    with app.app_context():
+        for engine in db.engines.values():
+            tag_connections(engine, app.config.get('DB_APPLICATION_NAME', 'flask_inventory'))
+    replica_router.init_app(app, db)
+
+    # Серверные сессии (SESSION_BACKEND) и id капчи для форм
+    from app import session_store
+    from app.captcha import captcha_id
+    session_store.init_app(app, db)
+    app.jinja_env.globals['captcha_id'] = captcha_id
+
+    # Счётчики товаров по категориям обновляются при flush сессии
+    from app.category_counts import register_listeners
+    register_listeners(RoutingSession)
+
+    # Кеш HTML карточек товаров; версия карточки - Product.updated_at
+    from app.fragment_cache import fragment_cache, register_listeners as register_version_listeners
+    fragment_cache.init_app(app)
+    register_version_listeners(RoutingSession)
+
+    # Загрузка текущего пользователя с кешем в процессе и его сброс после коммита
+    from app.user_cache import user_cache, register_listeners as register_user_listeners
+    user_cache.init_app(app)
+    register_user_listeners(RoutingSession)
+
+    # Кеш страниц для гостей (PAGE_CACHE_ENABLED) и сброс его тегов после коммита
+    from app.page_cache import page_cache, register_listeners as register_page_listeners
+    page_cache.init_app(app)
+    register_page_listeners(RoutingSession)
+
     # =========== ДОБАВЬТЕ ЭТО ===========
     # Инициализируем Telegram ботаtemplate_folder='templates',
     if telegram_bot:
         telegram_bot.init_app(app)
-        print(f"[OK] Telegram бот инициализирован: токен={'установлен' if app.config.get('TELEGRAM_BOT_TOKEN') else 'не указан'}, chat_id={app.config.get('TELEGRAM_CHAT_ID')}")
     else:
         print("[WARN] Telegram бот не загружен")
     # ====================================
@@ -67,44 +117,33 @@ def create_app():
     app.jinja_env.filters['format_price'] = format_price
     app.jinja_env.filters['format_product_price'] = format_product_price
 
-    
-    @login_manager.user_loader
-    def load_user(user_id):
-        from app.models import User
-        return db.session.get(User, int(user_id))
 
     # Импортируем Region для Flask-Admin
     from app.models import Region
     
-    # Создаем папку для загрузок
-    try:
-        upload_folder = app.config.get('UPLOAD_FOLDER')
-        if upload_folder:
-            os.makedirs(upload_folder, exist_ok=True)
-            print(f"[OK] Папка загрузок: {upload_folder}")
-            
-            # Проверяем доступность папки
-            test_file = os.path.join(upload_folder, 'test.txt')
-            with open(test_file, 'w') as f:
-                f.write('test')
-            os.remove(test_file)
-            print("[OK] Папка загрузок доступна для записи")
-    except Exception as e:
-        print(f"[ERROR] Ошибка папки загрузок: {e}")
-    
     # Регистрация blueprint
     # Импорт Blueprint'ов
     from app.blueprints.main import main
     from app.blueprints.api import api_bp
+    from app.blueprints.api_v1 import api_v1
     from app.auth import auth as auth_blueprint
     from app.admin import admin_bp
 
     app.register_blueprint(main)
     app.register_blueprint(api_bp)
+    app.register_blueprint(api_v1)
     app.register_blueprint(auth_blueprint)
     app.register_blueprint(admin_bp)
 
+    # Фиды для агрегаторов: файлы в FEED_DIR, пересборка раз в FEED_INTERVAL
+    from app.blueprints.feeds import feeds_bp
+    from app.feeds import feed_scheduler
+    feed_scheduler.init_app(app)
+    app.register_blueprint(feeds_bp)
+
     from app.blueprints.monitoring import monitoring_bp
+    from app.infra_sampler import infra_sampler
+    infra_sampler.init_app(app)
     app.register_blueprint(monitoring_bp)
 
     from flask_admin import Admin
@@ -142,25 +181,17 @@ def create_app():
         print(f"[ERROR-HANDLER] {e}")
         return render_template('500.html'), 500
 
-    # Регистрация хуков запуска и остановки
-    import atexit
-    
-    def on_exit():
-        if telegram_bot:
-            telegram_bot.send_shutdown_notification()
-            print("[INFO] System stop notification sent.")
+    # Однократная подготовка БД и папок - команда `flask bootstrap`,
+    # уведомления о запуске/остановке - хуки gunicorn.conf.py
+    from app.cli import register_commands
+    register_commands(app)
+
+    # asset_url() для шаблонов и отдача собранной статики (до прогрева шаблонов)
+    from app.assets import assets
+    assets.init_app(app)
+
+    # Кеш байткода шаблонов и прогрев - после всех фильтров и blueprint'ов
+    from app import templating
+    templating.init_app(app)
 
-    atexit.register(on_exit)
-    
-    # Уведомление о запуске (только для основного процесса, не релоадера)
-    if telegram_bot and not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
-         try:
-             telegram_bot.send_startup_notification()
-         except:
-             print("[WARN] Could not send startup notification")
-
-    print("=" * 50)
-    print("[SUCCESS] Приложение инициализировано успешно!")
-    print("=" * 50)
-    
     return app
\ No newline at end of file
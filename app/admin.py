@@ -1,10 +1,19 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app
+from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, abort
 from flask_login import login_required, current_user
 from app import db
+from app.db_routing import read_replica
 from app.models import Product, Category, User, Region, City
 import json
 from app.utils import save_uploaded_files, process_category_image
+from app.location_import import import_locations, linked_products_count
+from app.location_backfill import backfill_product_locations
+from app.jobs import start_job
+from app.category_stats import load_category_stats, delete_empty_categories
+from app.category_counts import delete_products
+from app.image_cleanup import schedule_image_cleanup
+from sqlalchemy.orm import selectinload
 import os
+import tempfile
 
 admin_bp = Blueprint('admin_bp', __name__, url_prefix='/admin')
 
@@ -152,16 +161,7 @@ def admin_categories():
                     flash('Категория не найдена', 'error')
         
         elif action == 'clear_empty':
-            categories = Category.query.all()
-            deleted_count = 0
-            for cat in categories:
-                products_count = Product.query.filter_by(category_id=cat.id).count()
-                children_count = Category.query.filter_by(parent_id=cat.id).count()
-                
-                if products_count == 0 and children_count == 0:
-                    db.session.delete(cat)
-                    deleted_count += 1
-            
+            deleted_count = delete_empty_categories()
             if deleted_count > 0:
                 db.session.commit()
                 flash(f'Удалено {deleted_count} пустых категорий', 'success')
@@ -180,32 +180,27 @@ def admin_categories():
             region.name = cleaned_name
         db.session.commit()
     
-    # Загружаем категории для списка выбора (плоский список с отступами)
-    # Используем helper из utils
-    from app.utils import get_category_choices
-    category_choices = get_category_choices()
-    
-    # Загружаем корневые категории для дерева (сортировка по алфавиту)
-    parent_categories = Category.query.filter_by(parent_id=None).order_by(Category.name).all()
-    
-    # Для совместимости передаем 'categories' как category_choices, чтобы работал селект
-    # Но для дерева используем parent_categories и рекурсивную подгрузку в шаблоне
-    
-    total_products = Product.query.count()
+    # Дерево категорий со счётчиками товаров - один запрос
+    stats = load_category_stats()
     
-    # Загружаем регионы
-    all_regions = Region.query.all()
-    regions = Region.query.filter_by(parent_id=None).all()
-    child_regions = Region.query.filter(Region.parent_id.isnot(None)).all()
+    # Загружаем регионы одним проходом; подрегионы и города - пакетно
+    all_regions = Region.query.options(
+        selectinload(Region.children), selectinload(Region.cities)
+    ).order_by(Region.name).all()
+    regions = [region for region in all_regions if region.parent_id is None]
+    child_regions = [region for region in all_regions if region.parent_id is not None]
 
     return render_template(
             'admin_categories.html',
-            categories=category_choices,  # Плоский список для select
-            parent_categories=parent_categories, # Корневые для дерева
-            total_products=total_products,
+            categories=stats.choices(),  # Плоский список для select
+            category_stats=stats,
+            parent_categories=stats.roots, # Корневые для дерева
+            categories_with_images=stats.with_images,
+            total_products=stats.total_products,
             all_regions=all_regions,      
             regions=regions,              
-            child_regions=child_regions   
+            child_regions=child_regions,
+            cities_count=sum(len(region.cities) for region in all_regions)
     )
 
 # === РЕГИОНЫ ===
@@ -296,19 +291,48 @@ def admin_users():
         return redirect(url_for('main.index'))
     
     search = request.args.get('search', '').strip()
-    query = User.query
-    
-    if search:
-        query = query.filter(
-            User.username.ilike(f'%{search}%') |
-            User.email.ilike(f'%{search}%') |
-            User.company_name.ilike(f'%{search}%') |
-            User.contact_person.ilike(f'%{search}%')
-        )
-    
-    users = query.order_by(User.created_at.desc()).all()
+    users = User.query.filter(*_user_search_criteria(search)).order_by(User.created_at.desc()).all()
     return render_template('admin_users.html', users=users, search=search)
 
+def _user_search_criteria(search):
+    """Условия поиска пользователей (имя, email, организация, контактное лицо)"""
+    if not search:
+        return []
+    return [
+        User.username.ilike(f'%{search}%') |
+        User.email.ilike(f'%{search}%') |
+        User.company_name.ilike(f'%{search}%') |
+        User.contact_person.ilike(f'%{search}%')
+    ]
+
+@admin_bp.route('/export/<kind>.<file_format>')
+@login_required
+@read_replica
+def export_table(kind, file_format):
+    """Потоковая выгрузка: products, users (с ?search=), contact-requests; ?gzip=1"""
+    if not current_user.is_admin:
+        flash('Недостаточно прав', 'error')
+        return redirect(url_for('main.index'))
+
+    from app.exports import export_response, product_export, user_export, contact_request_export
+    if kind == 'products':
+        columns, stmt = product_export(with_seller=True)
+        back = 'admin_bp.admin_categories'
+    elif kind == 'users':
+        columns, stmt = user_export(_user_search_criteria(request.args.get('search', '').strip()))
+        back = 'admin_bp.admin_users'
+    elif kind == 'contact-requests':
+        columns, stmt = contact_request_export()
+        back = 'admin_bp.admin_contact_requests'
+    else:
+        abort(404)
+    try:
+        return export_response(columns, stmt, kind.replace('-', '_'), file_format,
+                               gzip=request.args.get('gzip') == '1')
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for(back))
+
 @admin_bp.route('/users/<int:user_id>/impersonate')
 @login_required
 def impersonate_user(user_id):
@@ -349,9 +373,10 @@ def delete_user(user_id):
     
     user = User.query.get_or_404(user_id)
     # Удаляем связанные товары
-    Product.query.filter_by(user_id=user_id).delete()
+    deleted = delete_products(Product.user_id == user_id)
     db.session.delete(user)
     db.session.commit()
+    schedule_image_cleanup([row.images for row in deleted], user_id=current_user.id)
     flash('Пользователь удалён', 'success')
     return redirect(url_for('admin_bp.admin_users'))
 
@@ -426,120 +451,34 @@ def upload_locations():
         return redirect(url_for('admin_bp.admin_categories'))
     file_type = request.form.get('file_type', 'json')
     clear_existing = request.form.get('clear_existing') == 'on'
+
+    # Сохраняем загрузку во временный файл: его читает потоковый парсер,
+    # в том числе из фонового потока после завершения запроса
+    fd, path = tempfile.mkstemp(prefix='locations_', suffix=f'.{file_type}')
+    with os.fdopen(fd, 'wb') as tmp:
+        file.save(tmp)
+    size = os.path.getsize(path)
+
     try:
+        # Быстрый отказ до запуска импорта; окончательная проверка - внутри
+        # import_locations, в одной транзакции с удалением
         if clear_existing:
-            products_count = Product.query.filter(
-                (Product.region_id.isnot(None)) | (Product.city_id.isnot(None))
-            ).count()
+            products_count = linked_products_count()
             if products_count > 0:
+                os.remove(path)
                 flash(f'Нельзя удалить существующие данные - {products_count} товаров связаны с ними', 'error')
                 return redirect(url_for('admin_bp.admin_categories'))
-            City.query.delete()
-            Region.query.delete()
-            db.session.flush()
-        added_regions = 0
-        added_cities = 0
-        region_cache = {}
-        if file_type == 'csv':
-            import csv
-            import io
-            content = file.read().decode('utf-8')
-            for delimiter in [';', ',', '\t']:
-                try:
-                    csv_reader = csv.reader(io.StringIO(content), delimiter=delimiter)
-                    rows = list(csv_reader)
-                    if len(rows) > 0 and len(rows[0]) >= 2:
-                        break
-                except:
-                    continue
-            if rows and ('регион' in rows[0][0].lower() or 'region' in rows[0][0].lower()):
-                rows = rows[1:]
-            for row in rows:
-                if len(row) >= 2:
-                    region_name = row[0].strip()
-                    city_name = row[1].strip()
-                    if not region_name or not city_name:
-                        continue
-                    if region_name not in region_cache:
-                        region = Region.query.filter_by(name=region_name, parent_id=None).first()
-                        if not region:
-                            region = Region(name=region_name)
-                            db.session.add(region)
-                            db.session.flush()
-                            added_regions += 1
-                        region_cache[region_name] = region
-                    else:
-                        region = region_cache[region_name]
-                    existing_city = City.query.filter_by(
-                        name=city_name, 
-                        region_id=region.id
-                    ).first()
-                    if not existing_city:
-                        city = City(name=city_name, region_id=region.id)
-                        db.session.add(city)
-                        added_cities += 1
-        elif file_type == 'json':
-            import json
-            content = file.read().decode('utf-8')
-            data = json.loads(content)
-            if isinstance(data, dict) and 'regions' in data:
-                for region_data in data['regions']:
-                    region_name = region_data.get('name', '').strip()
-                    cities_list = region_data.get('cities', [])
-                    if not region_name:
-                        continue
-                    if region_name not in region_cache:
-                        region = Region.query.filter_by(name=region_name, parent_id=None).first()
-                        if not region:
-                            region = Region(name=region_name)
-                            db.session.add(region)
-                            db.session.flush()
-                            added_regions += 1
-                        region_cache[region_name] = region
-                    else:
-                        region = region_cache[region_name]
-                    for city_name in cities_list:
-                        if isinstance(city_name, str) and city_name.strip():
-                            city_name_clean = city_name.strip()
-                            existing_city = City.query.filter_by(
-                                name=city_name_clean, 
-                                region_id=region.id
-                            ).first()
-                            if not existing_city:
-                                city = City(name=city_name_clean, region_id=region.id)
-                                db.session.add(city)
-                                added_cities += 1
-            elif isinstance(data, list):
-                for item in data:
-                    if isinstance(item, dict):
-                        region_name = item.get('region', '').strip()
-                        city_name = item.get('city', '').strip()
-                        if not region_name or not city_name:
-                            continue
-                        if region_name not in region_cache:
-                            region = Region.query.filter_by(name=region_name, parent_id=None).first()
-                            if not region:
-                                region = Region(name=region_name)
-                                db.session.add(region)
-                                db.session.flush()
-                                added_regions += 1
-                            region_cache[region_name] = region
-                        else:
-                            region = region_cache[region_name]
-                        existing_city = City.query.filter_by(
-                            name=city_name, 
-                            region_id=region.id
-                        ).first()
-                        if not existing_city:
-                            city = City(name=city_name, region_id=region.id)
-                            db.session.add(city)
-                            added_cities += 1
-            else:
-                flash('❌ Неподдерживаемый формат JSON файла', 'error')
-                return redirect(url_for('admin_bp.admin_categories'))
-        db.session.commit()
-        if added_regions > 0 or added_cities > 0:
-            flash(f'✅ Успешно добавлено {added_regions} регионов и {added_cities} городов', 'success')
+
+        # Старые локации удаляет сам импорт - в одной транзакции с загрузкой новых
+        if size > current_app.config.get('LOCATION_IMPORT_BACKGROUND_BYTES', 256 * 1024):
+            job_id = start_job('import_locations', _import_locations_job, path, file_type, clear_existing,
+                               user_id=current_user.id)
+            flash('⏳ Файл большой - импорт запущен в фоне, прогресс отображается ниже', 'info')
+            return redirect(url_for('admin_bp.admin_categories', job_id=job_id))
+
+        result = _import_locations_job(None, path, file_type, clear_existing)
+        if result['regions'] > 0 or result['cities'] > 0:
+            flash(f'✅ Успешно добавлено {result["regions"]} регионов и {result["cities"]} городов', 'success')
         else:
             flash('⚠️ Новых регионов и городов не обнаружено', 'info')
     except json.JSONDecodeError as e:
@@ -552,6 +491,25 @@ def upload_locations():
         print(f"Ошибка загрузки локаций: {str(e)}")
     return redirect(url_for('admin_bp.admin_categories'))
 
+def _import_locations_job(progress, path, file_type, replace=False):
+    """Импорт локаций из временного файла (синхронно или как фоновая задача)"""
+    try:
+        return import_locations(progress, path, file_type, replace=replace)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+@admin_bp.route('/backfill-locations', methods=['POST'])
+@login_required
+def backfill_locations():
+    """Фоновая привязка старых товаров к справочнику регионов и городов"""
+    if not current_user.is_admin:
+        flash('Недостаточно прав', 'error')
+        return redirect(url_for('admin_bp.admin_categories'))
+    job_id = start_job('backfill_locations', backfill_product_locations, user_id=current_user.id)
+    flash('⏳ Привязка товаров к регионам и городам запущена в фоне', 'info')
+    return redirect(url_for('admin_bp.admin_categories', job_id=job_id))
+
 @admin_bp.route('/cities/add', methods=['POST'])
 @login_required
 def add_city():
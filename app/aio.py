@@ -0,0 +1,188 @@
+"""Асинхронный режим (ASGI) для эндпоинтов, ждущих внешние сервисы.
+
+``AsgiDispatcher`` оборачивает Flask-приложение: ``async def``-представления
+выполняются прямо в event loop ASGI-сервера (тысячи одновременных ожиданий
+DaData/Telegram на один процесс), остальные - как обычный WSGI в пуле из
+ASGI_SYNC_THREADS потоков. Штатный ``asgiref.wsgi.WsgiToAsgi`` не подходит:
+он выполняет WSGI через thread-sensitive ``sync_to_async``, то есть все
+синхронные представления процесса - по очереди в одном потоке. Под gunicorn/WSGI те же ``async def``
+представления продолжают работать через штатную поддержку async во Flask.
+
+Внешние запросы идут через общий ``httpx.AsyncClient`` с пулом соединений
+(``http_request``). Асинхронные представления не должны ходить в БД
+напрямую - синхронный драйвер заблокирует loop.
+"""
+import io
+import asyncio
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgiInstance
+from werkzeug.exceptions import HTTPException, NotFound, MethodNotAllowed
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncHTTP:
+    """Общий httpx.AsyncClient, привязанный к event loop ASGI-сервера"""
+
+    def __init__(self):
+        self.client = None
+        self.loop = None
+
+    def start(self, max_connections=100, timeout=10.0):
+        self.loop = asyncio.get_running_loop()
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=20),
+        )
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+        self.client = None
+        self.loop = None
+
+    def in_server_loop(self):
+        try:
+            return self.client is not None and asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+
+async_http = AsyncHTTP()
+
+
+async def http_request(method, url, **kwargs):
+    """HTTP-запрос через общий пул; вне ASGI-сервера - через временный клиент"""
+    if async_http.in_server_loop():
+        return await async_http.client.request(method, url, **kwargs)
+    async with httpx.AsyncClient(timeout=kwargs.pop('timeout', 10.0)) as client:
+        return await client.request(method, url, **kwargs)
+
+
+def submit_background(coro):
+    """Запускает корутину в loop ASGI-сервера из синхронного кода (поток WSGI).
+
+    Возвращает False, если приложение работает не под ASGI - тогда вызывающий
+    код выполняет действие синхронно, как раньше.
+    """
+    if async_http.loop is None or async_http.loop.is_closed():
+        coro.close()
+        return False
+    asyncio.run_coroutine_threadsafe(coro, async_http.loop)
+    return True
+
+
+class _PooledWsgiInstance(WsgiToAsgiInstance):
+    """Запрос WSGI в общем пуле потоков, а не в единственном thread-sensitive потоке"""
+
+    def __init__(self, wsgi_application, executor):
+        super().__init__(wsgi_application)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        run = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+        return await sync_to_async(run, thread_sensitive=False, executor=self.executor)(self, body)
+
+
+def _finalize_request(app, rv, error):
+    """Ответ как в Flask.wsgi_app: обработчики ошибок, after_request и
+    сохранение сессии; необработанное исключение - handle_exception (500)"""
+    try:
+        if error is not None:
+            rv = app.handle_user_exception(error)
+        return app.finalize_request(rv)
+    except Exception as e:
+        return app.handle_exception(e)
+
+
+class AsgiDispatcher:
+    """ASGI-приложение: async-представления Flask - в loop, остальное - в пуле потоков"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        # Пул потоков для синхронных представлений; его размер стоит
+        # согласовать с пулом БД (DB_WORKER_CLASS=asgi). Потоки создаются
+        # по мере надобности, поэтому пул переживает fork при preload_app
+        self.executor = ThreadPoolExecutor(
+            max_workers=flask_app.config.get('ASGI_SYNC_THREADS', 10), thread_name_prefix='wsgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] == 'http' and self._is_async_view(scope):
+            return await self._handle_async(scope, receive, send)
+        return await _PooledWsgiInstance(self.flask_app, self.executor)(scope, receive, send)
+
+    def _in_pool(self, func, *args):
+        """Синхронный вызов (БД, сессия) в пуле потоков, не блокируя loop"""
+        return sync_to_async(func, thread_sensitive=False, executor=self.executor)(*args)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                async_http.start(
+                    max_connections=self.flask_app.config.get('ASGI_HTTP_MAX_CONNECTIONS', 100),
+                    timeout=self.flask_app.config.get('ASGI_HTTP_TIMEOUT', 10.0),
+                )
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_http.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _is_async_view(self, scope):
+        adapter = self.flask_app.url_map.bind('localhost', script_name=scope.get('root_path') or None)
+        try:
+            endpoint, _ = adapter.match(scope['path'], method=scope['method'])
+        except (NotFound, MethodNotAllowed):
+            return False
+        except HTTPException:
+            # Редиректы (слэш в конце и т.п.) отдаёт обычный путь
+            return False
+        return inspect.iscoroutinefunction(self.flask_app.view_functions.get(endpoint))
+
+    async def _handle_async(self, scope, receive, send):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        instance = WsgiToAsgiInstance(self.flask_app)
+        instance.scope = scope
+        environ = instance.build_environ(scope, io.BytesIO(body))
+        app = self.flask_app
+        ctx = app.request_context(environ)
+        # Сессия может жить в БД (SESSION_BACKEND=db): открываем её в пуле,
+        # тогда push() контекста не обращается к хранилищу
+        ctx.session = await self._in_pool(app.session_interface.open_session, app, ctx.request)
+        if ctx.session is None:
+            ctx.session = app.session_interface.make_null_session(app)
+        with ctx:
+            try:
+                rv = await self._in_pool(app.preprocess_request)
+                if rv is None:
+                    view = app.view_functions[ctx.request.endpoint]
+                    rv = await view(**ctx.request.view_args)
+                error = None
+            except Exception as e:
+                rv, error = None, e
+            response = await self._in_pool(_finalize_request, app, rv, error)
+
+            await send({
+                'type': 'http.response.start',
+                'status': response.status_code,
+                'headers': [
+                    (name.lower().encode('latin1'), value.encode('latin1'))
+                    for name, value in response.headers.to_wsgi_list()
+                ],
+            })
+            await send({'type': 'http.response.body', 'body': response.get_data()})
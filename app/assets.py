@@ -0,0 +1,347 @@
+"""Статические файлы сайта: сборка, отпечатки, сжатие (``flask build-assets``).
+
+Исходники - app/static/css и app/static/js, в том числе стили и скрипты
+страниц, вынесенные из шаблонов (css/pages/*.css, js/pages/*.js). Сборка
+минифицирует каждый файл, добавляет к имени хеш содержимого
+(``css/pages/main.1a2b3c4d5e6f.css``), кладёт рядом сжатые копии ``.gz`` и
+``.br`` (brotli - если установлен пакет Brotli) и пишет manifest.json
+(исходное имя -> собранное) в app/static/dist.
+
+В шаблонах - ``asset_url('css/style.css')``: адрес собранного файла по
+манифесту; без манифеста или при ASSETS_USE_MANIFEST=0 (разработка) -
+исходник через url_for('static'). Имя меняется вместе с содержимым, поэтому
+/static/dist/ отдаёт файлы с Cache-Control: immutable на год и выбирает
+готовую сжатую копию по Accept-Encoding, без сжатия на лету.
+
+Минификация консервативная и без внешних зависимостей: в CSS убираются
+комментарии и лишние пробелы, в JS - комментарии, отступы и пустые строки;
+строки, шаблонные строки и регулярные выражения не трогаются.
+"""
+import os
+import re
+import gzip
+import json
+import hashlib
+import mimetypes
+
+from flask import request, send_from_directory, url_for
+
+from app.feeds import atomic_write
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SOURCE_DIRS = ('css', 'js')
+DIST_DIR = 'dist'
+MANIFEST_FILENAME = 'manifest.json'
+HASH_LENGTH = 12
+# Год: имя файла меняется вместе с содержимым
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Сжатые копии в порядке предпочтения: (Content-Encoding, расширение)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+# --- Минификация -----------------------------------------------------
+
+_CSS_STRINGS_AND_COMMENTS = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|/\*.*?\*/)''', re.S)
+_CSS_RELATIVE_URL = re.compile(r'''url\(\s*(['"]?)(?!data:|[a-z]+://|/|#)([^'")]+)\1\s*\)''', re.I)
+
+
+def _css_code(chunk):
+    chunk = re.sub(r'\s+', ' ', chunk)
+    chunk = re.sub(r' ?([{};,>]) ?', r'\1', chunk)
+    return chunk.replace(';}', '}')
+
+
+def minify_css(source):
+    """Без комментариев и лишних пробелов; строки (в том числе data:-адреса) не меняются"""
+    parts = []
+    for piece in _CSS_STRINGS_AND_COMMENTS.split(source):
+        if piece.startswith('/*'):
+            continue
+        parts.append(piece)
+    # После удаления комментариев соседние куски кода склеиваются
+    parts = _CSS_STRINGS_AND_COMMENTS.split(''.join(parts))
+    return ''.join(
+        piece if piece[:1] in ('"', "'") else _css_code(piece) for piece in parts
+    ).strip() + '\n'
+
+
+def rebase_css_urls(source, prefix='../'):
+    """Относительные url() после переноса файла на уровень глубже (в dist/)"""
+    return _CSS_RELATIVE_URL.sub(lambda m: f'url({m.group(1)}{prefix}{m.group(2)}{m.group(1)})', source)
+
+
+# После этих символов и слов «/» начинает регулярное выражение, а не деление
+_REGEX_AFTER_CHARS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_AFTER_WORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void',
+                      'throw', 'yield', 'await'}
+
+
+def _skip_string(source, i):
+    quote, i = source[i], i + 1
+    while i < len(source):
+        if source[i] == '\\':
+            i += 2
+            continue
+        if source[i] == quote or source[i] == '\n':
+            return i + 1
+        i += 1
+    return i
+
+
+def _skip_template(source, i):
+    """Конец шаблонной строки `...${выражение}...` (выражения - с вложенными строками)"""
+    i += 1
+    while i < len(source):
+        c = source[i]
+        if c == '\\':
+            i += 2
+        elif c == '`':
+            return i + 1
+        elif source.startswith('${', i):
+            i = _skip_expression(source, i + 2)
+        else:
+            i += 1
+    return i
+
+
+def _skip_expression(source, i):
+    depth = 1
+    while i < len(source):
+        c = source[i]
+        if c in '"\'':
+            i = _skip_string(source, i)
+            continue
+        if c == '`':
+            i = _skip_template(source, i)
+            continue
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _skip_regex(source, i):
+    """Конец литерала /.../флаги или None, если до конца строки его нет"""
+    i += 1
+    in_class = False
+    while i < len(source):
+        c = source[i]
+        if c == '\n':
+            return None
+        if c == '\\':
+            i += 2
+            continue
+        if c == '[':
+            in_class = True
+        elif c == ']':
+            in_class = False
+        elif c == '/' and not in_class:
+            i += 1
+            while i < len(source) and (source[i].isalpha()):
+                i += 1
+            return i
+        i += 1
+    return None
+
+
+def _regex_allowed(code):
+    stripped = code.rstrip()
+    if not stripped:
+        return True
+    if stripped[-1] in _REGEX_AFTER_CHARS:
+        return True
+    word = re.search(r'[A-Za-z_$][\w$]*$', stripped)
+    return bool(word) and word.group() in _REGEX_AFTER_WORDS
+
+
+def _js_code(chunk):
+    chunk = re.sub(r'[ \t]+\n', '\n', chunk)
+    chunk = re.sub(r'\n[ \t]+', '\n', chunk)
+    return re.sub(r'\n{2,}', '\n', chunk)
+
+
+def minify_js(source):
+    """Без комментариев, отступов и пустых строк; переводы строк сохраняются
+    (автоподстановка «;» работает как в исходнике)"""
+    parts, code = [], []
+    i, n = 0, len(source)
+
+    def literal(end):
+        parts.append(_js_code(''.join(code)))
+        code.clear()
+        parts.append(source[i:end])
+
+    while i < n:
+        c = source[i]
+        if c in '"\'':
+            end = _skip_string(source, i)
+        elif c == '`':
+            end = _skip_template(source, i)
+        elif source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            code.append('\n' if '\n' in source[i:end] else ' ')
+            i = end
+            continue
+        elif c == '/' and _regex_allowed(''.join(code[-64:]) if code else (parts[-1][-64:] if parts else '')):
+            end = _skip_regex(source, i)
+            if end is None:
+                code.append(c)
+                i += 1
+                continue
+        else:
+            code.append(c)
+            i += 1
+            continue
+        literal(end)
+        i = end
+    parts.append(_js_code(''.join(code)))
+    return ''.join(parts).strip() + '\n'
+
+
+# --- Сборка ----------------------------------------------------------
+
+def _minify(name, text):
+    if '.min.' in name:
+        return text
+    if name.endswith('.css'):
+        return minify_css(rebase_css_urls(text))
+    return minify_js(text)
+
+
+def _source_files(static_folder):
+    """Пути исходников относительно static/: css/**/*.css, js/**/*.js"""
+    names = []
+    for directory in SOURCE_DIRS:
+        root = os.path.join(static_folder, directory)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.endswith(('.css', '.js')):
+                    names.append(os.path.relpath(os.path.join(dirpath, filename), static_folder).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def _fingerprinted(name, content):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{ext}'
+
+
+def _write_if_missing(path, data):
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, lambda f: f.write(data))
+
+
+def load_manifest(dist_dir):
+    try:
+        with open(os.path.join(dist_dir, MANIFEST_FILENAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build_assets(static_folder):
+    """Собирает static/css и static/js в static/dist; возвращает сводку.
+
+    Файлы прошлой сборки остаются (страницы из кеша ещё ссылаются на них),
+    более старые удаляются.
+    """
+    dist_dir = os.path.join(static_folder, DIST_DIR)
+    previous = load_manifest(dist_dir)
+    manifest = {}
+    totals = {'files': 0, 'source': 0, 'minified': 0, 'gzip': 0, 'br': 0}
+    for name in _source_files(static_folder):
+        with open(os.path.join(static_folder, name), encoding='utf-8') as f:
+            source = f.read()
+        content = _minify(name, source).encode('utf-8')
+        built = _fingerprinted(name, content)
+        path = os.path.join(dist_dir, built)
+        _write_if_missing(path, content)
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        _write_if_missing(path + '.gz', compressed)
+        totals['gzip'] += len(compressed)
+        if brotli is not None:
+            compressed = brotli.compress(content, quality=11)
+            _write_if_missing(path + '.br', compressed)
+            totals['br'] += len(compressed)
+        manifest[name] = built
+        totals['files'] += 1
+        totals['source'] += len(source.encode('utf-8'))
+        totals['minified'] += len(content)
+
+    keep = {MANIFEST_FILENAME, *manifest.values(), *previous.values()}
+    removed = 0
+    for dirpath, _, filenames in os.walk(dist_dir):
+        for filename in filenames:
+            name = os.path.relpath(os.path.join(dirpath, filename), dist_dir).replace(os.sep, '/')
+            for _, suffix in ENCODINGS:
+                if name.endswith(suffix):
+                    name = name[:-len(suffix)]
+            if name not in keep:
+                os.remove(os.path.join(dirpath, filename))
+                removed += 1
+
+    os.makedirs(dist_dir, exist_ok=True)
+    atomic_write(os.path.join(dist_dir, MANIFEST_FILENAME),
+                 lambda f: f.write(json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8')))
+    totals['removed'] = removed
+    if brotli is None:
+        totals['br'] = None
+    return totals
+
+
+# --- Отдача ----------------------------------------------------------
+
+class Assets:
+    def __init__(self):
+        self.manifest = {}
+        self.dist_dir = None
+
+    def init_app(self, app):
+        self.dist_dir = os.path.join(app.static_folder, DIST_DIR)
+        if app.config.get('ASSETS_USE_MANIFEST', True):
+            self.manifest = load_manifest(self.dist_dir)
+            if not self.manifest:
+                print("[WARN] Статика не собрана (flask build-assets): отдаются исходные файлы")
+        app.extensions['assets'] = self
+        app.jinja_env.globals['asset_url'] = self.url
+        app.add_url_rule(f'{app.static_url_path}/{DIST_DIR}/<path:filename>', 'assets', self.serve)
+
+    def url(self, filename):
+        """Адрес собранного файла по манифесту или исходника из static/"""
+        built = self.manifest.get(filename)
+        if built is None:
+            return url_for('static', filename=filename)
+        return url_for('assets', filename=built)
+
+    def serve(self, filename):
+        """Собранный файл (или его .br/.gz по Accept-Encoding) с immutable-кешем"""
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding, suffix = None, ''
+        for name, extension in ENCODINGS:
+            if name in request.accept_encodings and os.path.isfile(os.path.join(self.dist_dir, filename + extension)):
+                encoding, suffix = name, extension
+                break
+        response = send_from_directory(self.dist_dir, filename + suffix, mimetype=mimetype,
+                                       max_age=IMMUTABLE_MAX_AGE)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+assets = Assets()
@@ -1,5 +1,5 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, session, send_file
-from app.utils import generate_captcha_image
+from flask import Blueprint, render_template, request, flash, redirect, url_for
+from app.captcha import captcha_image, check_captcha
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
@@ -19,13 +19,8 @@ logger = logging.getLogger(__name__)
 def register():
     if request.method == 'POST':
         try:
-            captcha_input = request.form.get('captcha', '')
-            captcha_session = session.get('register_captcha', '')
-            
-            # Clear captcha
-            session.pop('register_captcha', None)
-            
-            if not captcha_input or captcha_input != captcha_session:
+            # Код одноразовый: проверка удаляет его
+            if not check_captcha('register', request.form.get('captcha_id'), request.form.get('captcha', '')):
                 flash('Неверный код с картинки', 'error')
                 return render_template('register.html')
 
@@ -191,13 +186,8 @@ def reset_password_request():
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
     if request.method == 'POST':
-        captcha_input = request.form.get('captcha', '')
-        captcha_session = session.get('password_reset_captcha', '')
-        
-        # Clear captcha from session to prevent reuse/guessing
-        session.pop('password_reset_captcha', None)
-        
-        if not captcha_input or captcha_input != captcha_session:
+        # Код одноразовый: проверка удаляет его, чтобы нельзя было подбирать
+        if not check_captcha('password_reset', request.form.get('captcha_id'), request.form.get('captcha', '')):
             flash('Неверный код с картинки', 'error')
             return redirect(url_for('auth.reset_password_request'))
 
@@ -243,23 +233,17 @@ def reset_password(token):
 
 @auth.route('/password_reset_captcha')
 def password_reset_captcha():
-    code, image_io = generate_captcha_image()
-    session['password_reset_captcha'] = code
-    return send_file(image_io, mimetype='image/png')
+    return captcha_image('password_reset')
 
 @auth.route('/register_captcha')
 def register_captcha():
-    code, image_io = generate_captcha_image()
-    session['register_captcha'] = code
-    return send_file(image_io, mimetype='image/png')
+    return captcha_image('register')
 
 @auth.route('/validate_captcha', methods=['POST'])
 def validate_captcha():
-    data = request.get_json()
-    captcha_input = data.get('captcha', '')
-    captcha_session = session.get('register_captcha', '')
-    
-    if not captcha_input or captcha_input != captcha_session:
+    data = request.get_json(silent=True) or {}
+    # Предварительная проверка из register.js: код не расходуется
+    if not check_captcha('register', data.get('captcha_id'), data.get('captcha', ''), consume=False):
         return {'valid': False}, 200
     
     return {'valid': True}, 200
\ No newline at end of file
@@ -1,12 +1,13 @@
 from flask import Blueprint, jsonify, request, current_app
 from app.models import City, Region, Product
-import json
-import requests
+from app.db_routing import read_replica
+from app.aio import http_request
 
 api_bp = Blueprint('api', __name__)
 
 @api_bp.route('/api/dadata/company', methods=['POST'])
-def get_dadata_company():
+async def get_dadata_company():
+    # async: под ASGI (asgi.py) ожидание DaData не занимает воркер
     try:
         data = request.get_json()
         inn = data.get('inn')
@@ -25,7 +26,7 @@ def get_dadata_company():
         }
         payload = {"query": inn}
         
-        response = requests.post(url, json=payload, headers=headers)
+        response = await http_request('POST', url, json=payload, headers=headers)
         response.raise_for_status()
         result = response.json()
         
@@ -48,6 +49,7 @@ def get_dadata_company():
 
 
 @api_bp.route('/api/locations')
+@read_replica
 def get_locations():
     try:
         search = request.args.get('search', '').strip()
@@ -221,6 +223,7 @@ def get_locations():
         return jsonify(fallback_results)
 
 @api_bp.route('/api/regions')
+@read_replica
 def get_regions():
     regions = Region.query.filter_by(parent_id=None).order_by(Region.name).all()
     result = []
@@ -250,9 +253,4 @@ def get_cities_by_region(region_id):
             'name': city.name,
             'full_name': f"{city.name} (Регион ID: {region_id})"
         })
-    response = current_app.response_class(
-        response=json.dumps(result, ensure_ascii=False),
-        status=200,
-        mimetype='application/json; charset=utf-8'
-    )
-    return response
+    return jsonify(result)
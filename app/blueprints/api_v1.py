@@ -0,0 +1,279 @@
+"""JSON API каталога, версия 1 (/api/v1).
+
+Только чтение и только опубликованные товары. Запросы выбирают лишь
+запрошенные колонки (``?fields=id,title,price``), список товаров листается
+курсором (``?cursor=`` из ``next_cursor`` предыдущей страницы, новые
+первыми) - без OFFSET, поэтому дальние страницы не медленнее первой.
+
+Ответы для гостей хранятся в кеше страниц (app/page_cache.py) с теми же
+тегами, что и HTML: правка товара, категории или продавца сбрасывает их
+после коммита. У каждого ответа есть ETag; повторный запрос с
+If-None-Match получает 304 без тела.
+"""
+import base64
+import binascii
+from datetime import datetime
+from urllib.parse import quote
+
+from flask import Blueprint, abort, current_app, request, url_for
+from sqlalchemy import select, func
+
+from app import db
+from app.catalog_search import filter_criteria, location_criteria
+from app.category_stats import catalog_stats
+from app.db_routing import read_replica
+from app.json_provider import jsonify_ordered
+from app.models import Product, User, Review
+from app.page_cache import page_cache, tag_page
+from app.utils import _deserialize_images
+
+api_v1 = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+# Поле ответа -> колонка; url вычисляется из id
+PRODUCT_FIELDS = {
+    'id': Product.id,
+    'title': Product.title,
+    'price': Product.price,
+    'price_type': Product.price_type,
+    'quantity': Product.quantity,
+    'manufacturer': Product.manufacturer,
+    'category_id': Product.category_id,
+    'seller_id': Product.user_id,
+    'condition': Product.condition,
+    'delivery': Product.delivery,
+    'vat_included': Product.vat_included,
+    'region': Product.region,
+    'city': Product.city,
+    'city_id': Product.city_id,
+    'images': Product.images,
+    'view_count': Product.view_count,
+    'created_at': Product.created_at,
+    'updated_at': Product.updated_at,
+    'expires_at': Product.expires_at,
+    'description': Product.description,
+    'url': None,
+}
+# В списке описание - только по явному запросу (?fields=...,description)
+LIST_FIELDS = tuple(name for name in PRODUCT_FIELDS if name != 'description')
+
+
+def _error(status, message):
+    response = jsonify_ordered({'error': message})
+    response.status_code = status
+    return response
+
+
+@api_v1.errorhandler(400)
+def bad_request(error):
+    return _error(400, error.description)
+
+
+@api_v1.errorhandler(404)
+def not_found(error):
+    return _error(404, 'Не найдено')
+
+
+@api_v1.after_request
+def add_cache_headers(response):
+    """ETag по телу и условный ответ 304; публичный кеш на API_CACHE_MAX_AGE"""
+    if request.method == 'GET' and response.status_code == 200:
+        response.add_etag()
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config.get('API_CACHE_MAX_AGE', 30)
+        response.make_conditional(request)
+    return response
+
+
+def _parse_fields(default):
+    requested = request.args.get('fields')
+    if not requested:
+        return list(default)
+    fields = [name for name in dict.fromkeys(requested.split(',')) if name]
+    unknown = [name for name in fields if name not in PRODUCT_FIELDS]
+    if unknown:
+        abort(400, f"Неизвестные поля: {', '.join(unknown)}")
+    return fields
+
+
+def _product_select(fields, *criteria):
+    """SELECT только колонок полей fields (id - всегда, для url и курсора)"""
+    columns = [Product.id.label('id')]
+    columns += [
+        PRODUCT_FIELDS[name].label(name) for name in fields
+        if name != 'id' and PRODUCT_FIELDS[name] is not None
+    ]
+    return select(*columns).where(Product.status == Product.STATUS_PUBLISHED, *criteria)
+
+
+class _Serializer:
+    """Строка SELECT -> словарь полей; адреса строятся от префиксов url_for
+    один раз на запрос, а не на каждый товар"""
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.product_url = url_for('main.product_detail', product_id=1, _external=True).rsplit('/', 1)[0] + '/'
+        self.upload_url = url_for('main.serve_uploaded_file', filename='x', _external=True).rsplit('/', 1)[0] + '/'
+
+    def _images(self, value):
+        return [
+            image if image.startswith('http') else self.upload_url + quote(image)
+            for image in _deserialize_images(value) if isinstance(image, str) and image
+        ]
+
+    def __call__(self, row):
+        mapping = row._mapping
+        item = {}
+        for name in self.fields:
+            if name == 'url':
+                item[name] = f'{self.product_url}{mapping["id"]}'
+                continue
+            value = mapping[name]
+            if name == 'images':
+                value = self._images(value)
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            item[name] = value
+        return item
+
+
+def _encode_cursor(product_id):
+    return base64.urlsafe_b64encode(str(product_id).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        abort(400, 'Некорректный cursor')
+
+
+def _list_criteria(args):
+    """Фильтры списка из query string"""
+    criteria = filter_criteria(args)
+    category_id = args.get('category_id', type=int)
+    if category_id:
+        criteria.append(Product.category_id.in_(catalog_stats().descendant_ids(category_id)))
+    seller_id = args.get('seller_id', type=int)
+    if seller_id:
+        criteria.append(Product.user_id == seller_id)
+    search = args.get('q', '').strip()
+    if search:
+        criteria.append(Product.title.ilike(f'%{search}%') | Product.description.ilike(f'%{search}%'))
+    location = location_criteria(args.get('location_id'))
+    if location is not None:
+        criteria.append(location)
+    updated_since = args.get('updated_since')
+    if updated_since:
+        try:
+            criteria.append(Product.updated_at >= datetime.fromisoformat(updated_since))
+        except ValueError:
+            abort(400, 'updated_since - дата в формате ISO 8601')
+    return criteria
+
+
+@api_v1.route('/products')
+@page_cache.cached()
+@read_replica
+def products():
+    """Опубликованные товары, новые первыми.
+
+    Фильтры: category_id (с подкатегориями), seller_id, q, location_id,
+    price_min / price_max, фасеты каталога (condition, delivery, vat_included,
+    price_type, manufacturer, price_range), updated_since.
+    Страница: limit, cursor. Поля: fields (через запятую).
+    """
+    tag_page('listing', 'category-all')
+    fields = _parse_fields(LIST_FIELDS)
+    config = current_app.config
+    limit = min(max(1, request.args.get('limit', config['API_PER_PAGE'], type=int)), config['API_MAX_PER_PAGE'])
+    criteria = _list_criteria(request.args)
+    cursor = request.args.get('cursor')
+    if cursor:
+        criteria.append(Product.id < _decode_cursor(cursor))
+
+    rows = db.session.execute(
+        _product_select(fields, *criteria).order_by(Product.id.desc()).limit(limit + 1)
+    ).all()
+    serialize = _Serializer(fields)
+    items = [serialize(row) for row in rows[:limit]]
+    next_cursor = _encode_cursor(rows[limit - 1].id) if len(rows) > limit else None
+    return jsonify_ordered({'items': items, 'next_cursor': next_cursor})
+
+
+@api_v1.route('/products/<int:product_id>')
+@page_cache.cached()
+@read_replica
+def product(product_id):
+    """Опубликованный товар со всеми полями (или ?fields=) и путём категории"""
+    tag_page(f'product-{product_id}')
+    fields = _parse_fields(PRODUCT_FIELDS)
+    row = db.session.execute(_product_select(fields, Product.id == product_id)).first()
+    if row is None:
+        abort(404)
+    item = _Serializer(fields)(row)
+    if 'category_id' in fields:
+        stats = catalog_stats()
+        item['category_path'] = [
+            {'id': node.id, 'name': node.category.name}
+            for node in (stats.get(cid) for cid in reversed(stats.ancestor_ids(row.category_id)))
+            if node is not None
+        ]
+    return jsonify_ordered(item)
+
+
+def _category_tree(nodes):
+    return [
+        {
+            'id': node.id,
+            'name': node.category.name,
+            'parent_id': node.category.parent_id,
+            'color': node.category.color,
+            'image': url_for('main.get_category_image_by_size', category_id=node.id, size='medium',
+                             _external=True) if node.category.image else None,
+            'products': node.total_published,
+            'children': _category_tree(node.children),
+        }
+        for node in nodes
+    ]
+
+
+@api_v1.route('/categories')
+@page_cache.cached()
+def categories():
+    """Всё дерево категорий с числом опубликованных товаров (из снимка в памяти)"""
+    tag_page('listing', 'category-all')
+    return jsonify_ordered({'items': _category_tree(catalog_stats().roots)})
+
+
+@api_v1.route('/sellers/<int:seller_id>')
+@page_cache.cached()
+@read_replica
+def seller(seller_id):
+    """Публичный профиль продавца: название, рейтинг, число товаров"""
+    tag_page(f'seller-{seller_id}')
+    user = db.session.execute(
+        select(User.id, User.username, User.company_name, User.industry, User.about, User.created_at)
+        .where(User.id == seller_id, User.is_active.isnot(False))
+    ).first()
+    if user is None:
+        abort(404)
+    rating, reviews = db.session.execute(
+        select(func.avg(Review.rating), func.count(Review.id))
+        .where(Review.seller_id == seller_id, Review.is_published.is_(True))
+    ).one()
+    published = db.session.scalar(
+        select(func.count()).select_from(Product)
+        .where(Product.user_id == seller_id, Product.status == Product.STATUS_PUBLISHED)
+    )
+    return jsonify_ordered({
+        'id': user.id,
+        'name': user.username or user.company_name,
+        'company_name': user.company_name,
+        'industry': user.industry,
+        'about': user.about,
+        'registered_at': user.created_at.isoformat() if user.created_at else None,
+        'rating': round(float(rating), 1) if rating else None,
+        'reviews': reviews,
+        'products': published,
+        'products_url': url_for('api_v1.products', seller_id=user.id, _external=True),
+    })
@@ -0,0 +1,57 @@
+import os
+
+from flask import Blueprint, Response, abort, current_app, send_from_directory
+
+from app.feeds import YML_FILENAME, feed_scheduler
+from app.sitemap import INDEX_FILENAME, CATEGORIES_FILENAME, shard_filename
+
+# Без url_prefix: sitemap должен лежать в корне сайта
+feeds_bp = Blueprint('feeds_bp', __name__)
+
+
+def _not_ready():
+    # Файл ещё не собран - запускаем сборку и просим зайти позже
+    feed_scheduler.trigger()
+    return 'Файл готовится, повторите запрос позже', 503, {'Retry-After': '120'}
+
+
+@feeds_bp.route('/feeds/yandex.yml')
+def yandex_market():
+    """YML-фид для Яндекс Маркета: готовый файл, условный GET по ETag / Last-Modified"""
+    directory = current_app.config['FEED_DIR']
+    if not os.path.exists(os.path.join(directory, YML_FILENAME)):
+        return _not_ready()
+    return send_from_directory(directory, YML_FILENAME, mimetype='application/xml', max_age=600)
+
+
+@feeds_bp.route('/sitemap.xml')
+def sitemap_index():
+    """Индекс sitemap со ссылками на сжатые файлы"""
+    directory = os.path.join(current_app.config['FEED_DIR'], 'sitemap')
+    if not os.path.exists(os.path.join(directory, INDEX_FILENAME)):
+        return _not_ready()
+    return send_from_directory(directory, INDEX_FILENAME, mimetype='application/xml', max_age=3600)
+
+
+@feeds_bp.route('/sitemap-categories.xml.gz', defaults={'number': None})
+@feeds_bp.route('/sitemap-products-<int:number>.xml.gz')
+def sitemap_file(number):
+    """Файл sitemap (gzip) - отдаётся как есть, без распаковки"""
+    directory = os.path.join(current_app.config['FEED_DIR'], 'sitemap')
+    filename = CATEGORIES_FILENAME if number is None else shard_filename(number)
+    if not os.path.exists(os.path.join(directory, filename)):
+        abort(404)
+    return send_from_directory(directory, filename, mimetype='application/gzip', max_age=3600)
+
+
+@feeds_bp.route('/robots.txt')
+def robots_txt():
+    """robots.txt со ссылкой на sitemap"""
+    lines = [
+        'User-agent: *',
+        'Disallow: /admin/',
+        'Disallow: /dashboard',
+        '',
+        f"Sitemap: {current_app.config['SITE_URL']}/sitemap.xml",
+    ]
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain')
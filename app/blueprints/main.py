@@ -1,6 +1,15 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, send_from_directory, current_app, jsonify, session, send_file
-from flask_login import login_required, current_user
+from flask import Blueprint, render_template, request, flash, redirect, url_for, send_from_directory, current_app, jsonify
+from flask_login import login_required, current_user, login_user
 from app import db, csrf
+from app.db_routing import read_replica
+from app.category_stats import catalog_stats
+from app.category_counts import expire_published, publish_products, unpublish_products, delete_products
+from app.listing import (
+    favorite_rows, parse_seller_args, seller_criteria, seller_page, seller_status_counts, row_to_dict,
+    SELLER_STATUS_TABS
+)
+from app.catalog_search import search_catalog, location_criteria, nearby_criteria, distance_order, FACET_TITLES
+from app.page_cache import page_cache, tag_page
 from app.models import Product, Category, User, Review, Region, City
 from datetime import datetime
 import os
@@ -42,46 +51,48 @@ def system_description():
 
 
 @main.route('/')
+@page_cache.cached()
+@read_replica
 def index():
     category_id = request.args.get('category_id')
+    tag_page('listing', f'category-{category_id}' if category_id and category_id.isdigit() else 'category-all')
     search_term = request.args.get('search', '').strip()
     location = request.args.get('location', '').strip()
-    query = Product.query.filter_by(status=Product.STATUS_PUBLISHED)
+    criteria = [Product.status == Product.STATUS_PUBLISHED]
+    # Дерево категорий со счётчиками - из кеша процесса, без запросов к товарам
+    stats = catalog_stats()
     if category_id and category_id.isdigit():
-        cat_id = int(category_id)
-        # Recursive category filtering
-        category = Category.query.get(cat_id)
-        if category:
-            all_cat_ids = [cat_id]
-            # Collecting all descendants
-            stack = [category]
-            while stack:
-                curr = stack.pop()
-                for child in curr.children:
-                    all_cat_ids.append(child.id)
-                    stack.append(child)
-            query = query.filter(Product.category_id.in_(all_cat_ids))
-        else:
-            query = query.filter_by(category_id=cat_id)
+        # Фильтр по категории вместе со всеми потомками
+        criteria.append(Product.category_id.in_(stats.descendant_ids(int(category_id))))
     if search_term:
-        query = query.filter(
+        criteria.append(
             Product.title.ilike(f'%{search_term}%') | 
             Product.description.ilike(f'%{search_term}%')
         )
-    if location and location != 'Все регионы':
-        query = query.filter(
-            (Product.region == location) | 
-            (Product.city == location)
-        )
-    query = query.options(joinedload(Product.product_category))
-    products = query.order_by(Product.created_at.desc()).all()
+    # Местоположение - по id региона/города (city_12, region_5);
+    # для города можно расширить поиск радиусом в км (radius)
+    location_id = request.args.get('location_id')
+    radius = min(max(request.args.get('radius', 0, type=float), 0), 2000)
+    location_filter, distances = nearby_criteria(location_id, radius)
+    if location_filter is None:
+        location_filter = location_criteria(location_id, location)
+    if location_filter is not None:
+        criteria.append(location_filter)
+    order_by = [distance_order(distances)] if distances and request.args.get('sort') == 'distance' else []
+    # Страница товаров и счётчики фасетов (цена, состояние, доставка, ...)
+    catalog = search_catalog(
+        criteria, request.args,
+        page=request.args.get('page', 1, type=int),
+        per_page=current_app.config.get('CATALOG_PER_PAGE', 60),
+        order_by=order_by
+    )
+    products = catalog.items
     
-    # Используем иерархический список категорий (список словарей)
-    from app.utils import get_category_choices
-    categories = get_category_choices()
+    # Иерархический список категорий (список словарей) без пустых веток
+    categories = stats.choices(hide_empty=True)
     
-    # Для плиток категорий (только верхний уровень)
-    root_categories = Category.query.filter_by(parent_id=None).order_by(Category.name).all()
+    # Для плиток категорий (только верхний уровень, с товарами)
+    root_categories = [node for node in stats.roots if node.total_published]
     
     # Check for sidebar banner
     sidebar_banner = None
@@ -94,68 +105,159 @@ def index():
     
     return render_template('main.html', 
                          products=products, 
+                         catalog=catalog,
+                         distances=distances,
+                         facet_titles=FACET_TITLES,
                          categories=categories,
                          root_categories=root_categories,
                          search_term=search_term,
                          sidebar_banner=sidebar_banner)
 
+def _seller_listing():
+    """Страница товаров текущего продавца по request.args (фильтры и сортировка
+    в SQL) и счётчики по статусам одним GROUP BY"""
+    query = parse_seller_args(request.args, default_per_page=current_app.config.get('DASHBOARD_PER_PAGE', 24))
+    expiring_days = current_app.config.get('DASHBOARD_EXPIRING_DAYS', 3)
+    counts = seller_status_counts(current_user.id, expiring_days)
+    page = seller_page(current_user.id, query, counts, expiring_days)
+    return query, counts, page, expiring_days
+
 @main.route('/dashboard')
 @login_required
 def dashboard():
-    user_products = Product.query.options(joinedload(Product.product_category)).filter_by(user_id=current_user.id).order_by(Product.created_at.desc()).all()
-    
-    # Автоматически снимаем с публикации просроченные товары
-    expired_count = Product.query.filter(
-        Product.user_id == current_user.id,
-        Product.status == Product.STATUS_PUBLISHED,
-        Product.expires_at <= datetime.utcnow()
-    ).update({Product.status: Product.STATUS_READY_FOR_PUBLICATION})
-    if expired_count > 0:
+    # Автоматически снимаем с публикации просроченные товары - до чтения списка
+    if expire_published(Product.user_id == current_user.id):
         db.session.commit()
-        # После коммита перезагружаем данные
-        user_products = Product.query.options(joinedload(Product.product_category)).filter_by(user_id=current_user.id).order_by(Product.created_at.desc()).all()
-
-    # Добавляем image_list к каждому объекту Product для корректного отображения в шаблоне
-    for product in user_products:
-        product.image_list = _deserialize_images(product.images)
-
-    # Подготавливаем JSON-данные для JS (остаётся как есть)
-    products_data = []
-    for product in user_products:
-        product_dict = {
-            'id': product.id,
-            'title': product.title,
-            'description': product.description,
-            'price': product.price,
-            'quantity': product.quantity,
-            'manufacturer': product.manufacturer,
-            'category_id': product.category_id,
-            'images': _deserialize_images(product.images),
-            'status': product.status,
-            'status_text': product.status_text,
-            'created_at': product.created_at.isoformat() if product.created_at else None,
-            'expires_at': product.expires_at.isoformat() if product.expires_at else None,
-            'view_count': product.view_count,
-            'vat_included': product.vat_included,
-            'condition': product.condition,
-            'region': product.region,
-            'city': product.city,
-            'delivery': product.delivery,
-            'days_remaining': product.days_remaining,
-            'is_expired': product.is_expired,
-            'product_category': {
-                'id': product.product_category.id if product.product_category else None,
-                'name': product.product_category.name if product.product_category else None
-            } if product.product_category else None
-        }
-        products_data.append(product_dict)
 
-    return render_template('dashboard.html', 
-                         products=user_products,
-                         products_json=products_data,
+    # Таблица догружает страницы из /dashboard/products.json
+    query, counts, page, expiring_days = _seller_listing()
+    return render_template('dashboard.html',
+                         products=page.items,
+                         page=page,
+                         query=query,
+                         counts=counts,
+                         status_tabs=SELLER_STATUS_TABS,
+                         categories=catalog_stats().choices(),
+                         expiring_days=expiring_days,
                          now=datetime.utcnow())
 
+@main.route('/dashboard/products.json')
+@login_required
+def dashboard_products():
+    """Страница товаров кабинета: ?status=&category_id=&expiring=1&sort=&dir=&page=&per_page=&fields="""
+    query, counts, page, _ = _seller_listing()
+    return jsonify({
+        'items': [row_to_dict(row, query['fields']) for row in page.items],
+        'total': page.total,
+        'page': page.page,
+        'pages': page.pages,
+        'per_page': page.per_page,
+        'counts': {
+            'total': counts['total'],
+            'expiring': counts['expiring'],
+            'by_status': {str(status): count for status, count in counts['by_status'].items()},
+        },
+    })
+
+@main.route('/dashboard/export.<file_format>')
+@login_required
+@read_replica
+def dashboard_export(file_format):
+    """Потоковая выгрузка своих товаров (с фильтрами кабинета) в CSV/XLSX; ?gzip=1"""
+    from app.exports import export_response, product_export
+
+    query = parse_seller_args(request.args)
+    columns, stmt = product_export(
+        seller_criteria(current_user.id, query, current_app.config.get('DASHBOARD_EXPIRING_DAYS', 3))
+    )
+    try:
+        return export_response(columns, stmt, 'products', file_format, gzip=request.args.get('gzip') == '1')
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('main.dashboard'))
+
+BULK_ACTIONS = {
+    'publish': (publish_products, 'Опубликовано товаров: {n}. Срок размещения - 30 дней'),
+    'unpublish': (unpublish_products, 'Снято с публикации товаров: {n}'),
+    'delete': (delete_products, 'Удалено товаров: {n}'),
+}
+
+@main.route('/dashboard/bulk', methods=['POST'])
+@login_required
+def dashboard_bulk():
+    """Действие над товарами продавца одним UPDATE/DELETE ... RETURNING.
+
+    action=publish|unpublish|delete и либо ids (списком), либо scope=filter с
+    фильтрами кабинета (status, category_id, expiring). Принимает форму или JSON.
+    """
+    from werkzeug.datastructures import MultiDict
+    from app.image_cleanup import schedule_image_cleanup
+
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if data is None:
+            data = {}
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'message': 'Ожидается JSON-объект'}), 400
+        ids = data.get('ids') or []
+        form = MultiDict({k: v for k, v in data.items() if k != 'ids' and v is not None})
+    else:
+        form = request.form
+        ids = form.getlist('ids')
+
+    def respond(message, category, status=200, **extra):
+        if request.is_json:
+            return jsonify({'success': status == 200, 'message': message, **extra}), status
+        flash(message, category)
+        back = {k: form[k] for k in ('status', 'category_id', 'expiring', 'sort', 'dir') if form.get(k)}
+        return redirect(url_for('main.dashboard', **back))
+
+    action = form.get('action')
+    if not isinstance(action, str) or action not in BULK_ACTIONS:
+        return respond('Неизвестное действие', 'error', 400)
+    func, message = BULK_ACTIONS[action]
+
+    if form.get('scope') == 'filter':
+        query = parse_seller_args(form)
+        criteria = seller_criteria(current_user.id, query, current_app.config.get('DASHBOARD_EXPIRING_DAYS', 3))
+    else:
+        try:
+            ids = sorted({int(product_id) for product_id in ids})
+        except (TypeError, ValueError):
+            return respond('Некорректный список товаров', 'error', 400)
+        if not ids:
+            return respond('Не выбрано ни одного товара', 'warning', 400)
+        max_ids = current_app.config.get('BULK_ACTION_MAX_IDS', 1000)
+        if len(ids) > max_ids:
+            return respond(f'Можно выбрать не больше {max_ids} товаров; используйте действие по фильтру', 'error', 400)
+        # Чужие id просто не попадут под условие
+        criteria = [Product.user_id == current_user.id, Product.id.in_(ids)]
+
+    try:
+        result = func(*criteria)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"[ERROR] Массовое действие {action}: {e}")
+        return respond('Ошибка при выполнении действия', 'error', 500)
+
+    job_id = None
+    if action == 'delete':
+        job_id = schedule_image_cleanup([row.images for row in result], user_id=current_user.id)
+        result = len(result)
+    return respond(message.format(n=result), 'success', action=action, affected=result, job_id=job_id)
+
+def _count_view(product_id):
+    # Атомарный инкремент на primary: значение, прочитанное с реплики, может отставать
+    Product.query.filter_by(id=product_id).update(
+        {Product.view_count: db.func.coalesce(Product.view_count, 0) + 1},
+        synchronize_session=False
+    )
+    db.session.commit()
+
 @main.route('/product/<int:product_id>')
+@page_cache.cached(on_hit=_count_view)
+@read_replica
 def product_detail(product_id):
     product = Product.query.options(
         joinedload(Product.product_category),
@@ -169,8 +271,8 @@ def product_detail(product_id):
         flash('Этот товар недоступен для просмотра', 'error')
         return redirect(url_for('main.index'))
     if product.status == Product.STATUS_PUBLISHED:
-        product.view_count = (product.view_count or 0) + 1
-        db.session.commit()
+        _count_view(product.id)
+    tag_page(f'product-{product.id}', f'seller-{product.user_id}')
     return render_template('product_detail.html', product=product)
 
 @main.route('/add_product', methods=['GET', 'POST'])
@@ -506,14 +608,12 @@ def delete_product(product_id):
         flash('У вас нет прав для удаления этого товара', 'error')
         return redirect(url_for('main.product_detail', product_id=product_id))
     try:
-        if product.images:
-            for image_filename in _deserialize_images(product.images):
-                if isinstance(image_filename, str) and not image_filename.startswith('http'):
-                    image_path = os.path.join(current_app.config['UPLOAD_FOLDER'], image_filename)
-                    if os.path.exists(image_path):
-                        os.remove(image_path)
+        from app.image_cleanup import schedule_image_cleanup
+        images = product.images
         db.session.delete(product)
         db.session.commit()
+        # Файлы картинок удаляет фоновая задача
+        schedule_image_cleanup([images], user_id=current_user.id)
         flash('Товар успешно удален', 'success')
         return redirect(url_for('main.dashboard'))
     except Exception as e:
@@ -551,6 +651,9 @@ def profile():
             current_user.set_password(new_password)
             flash('Пароль успешно изменен', 'success')
         db.session.commit()
+        if new_password and new_password.strip():
+            # Смена пароля завершает прочие сессии; текущую продлеваем с новой версией
+            login_user(current_user._get_current_object())
         flash('Данные успешно обновлены', 'success')
         return redirect(url_for('main.profile'))
     return render_template('profile.html')
@@ -606,13 +709,61 @@ def report_product(product_id):
         flash('Выберите причину жалобы', 'error')
     return redirect(url_for('main.product_detail', product_id=product_id))
 
+@main.route('/products/import', methods=['GET', 'POST'])
+@login_required
+def import_products():
+    """Загрузка товаров из CSV/XLSX фоновой задачей; прогресс - /jobs/<id>"""
+    from app.product_import import FIELD_ALIASES, REQUIRED_FIELDS
+
+    if request.method == 'POST':
+        import tempfile
+        from app.jobs import start_job
+
+        file = request.files.get('products_file')
+        if not file or not file.filename:
+            flash('Файл не выбран', 'error')
+            return redirect(url_for('main.import_products'))
+        file_type = file.filename.rsplit('.', 1)[-1].lower() if '.' in file.filename else ''
+        if file_type not in ('csv', 'xlsx'):
+            flash('Поддерживаются файлы CSV и XLSX', 'error')
+            return redirect(url_for('main.import_products'))
+        # Явное сопоставление колонок: map_<поле> = заголовок в файле
+        mapping = {
+            field: request.form.get(f'map_{field}', '').strip()
+            for field in FIELD_ALIASES if request.form.get(f'map_{field}', '').strip()
+        }
+
+        # Файл читает фоновый поток уже после ответа - сохраняем во временный
+        fd, path = tempfile.mkstemp(prefix='products_', suffix=f'.{file_type}')
+        with os.fdopen(fd, 'wb') as tmp:
+            file.save(tmp)
+        job_id = start_job(
+            'import_products', _import_products_job, path, file_type, current_user.id,
+            request.form.get('publish') == 'on', mapping, user_id=current_user.id
+        )
+        return redirect(url_for('main.import_products', job_id=job_id))
+
+    return render_template('import_products.html',
+                           fields=FIELD_ALIASES,
+                           required_fields=REQUIRED_FIELDS,
+                           job_id=request.args.get('job_id'))
+
+def _import_products_job(progress, path, file_type, user_id, publish, mapping):
+    """Импорт товаров из временного файла (фоновая задача)"""
+    from app.product_import import import_products as run_import
+    try:
+        return run_import(progress, path, file_type, user_id, publish=publish, mapping=mapping)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
 @main.route('/favorites')
 @login_required
 def favorites():
-    favorite_products = current_user.favorited_products.all()
-    return render_template('favorites.html', products=favorite_products)
+    return render_template('favorites.html', products=favorite_rows(current_user.id))
 
 @main.route('/user/<int:user_id>/reviews')
+@read_replica
 def user_reviews(user_id):
     user = User.query.get_or_404(user_id)
     reviews = Review.query.filter(
@@ -848,6 +999,7 @@ def get_category_image_by_size(category_id, size='thumbnail'):
     )
 
 @main.route('/api/categories/children/<int:parent_id>')
+@read_replica
 def get_child_categories(parent_id):
     children = Category.query.filter_by(parent_id=parent_id).order_by(Category.name).all()
     return jsonify([{
@@ -865,12 +1017,21 @@ def category_image(filename):
         filename
     )
 
+@main.route('/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    """Состояние фоновой задачи (для опроса прогресса из JS)"""
+    from app.models import BackgroundJob
+    job = BackgroundJob.query.get_or_404(job_id)
+    if job.user_id != current_user.id and not current_user.is_admin:
+        return jsonify({'error': 'Нет доступа'}), 403
+    return jsonify(job.to_dict())
+
 @main.route('/contact_captcha')
 def contact_captcha():
-    from app.utils import generate_captcha_image
-    code, image_io = generate_captcha_image()
-    session['contact_captcha'] = code
-    return send_file(image_io, mimetype='image/png')
+    # id картинки генерирует contact.js: форма есть и на закешированных страницах
+    from app.captcha import captcha_image
+    return captcha_image('contact')
 
 @main.route('/contact', methods=['POST'])
 def contact():
@@ -881,13 +1042,8 @@ def contact():
     contact_info = data.get('contact_info')
     category = data.get('category')
     message = data.get('message')
-    captcha_input = data.get('captcha')
-    captcha_session = session.get('contact_captcha')
-    
-    # Clear captcha
-    session.pop('contact_captcha', None)
-    
-    if not captcha_input or captcha_input != captcha_session:
+    from app.captcha import check_captcha
+    if not check_captcha('contact', data.get('captcha_id'), data.get('captcha', '')):
         return jsonify({'success': False, 'message': 'Неверный код с картинки'}), 400
     
     if not contact_info or not message:
@@ -1,9 +1,12 @@
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, jsonify, request
 from sqlalchemy import text
-import psutil
 import os
 import time
 from app import db
+from app.infra_sampler import infra_sampler
+from app.page_cache import page_cache
+from app.fragment_cache import fragment_cache
+from app.user_cache import user_cache
 
 monitoring_bp = Blueprint('monitoring_bp', __name__, url_prefix='/monitoring')
 
@@ -40,41 +43,18 @@ def app_check():
 
 @monitoring_bp.route('/infra')
 def infra_check():
-    """Мониторинг инфраструктуры (CPU, RAM, Disk)"""
+    """Мониторинг инфраструктуры (CPU, RAM, Disk) — последний снимок фонового сборщика"""
     try:
-        # CPU
-        cpu_percent = psutil.cpu_percent(interval=0.1)
-        
-        # Memory
-        memory = psutil.virtual_memory()
-        memory_info = {
-            "total": memory.total,
-            "available": memory.available,
-            "percent": memory.percent,
-            "used": memory.used
-        }
-
-        # Disk
-        disk = psutil.disk_usage('/')
-        disk_info = {
-            "total": disk.total,
-            "used": disk.used,
-            "free": disk.free,
-            "percent": disk.percent
-        }
-
-        # Uptime (boot time)
-        boot_time = psutil.boot_time()
-        uptime_seconds = time.time() - boot_time
+        infra_sampler.ensure_started()
+        sample = infra_sampler.latest()
+        if sample is None:
+            # Сборщик только что запущен: CPU появится с первым снимком
+            sample = infra_sampler.collect(with_cpu=False)
 
         return jsonify({
             "status": "ok",
-            "cpu": {
-                "percent": cpu_percent
-            },
-            "memory": memory_info,
-            "disk": disk_info,
-            "uptime_seconds": uptime_seconds,
+            **sample,
+            "sample_age_seconds": time.time() - sample['timestamp'],
             "timestamp": time.time()
         }), 200
     except Exception as e:
@@ -82,3 +62,43 @@ def infra_check():
             "status": "error",
             "message": str(e)
         }), 500
+
+@monitoring_bp.route('/infra/history')
+def infra_history():
+    """История снимков для графиков (?window=<секунды>, по умолчанию 300).
+
+    История - ответившего воркера (pid): у каждого воркера свой буфер.
+    """
+    window = request.args.get('window', 300, type=int)
+    infra_sampler.ensure_started()
+    samples = infra_sampler.history(window)
+    return jsonify({
+        "status": "ok",
+        "pid": os.getpid(),
+        "interval": infra_sampler.interval,
+        "samples": [
+            {
+                "timestamp": s['timestamp'],
+                "cpu_percent": s['cpu']['percent'],
+                "memory_percent": s['memory']['percent'],
+                "disk_percent": s['disk']['percent'],
+                "rss": s['process']['rss'],
+                "open_fds": s['process']['open_fds'],
+                "workers": s['gunicorn']['workers'] if s['gunicorn'] else None,
+            }
+            for s in samples
+        ],
+        "timestamp": time.time()
+    }), 200
+
+@monitoring_bp.route('/cache')
+def cache_check():
+    """Кеш страниц, карточек и пользователей: попадания, промахи, доля попаданий (счётчики этого воркера)"""
+    return jsonify({
+        "status": "ok",
+        "pid": os.getpid(),
+        "page": page_cache.stats(),
+        "fragments": fragment_cache.stats(),
+        "users": user_cache.stats(),
+        "timestamp": time.time()
+    }), 200
@@ -0,0 +1,118 @@
+"""Хранилища для кешей HTML (app/fragment_cache.py, app/page_cache.py).
+
+``make_backend(url, max_items)``: ``memory://`` - LRU в памяти воркера,
+``redis://...`` - общий Redis-совместимый сервер (нужен пакет redis),
+``off`` - None (кеш выключен). Значения - строки.
+"""
+import time
+import threading
+from collections import OrderedDict
+
+
+class LRUBackend:
+    """LRU в памяти процесса с необязательным TTL записей"""
+
+    name = 'memory'
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._data = OrderedDict()    # ключ -> (значение, истекает_в | None)
+        self._lock = threading.Lock()
+
+    def _alive(self, key, now):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= now:
+            del self._data[key]
+            return None
+        return item
+
+    def get_many(self, keys):
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                item = self._alive(key, now)
+                if item is not None:
+                    self._data.move_to_end(key)
+                    found[key] = item[0]
+        return found
+
+    def set_many(self, mapping, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            for key, value in mapping.items():
+                self._data[key] = (value, expires)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def add(self, key, value, ttl=None):
+        """Записывает, только если ключа нет (блокировки); True - записано"""
+        with self._lock:
+            if self._alive(key, time.monotonic()) is not None:
+                return False
+        self.set_many({key: value}, ttl)
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def size(self):
+        return len(self._data)
+
+    def clear(self, prefix=''):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+
+class RedisBackend:
+    """Общий кеш воркеров на Redis-совместимом сервере (MGET / SET EX / SET NX)"""
+
+    name = 'redis'
+
+    def __init__(self, url):
+        import redis
+        # Недоступный кеш не должен подвешивать страницу
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+
+    def get_many(self, keys):
+        values = self.client.mget(keys)
+        return {key: value.decode('utf-8') for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, mapping, ttl=None):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.set(key, value, ex=ttl)
+        pipe.execute()
+
+    def add(self, key, value, ttl=None):
+        return bool(self.client.set(key, value, ex=ttl, nx=True))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def size(self):
+        return self.client.dbsize()
+
+    def clear(self, prefix=''):
+        keys = list(self.client.scan_iter(f'{prefix}*', count=1000))
+        for start in range(0, len(keys), 1000):
+            self.client.delete(*keys[start:start + 1000])
+
+
+def make_backend(url, max_items, label):
+    """Хранилище по URL; label - название кеша для лога"""
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            backend = RedisBackend(url)
+            print(f"[OK] {label}: Redis {url.split('@')[-1]}")
+            return backend
+        except ImportError:
+            print(f"[ERROR] {label}: для redis://... нужен пакет redis, используем память процесса")
+    if url == 'off':
+        return None
+    return LRUBackend(max_items)
@@ -0,0 +1,80 @@
+"""Коды капчи с отдельным id на каждую картинку.
+
+Страница выдаёт id (``captcha_id()`` в шаблоне или случайная строка из JS
+на закешированных страницах), картинка запрашивается как
+``/<kind>_captcha?cid=<id>``, форма отправляет id в поле ``captcha_id``.
+Две вкладки с формами больше не перетирают коды друг друга.
+
+С серверными сессиями (app/session_store.py) код хранится в том же
+хранилище отдельным ключом ``captcha:<kind>:<id>`` на CAPTCHA_TTL секунд и
+в сессию не пишется. С cookie-сессиями - в ``session['captchas']``,
+не больше MAX_SESSION_CAPTCHAS последних кодов.
+"""
+import re
+import secrets
+
+from flask import current_app, session, request, send_file, abort
+
+from app.session_store import get_store
+
+CAPTCHA_PREFIX = 'captcha:'
+MAX_SESSION_CAPTCHAS = 5
+_CID_RE = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+def captcha_id():
+    """Новый id капчи для формы (Jinja: {{ captcha_id() }})"""
+    return secrets.token_urlsafe(12)
+
+
+def valid_captcha_id(cid):
+    return bool(cid) and bool(_CID_RE.match(cid))
+
+
+def _key(kind, cid):
+    return f'{CAPTCHA_PREFIX}{kind}:{cid}'
+
+
+def store_captcha(kind, cid, code):
+    store = get_store(current_app)
+    if store is not None:
+        store.set(_key(kind, cid), code, current_app.config.get('CAPTCHA_TTL', 600))
+        return
+    captchas = dict(session.get('captchas', {}))
+    captchas[_key(kind, cid)] = code
+    # dict сохраняет порядок вставки - отбрасываем самые старые
+    session['captchas'] = dict(list(captchas.items())[-MAX_SESSION_CAPTCHAS:])
+
+
+def check_captcha(kind, cid, answer, consume=True):
+    """Совпадает ли ответ с кодом картинки cid; consume - код одноразовый"""
+    if not answer or not valid_captcha_id(cid):
+        return False
+    key = _key(kind, cid)
+    store = get_store(current_app)
+    if store is not None:
+        if consume:
+            expected = store.pop(key)
+        else:
+            stored = store.get(key)
+            expected = stored[0] if stored else None
+    else:
+        captchas = session.get('captchas', {})
+        expected = captchas.get(key)
+        if consume and key in captchas:
+            session['captchas'] = {k: v for k, v in captchas.items() if k != key}
+    return expected is not None and secrets.compare_digest(answer.encode('utf-8'), expected.encode('utf-8'))
+
+
+def captcha_image(kind):
+    """Ответ с картинкой для ``?cid=``; код запоминается под этим id"""
+    from app.utils import generate_captcha_image
+
+    cid = request.args.get('cid', '')
+    if not valid_captcha_id(cid):
+        abort(400)
+    code, image_io = generate_captcha_image()
+    store_captcha(kind, cid, code)
+    response = send_file(image_io, mimetype='image/png')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
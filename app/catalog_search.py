@@ -0,0 +1,325 @@
+"""Фасетный поиск по каталогу.
+
+``search_catalog`` принимает базовые условия (статус, категория, поиск,
+местоположение - ``location_criteria``) и выбранные значения фасетов из query string, возвращает
+страницу товаров и количество товаров по каждому значению каждого фасета.
+
+Счётчики считаются одним запросом: ``UNION ALL`` сгруппированных подзапросов,
+по одному на фасет, плюс общий итог. Для каждого фасета применяются все
+фильтры, кроме его собственного, - так рядом с выбранным «Новое» видно,
+сколько будет «Б/У», если добавить и его. ``GROUPING SETS`` здесь не
+подходит: у всех наборов был бы общий WHERE, и выбранный фасет обнулял бы
+свои же альтернативы; к тому же SQLite его не поддерживает.
+
+Индексы под запросы - ``ix_product_status_created`` (лента) и покрывающий
+``ix_product_facets`` (index-only scan для счётчиков на PostgreSQL), см.
+миграцию и ``scripts/bench_facets.py``.
+"""
+from math import ceil
+
+from sqlalchemy import select, func, case, literal_column, null, union_all, or_, and_
+
+from app import db
+from app.listing import listing_select, load_rows
+from app.models import Product, Region, City
+
+# (ключ, от, до, подпись); границы - [от, до)
+PRICE_RANGES = [
+    ('0-10000', 0, 10000, 'до 10 000 ₽'),
+    ('10000-100000', 10000, 100000, '10 000 – 100 000 ₽'),
+    ('100000-1000000', 100000, 1000000, '100 000 – 1 000 000 ₽'),
+    ('1000000-', 1000000, None, 'от 1 000 000 ₽'),
+]
+
+FACET_LABELS = {
+    'condition': {'new': 'Новое', 'used': 'Б/У'},
+    'delivery': {'1': 'С доставкой', '0': 'Без доставки'},
+    'vat_included': {'1': 'С НДС', '0': 'Без НДС'},
+    'price_type': {'fixed': 'Фиксированная', 'from': 'Цена от', 'negotiable': 'Договорная'},
+    'price_range': {key: label for key, _, _, label in PRICE_RANGES},
+}
+
+FACET_TITLES = {
+    'price_range': 'Цена',
+    'condition': 'Состояние',
+    'delivery': 'Доставка',
+    'vat_included': 'НДС',
+    'price_type': 'Тип цены',
+    'manufacturer': 'Производитель',
+}
+
+FACETS = tuple(FACET_TITLES)
+
+# Сколько производителей показывать (самые частые)
+MANUFACTURER_FACET_LIMIT = 20
+
+
+def _flag(column):
+    return case((column.is_(True), '1'), else_='0')
+
+
+def _price_bucket():
+    return case(
+        *[
+            (and_(Product.price >= low, Product.price < high) if high is not None else Product.price >= low, key)
+            for key, low, high, _ in PRICE_RANGES
+        ],
+        else_=None
+    )
+
+
+def _facet_value(name):
+    """Выражение, по которому группируется фасет (всегда строка)"""
+    if name == 'condition':
+        return Product.condition
+    if name == 'delivery':
+        return _flag(Product.delivery)
+    if name == 'vat_included':
+        return _flag(Product.vat_included)
+    if name == 'price_type':
+        return func.coalesce(Product.price_type, 'fixed')
+    if name == 'manufacturer':
+        return Product.manufacturer
+    if name == 'price_range':
+        return _price_bucket()
+    raise ValueError(f'Неизвестный фасет: {name}')
+
+
+def _flag_criteria(column, values):
+    if values == {'1'}:
+        return column.is_(True)
+    if values == {'0'}:
+        return or_(column.is_(False), column.is_(None))
+    return None
+
+
+def _facet_criteria(name, values):
+    """Условие WHERE для выбранных значений фасета (None - без ограничения)"""
+    values = set(values)
+    if name in ('delivery', 'vat_included'):
+        return _flag_criteria(getattr(Product, name), values)
+    if name == 'price_range':
+        ranges = [
+            and_(Product.price >= low, Product.price < high) if high is not None else Product.price >= low
+            for key, low, high, _ in PRICE_RANGES if key in values
+        ]
+        return or_(*ranges) if ranges else None
+    if name == 'price_type':
+        return func.coalesce(Product.price_type, 'fixed').in_(values)
+    return getattr(Product, name).in_(values)
+
+
+def parse_facet_args(args):
+    """Выбранные значения фасетов из request.args: {'condition': ['new'], ...}"""
+    selected = {}
+    for name in FACETS:
+        values = [v for v in args.getlist(name) if v]
+        if name in FACET_LABELS:
+            values = [v for v in values if v in FACET_LABELS[name]]
+        if values:
+            selected[name] = values
+    return selected
+
+
+def parse_price_bounds(args):
+    """Условия для произвольного диапазона price_min / price_max"""
+    criteria = []
+    for arg, op in (('price_min', '__ge__'), ('price_max', '__le__')):
+        try:
+            value = float(args.get(arg, '').replace(' ', '').replace(',', '.'))
+        except ValueError:
+            continue
+        criteria.append(getattr(Product.price, op)(value))
+    return criteria
+
+
+def filter_criteria(args):
+    """Условия выбранных фасетов и диапазона цены без подсчёта фасетов (для API)"""
+    criteria = [c for c in (_facet_criteria(n, v) for n, v in parse_facet_args(args).items()) if c is not None]
+    return criteria + parse_price_bounds(args)
+
+
+def _region_with_descendants(region_id):
+    children = {}
+    for rid, parent_id in db.session.execute(select(Region.id, Region.parent_id).where(Region.parent_id.isnot(None))):
+        children.setdefault(parent_id, []).append(rid)
+    ids, stack = [], [region_id]
+    while stack:
+        rid = stack.pop()
+        ids.append(rid)
+        stack.extend(children.get(rid, []))
+    return ids
+
+
+def location_criteria(location_id=None, location_name=None):
+    """Условие по местоположению: 'city_12' / 'region_5' из окна выбора города.
+
+    Регион включает подрегионы и все их города (у товара с городом регион
+    заполнен всегда - формами и app/location_backfill.py), поэтому условие -
+    region_id IN (...) по индексу ix_product_region_status_created.
+    Старые ссылки с названием (?location=Казань) сопоставляются со
+    справочником; не найденное название - прежнее сравнение строк.
+    """
+    kind, _, raw_id = (location_id or '').partition('_')
+    if kind in ('city', 'region') and raw_id.isdigit():
+        if kind == 'city':
+            return Product.city_id == int(raw_id)
+        return Product.region_id.in_(_region_with_descendants(int(raw_id)))
+
+    if not location_name or location_name == 'Все регионы':
+        return None
+    # «Казань (Республика Татарстан)» - формат display_name из /api/locations
+    name, _, region_name = location_name.partition(' (')
+    cities = select(City.id).join(Region).where(City.name == name.strip())
+    if region_name:
+        cities = cities.where(Region.name == region_name.rstrip(')').strip())
+    city_ids = db.session.scalars(cities.limit(2)).all()
+    if len(city_ids) == 1:
+        return Product.city_id == city_ids[0]
+    region_id = db.session.scalar(
+        select(Region.id).where(Region.name == location_name.strip()).order_by(Region.parent_id.isnot(None)).limit(1)
+    )
+    if region_id is not None:
+        return Product.region_id.in_(_region_with_descendants(region_id))
+    return (Product.region == location_name) | (Product.city == location_name)
+
+
+def nearby_criteria(location_id, radius_km):
+    """Товары в радиусе radius_km от выбранного города (location_id='city_12').
+
+    Возвращает (условие, {city_id: км}) или (None, None), если город не
+    выбран или у него нет координат - тогда действует обычный фильтр по городу.
+    """
+    kind, _, raw_id = (location_id or '').partition('_')
+    if kind != 'city' or not raw_id.isdigit() or not radius_km:
+        return None, None
+    from app.geo import cities_within
+    nearby = cities_within(int(raw_id), radius_km)
+    if nearby is None:
+        return None, None
+    distances = dict(nearby)
+    return Product.city_id.in_(list(distances)), distances
+
+
+def distance_order(distances):
+    """ORDER BY по расстоянию до города товара (ближние первыми)"""
+    return case(
+        {city_id: round(km, 1) for city_id, km in distances.items()},
+        value=Product.city_id,
+        else_=None
+    ).asc()
+
+
+class FacetValue:
+    __slots__ = ('value', 'label', 'count', 'selected')
+
+    def __init__(self, value, label, count, selected):
+        self.value = value
+        self.label = label
+        self.count = count
+        self.selected = selected
+
+
+class CatalogPage:
+    """Страница результатов вместе со счётчиками фасетов"""
+
+    def __init__(self, items, total, page, per_page, facets, selected):
+        self.items = items
+        self.total = total
+        self.page = page
+        self.per_page = per_page
+        self.facets = facets
+        self.selected = selected
+
+    @property
+    def pages(self):
+        return max(1, ceil(self.total / self.per_page))
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+
+def facet_counts_query(base_criteria, selected):
+    """UNION ALL: итог и по подзапросу на фасет (колонки facet, value, cnt)"""
+    facet_filters = {name: _facet_criteria(name, values) for name, values in selected.items()}
+
+    def where(exclude=None):
+        return list(base_criteria) + [
+            criteria for name, criteria in facet_filters.items()
+            if name != exclude and criteria is not None
+        ]
+
+    parts = [
+        select(literal_column("'_total'").label('facet'), null().label('value'), func.count().label('cnt'))
+        .select_from(Product)
+        .where(*where())
+    ]
+    for name in FACETS:
+        value = _facet_value(name).label('value')
+        parts.append(
+            # Имя фасета - константа из FACETS, подставляется литералом
+            select(literal_column(f"'{name}'").label('facet'), value, func.count().label('cnt'))
+            .select_from(Product)
+            .where(*where(exclude=name))
+            .group_by(value)
+        )
+    return union_all(*parts)
+
+
+def facet_counts(base_criteria, selected):
+    """Счётчики всех фасетов и общий итог одним запросом.
+
+    Возвращает (total, {фасет: {значение: количество}}).
+    """
+    total = 0
+    counts = {name: {} for name in FACETS}
+    for facet, value, cnt in db.session.execute(facet_counts_query(base_criteria, selected)):
+        if facet == '_total':
+            total = cnt
+        elif value not in (None, ''):
+            counts[facet][str(value)] = cnt
+    return total, counts
+
+
+def _facet_values(name, counts, selected):
+    chosen = set(selected.get(name, []))
+    labels = FACET_LABELS.get(name)
+    if labels:
+        # Фиксированный порядок; выбранные значения видны даже с нулём
+        keys = [key for key in labels if counts.get(key) or key in chosen]
+    else:
+        keys = sorted(counts, key=lambda k: (-counts[k], k))[:MANUFACTURER_FACET_LIMIT]
+        keys += [key for key in chosen if key not in keys]
+    return [
+        FacetValue(key, labels.get(key, key) if labels else key, counts.get(key, 0), key in chosen)
+        for key in keys
+    ]
+
+
+def search_catalog(base_criteria, args, page=1, per_page=60, order_by=()):
+    """Страница каталога и фасеты.
+
+    base_criteria - условия вне фасетов (статус, категория, поиск, локация);
+    args - request.args; order_by - сортировка перед «новые сверху»
+    (например, distance_order). Товары страницы - ProductRow (app/listing.py).
+    """
+    selected = parse_facet_args(args)
+    base_criteria = list(base_criteria) + parse_price_bounds(args)
+
+    total, counts = facet_counts(base_criteria, selected)
+    facets = {name: _facet_values(name, counts[name], selected) for name in FACETS}
+
+    criteria = [c for c in (_facet_criteria(n, v) for n, v in selected.items()) if c is not None]
+    page = max(1, page)
+    items = load_rows(
+        listing_select(*base_criteria, *criteria)
+        .order_by(*order_by, Product.created_at.desc(), Product.id.desc())
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+    )
+    return CatalogPage(items, total, page, per_page, facets, selected)
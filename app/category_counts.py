@@ -0,0 +1,222 @@
+"""Счётчики опубликованных товаров по категориям (таблица category_product_count).
+
+Изменения через ORM (создание, публикация, снятие, смена категории,
+удаление, ``update_status`` при истечении срока) учитываются автоматически
+слушателем сессии. Массовые ``UPDATE``/``DELETE`` мимо ORM должны передать
+изменения в ``apply_category_deltas`` (см. ``expire_published``).
+Полный пересчёт - ``refresh_category_counts`` / ``flask refresh-category-counts``.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, inspect, select, update, delete, func
+
+from app import db
+from app.models import Product, Review, CategoryProductCount, user_favorites
+
+_PENDING_KEY = 'category_count_deltas'
+_STATS_KEY = 'catalog_stats_stale'
+
+
+def _insert():
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(CategoryProductCount)
+
+
+def _is_published(status):
+    # status ещё не заполнен значением по умолчанию до INSERT
+    return status is None or status == Product.STATUS_PUBLISHED
+
+
+def _old_value(state, attr):
+    history = state.attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(state.obj(), attr)
+
+
+def apply_category_deltas(deltas, connection=None, session=None):
+    """Прибавляет {category_id: +-n} к счётчикам (upsert).
+
+    Снимок catalog_stats сбрасывается после коммита сессии: сброс до коммита
+    дал бы параллельному запросу перечитать ещё старые счётчики и держать их
+    как свежие CATALOG_STATS_TTL секунд.
+    """
+    rows = [
+        {'category_id': category_id, 'published': delta}
+        for category_id, delta in deltas.items() if category_id and delta
+    ]
+    if not rows:
+        return
+    stmt = _insert().values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['category_id'],
+        set_={'published': CategoryProductCount.published + stmt.excluded.published}
+    )
+    (connection or db.session).execute(stmt)
+    queue_catalog_invalidation(session or db.session())
+
+
+def queue_catalog_invalidation(session):
+    """Сброс снимка catalog_stats после коммита сессии (для изменений мимо ORM)"""
+    session.info[_STATS_KEY] = True
+
+
+def expire_published(*criteria):
+    """Переводит просроченные опубликованные товары в «Готов к публикации».
+
+    Один UPDATE ... RETURNING; счётчики категорий уменьшаются на число
+    снятых товаров. Возвращает количество обновлённых строк.
+    """
+    now = datetime.utcnow()
+    rows = db.session.execute(
+        update(Product)
+        .where(Product.status == Product.STATUS_PUBLISHED, Product.expires_at <= now, *criteria)
+        .values(status=Product.STATUS_READY_FOR_PUBLICATION, updated_at=now)
+        .returning(Product.id, Product.category_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    category_ids = [category_id for _, category_id in rows]
+    apply_category_deltas({cid: -n for cid, n in Counter(category_ids).items()})
+    _queue_page_invalidation(rows)
+    return len(rows)
+
+
+def publish_products(*criteria):
+    """Публикует (продлевает) снятые и готовые к публикации товары на 30 дней,
+    как ``Product.publish``. Возвращает количество обновлённых строк."""
+    now = datetime.utcnow()
+    rows = db.session.execute(
+        update(Product)
+        .where(
+            Product.status.in_([Product.STATUS_UNPUBLISHED, Product.STATUS_READY_FOR_PUBLICATION]),
+            *criteria
+        )
+        .values(status=Product.STATUS_PUBLISHED, expires_at=now + timedelta(days=30), updated_at=now)
+        .returning(Product.id, Product.category_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    apply_category_deltas(Counter(category_id for _, category_id in rows))
+    _queue_page_invalidation(rows)
+    return len(rows)
+
+
+def unpublish_products(*criteria):
+    """Снимает опубликованные товары с публикации; возвращает количество"""
+    rows = db.session.execute(
+        update(Product)
+        .where(Product.status == Product.STATUS_PUBLISHED, *criteria)
+        .values(status=Product.STATUS_UNPUBLISHED, updated_at=datetime.utcnow())
+        .returning(Product.id, Product.category_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    apply_category_deltas({cid: -n for cid, n in Counter(category_id for _, category_id in rows).items()})
+    _queue_page_invalidation(rows)
+    return len(rows)
+
+
+def delete_products(*criteria):
+    """Удаляет товары по условию одним DELETE ... RETURNING с учётом счётчиков.
+
+    Возвращает удалённые строки (id, category_id, status, images) - по ним
+    после коммита удаляются файлы картинок (app/image_cleanup.py).
+    """
+    # Ссылки на товары без ON DELETE: избранное удаляем, у отзывов - обнуляем
+    product_ids = select(Product.id).where(*criteria)
+    db.session.execute(delete(user_favorites).where(user_favorites.c.product_id.in_(product_ids)))
+    db.session.execute(
+        update(Review).where(Review.product_id.in_(product_ids)).values(product_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    rows = db.session.execute(
+        delete(Product)
+        .where(*criteria)
+        .returning(Product.id, Product.category_id, Product.status, Product.images)
+        .execution_options(synchronize_session=False)
+    ).all()
+    deltas = Counter()
+    for _, category_id, status, _ in rows:
+        if status == Product.STATUS_PUBLISHED:
+            deltas[category_id] -= 1
+    apply_category_deltas(deltas)
+    _queue_page_invalidation(rows)
+    return rows
+
+
+def _queue_page_invalidation(rows):
+    # Страницы товаров и лент их категорий - после коммита (app/page_cache.py)
+    from app.page_cache import queue_invalidation
+    queue_invalidation(db.session(), {row[0] for row in rows}, {row[1] for row in rows})
+
+
+def refresh_category_counts():
+    """Полный пересчёт счётчиков одним сгруппированным запросом"""
+    db.session.execute(delete(CategoryProductCount))
+    db.session.execute(
+        _insert().from_select(
+            ['category_id', 'published'],
+            select(Product.category_id, func.count(Product.id))
+            .where(Product.status == Product.STATUS_PUBLISHED)
+            .group_by(Product.category_id)
+        )
+    )
+    db.session.commit()
+
+    from app.category_stats import invalidate_catalog_stats
+    invalidate_catalog_stats()
+
+
+def _collect_deltas(session, flush_context, instances):
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Product) and _is_published(obj.status):
+            deltas[obj.category_id] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Product):
+            state = inspect(obj)
+            if _old_value(state, 'status') == Product.STATUS_PUBLISHED:
+                deltas[_old_value(state, 'category_id')] -= 1
+    for obj in session.dirty:
+        if not isinstance(obj, Product) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        if not (state.attrs.status.history.has_changes() or state.attrs.category_id.history.has_changes()):
+            continue
+        if _old_value(state, 'status') == Product.STATUS_PUBLISHED:
+            deltas[_old_value(state, 'category_id')] -= 1
+        if obj.status == Product.STATUS_PUBLISHED:
+            deltas[obj.category_id] += 1
+    if deltas:
+        session.info.setdefault(_PENDING_KEY, Counter()).update(deltas)
+
+
+def _apply_deltas(session, flush_context):
+    deltas = session.info.pop(_PENDING_KEY, None)
+    if deltas:
+        apply_category_deltas(deltas, connection=session.connection(), session=session)
+
+
+def _invalidate_stats(session):
+    if session.info.pop(_STATS_KEY, None):
+        from app.category_stats import invalidate_catalog_stats
+        invalidate_catalog_stats()
+
+
+def _discard_deltas(session, previous_transaction=None):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_STATS_KEY, None)
+
+
+def register_listeners(session_class):
+    """Подключает учёт счётчиков к классу сессии приложения"""
+    if event.contains(session_class, 'before_flush', _collect_deltas):
+        return
+    event.listen(session_class, 'before_flush', _collect_deltas)
+    event.listen(session_class, 'after_flush', _apply_deltas)
+    event.listen(session_class, 'after_commit', _invalidate_stats)
+    event.listen(session_class, 'after_soft_rollback', _discard_deltas)
@@ -0,0 +1,236 @@
+"""Статистика по дереву категорий.
+
+Количество товаров (собственных и вместе с потомками) и дочерних категорий
+считается для всего дерева одним сгруппированным запросом; свёртка по дереву
+выполняется в памяти. Используется админкой категорий, очисткой пустых
+категорий и каталогом (id потомков для фильтра по категории).
+
+Каталогу полный подсчёт по товарам не по карману, поэтому для него дерево
+строится из поддерживаемых счётчиков (CategoryProductCount, см.
+app/category_counts.py) и кешируется в процессе на CATALOG_STATS_TTL секунд.
+"""
+import time
+import threading
+
+from flask import current_app
+from sqlalchemy import func, case, select, exists, delete
+
+from app import db
+from app.models import Category, Product, CategoryProductCount
+
+
+class CategoryStat:
+    __slots__ = (
+        'category', 'products', 'published', 'total_products', 'total_published', 'children'
+    )
+
+    def __init__(self, category, products, published):
+        self.category = category
+        self.products = products            # товары непосредственно в категории
+        self.published = published          # из них опубликованные
+        self.total_products = products      # вместе с потомками
+        self.total_published = published
+        self.children = []                  # CategoryStat дочерних категорий, по имени
+
+    @property
+    def id(self):
+        return self.category.id
+
+    @property
+    def children_count(self):
+        return len(self.children)
+
+    @property
+    def is_empty_leaf(self):
+        return self.products == 0 and not self.children
+
+
+class CategoryStats:
+    """Снимок дерева категорий со счётчиками товаров"""
+
+    def __init__(self, rows):
+        self.nodes = {}
+        for category, products, published in rows:
+            self.nodes[category.id] = CategoryStat(category, products, published)
+
+        self.roots = []
+        for node in self.nodes.values():
+            parent = self.nodes.get(node.category.parent_id)
+            (parent.children if parent else self.roots).append(node)
+        for node in self.nodes.values():
+            node.children.sort(key=lambda n: n.category.name)
+        self.roots.sort(key=lambda n: n.category.name)
+
+        # Свёртка снизу вверх: потомки перед родителями
+        for node in reversed(list(self.walk())):
+            for child in node.children:
+                node.total_products += child.total_products
+                node.total_published += child.total_published
+
+    def walk(self, nodes=None):
+        """Обход в глубину в порядке отображения (родитель перед детьми)"""
+        stack = list(reversed(self.roots if nodes is None else nodes))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def get(self, category_id):
+        return self.nodes.get(category_id)
+
+    def root(self, category_id):
+        """Узел верхнего уровня ветки категории (None - категории нет в снимке)"""
+        node = self.nodes.get(category_id)
+        while node is not None and node.category.parent_id in self.nodes:
+            node = self.nodes[node.category.parent_id]
+        return node
+
+    def ancestor_ids(self, category_id):
+        """id категории и всех её предков (снизу вверх)"""
+        ids = [category_id]
+        node = self.nodes.get(category_id)
+        while node is not None and node.category.parent_id in self.nodes:
+            ids.append(node.category.parent_id)
+            node = self.nodes[node.category.parent_id]
+        return ids
+
+    def descendant_ids(self, category_id):
+        """id категории и всех её потомков"""
+        node = self.nodes.get(category_id)
+        if node is None:
+            return [category_id]
+        return [n.id for n in self.walk([node])]
+
+    def choices(self, hide_empty=False):
+        """Плоский список для выпадающих списков (формат get_category_choices).
+
+        hide_empty - пропускать ветки без опубликованных товаров.
+        """
+        choices = []
+        levels = {}
+        for node in self.walk():
+            if hide_empty and not node.total_published:
+                continue
+            level = levels.get(node.category.parent_id, -1) + 1
+            levels[node.id] = level
+            choices.append({
+                'id': node.id,
+                'name': node.category.name,
+                'level': level,
+                'display_name': ('— ' * level) + node.category.name,
+                'count': node.total_published
+            })
+        return choices
+
+    @property
+    def total_products(self):
+        return sum(node.products for node in self.nodes.values())
+
+    @property
+    def with_images(self):
+        return sum(1 for node in self.nodes.values() if node.category.image)
+
+
+def load_category_stats():
+    """Все категории со счётчиками товаров одним запросом"""
+    counts = (
+        select(
+            Product.category_id.label('category_id'),
+            func.count(Product.id).label('products'),
+            func.sum(case((Product.status == Product.STATUS_PUBLISHED, 1), else_=0)).label('published'),
+        )
+        .group_by(Product.category_id)
+        .subquery()
+    )
+    rows = db.session.execute(
+        select(
+            Category,
+            func.coalesce(counts.c.products, 0),
+            func.coalesce(counts.c.published, 0),
+        ).outerjoin(counts, counts.c.category_id == Category.id)
+    ).all()
+    return CategoryStats(rows)
+
+
+# generation растёт при каждом сбросе: снимок, загрузка которого началась до
+# сброса, сохраняется уже устаревшим
+_catalog_cache = {'stats': None, 'loaded_at': 0.0, 'generation': 0}
+_catalog_lock = threading.Lock()
+
+
+def load_catalog_stats():
+    """Дерево категорий с опубликованными товарами из таблицы счётчиков.
+
+    Узлы - строки (id, name, parent_id, image, color), а не ORM-объекты:
+    снимок переживает запрос и кешируется в процессе.
+    """
+    rows = db.session.execute(
+        select(
+            Category.id, Category.name, Category.parent_id, Category.image, Category.color,
+            func.coalesce(CategoryProductCount.published, 0).label('published'),
+        ).outerjoin(CategoryProductCount, CategoryProductCount.category_id == Category.id)
+    ).all()
+    return CategoryStats((row, row.published, row.published) for row in rows)
+
+
+def catalog_stats():
+    """Кешированный снимок load_catalog_stats()"""
+    ttl = current_app.config.get('CATALOG_STATS_TTL', 60)
+    with _catalog_lock:
+        stats = _catalog_cache['stats']
+        if stats is not None and time.monotonic() - _catalog_cache['loaded_at'] < ttl:
+            return stats
+        generation = _catalog_cache['generation']
+    stats = load_catalog_stats()
+    with _catalog_lock:
+        _catalog_cache['stats'] = stats
+        fresh = _catalog_cache['generation'] == generation
+        _catalog_cache['loaded_at'] = time.monotonic() if fresh else float('-inf')
+    return stats
+
+
+def cached_catalog_stats():
+    """Последний снимок без перезагрузки (None - ещё не загружался).
+
+    Для случаев, где нужна только структура дерева и нельзя ходить в БД
+    (например, после коммита сессии).
+    """
+    return _catalog_cache['stats']
+
+
+def invalidate_catalog_stats():
+    """Помечает кеш процесса устаревшим; остальные воркеры обновятся по TTL"""
+    with _catalog_lock:
+        _catalog_cache['loaded_at'] = float('-inf')
+        _catalog_cache['generation'] += 1
+
+
+def delete_empty_categories():
+    """Удаляет пустые категории (без товаров и подкатегорий).
+
+    Один DELETE на уровень дерева: запрос повторяется, пока что-то удаляется,
+    поэтому уходят и родители, опустевшие после удаления листьев. Возвращает
+    количество удалённых категорий.
+
+    DELETE идёт мимо ORM, поэтому снимок catalog_stats и ленты в кеше страниц
+    сбрасываются явно - после коммита сессии.
+    """
+    from app.category_counts import queue_catalog_invalidation
+    from app.page_cache import queue_invalidation
+
+    child = db.aliased(Category)
+    deleted = 0
+    while True:
+        count = db.session.execute(
+            delete(Category)
+            .where(~exists().where(Product.category_id == Category.id))
+            .where(~exists().where(child.parent_id == Category.id))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not count:
+            break
+        deleted += count
+    if deleted:
+        queue_catalog_invalidation(db.session())
+        queue_invalidation(db.session(), tags={'listing', 'category-all'})
+    return deleted
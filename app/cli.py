@@ -0,0 +1,245 @@
+import os
+import json
+
+import click
+
+from flask import current_app
+from sqlalchemy import inspect, text
+from werkzeug.security import generate_password_hash
+
+from app import db
+
+
+def migrate_database():
+    """Автоматическая миграция базы данных"""
+    print("[INFO] Проверяем необходимость миграции...")
+
+    try:
+        # Проверяем существование колонки status
+        inspector = inspect(db.engine)
+        columns = [col['name'] for col in inspector.get_columns('product')]
+
+        if 'status' not in columns:
+            print("[INFO] Обнаружена старая структура БД, применяем миграцию...")
+
+            # Добавляем колонку status
+            db.session.execute(text('ALTER TABLE product ADD COLUMN status INTEGER DEFAULT 1'))
+            print("[OK] Добавлена колонка status")
+
+            # Добавляем колонку expires_at
+            db.session.execute(text('ALTER TABLE product ADD COLUMN expires_at TIMESTAMP'))
+            print("[OK] Добавлена колонка expires_at")
+
+            # Обновляем существующие записи
+            db.session.execute(text("UPDATE product SET status = 1 WHERE status IS NULL"))
+            db.session.execute(text("UPDATE product SET expires_at = NOW() + INTERVAL '30 days' WHERE expires_at IS NULL"))
+
+            db.session.commit()
+            print("[SUCCESS] Миграция базы данных завершена успешно!")
+        else:
+            print("[OK] Структура базы данных актуальна")
+
+    except Exception as e:
+        print(f"[ERROR] Ошибка при миграции: {e}")
+        db.session.rollback()
+
+
+def create_default_categories():
+    """Создает готовую структуру категорий для неликвидов из JSON файла"""
+    from app.models import Category
+
+    try:
+        with open('categories_structure.json', 'r', encoding='utf-8') as f:
+            categories_structure = json.load(f)
+    except FileNotFoundError:
+        print("[ERROR] Файл categories_structure.json не найден")
+        # Создаем базовые категории вручную
+        categories_structure = [
+            {
+                "name": "Электроника",
+                "description": "Электронные устройства и компоненты",
+                "children": [
+                    {"name": "Смартфоны", "description": "Мобильные телефоны"},
+                    {"name": "Ноутбуки", "description": "Портативные компьютеры"},
+                    {"name": "Компьютеры", "description": "Стационарные ПК и комплектующие"}
+                ]
+            },
+            {
+                "name": "Одежда",
+                "description": "Одежда и аксессуары",
+                "children": [
+                    {"name": "Мужская одежда", "description": ""},
+                    {"name": "Женская одежда", "description": ""},
+                    {"name": "Детская одежда", "description": ""}
+                ]
+            }
+        ]
+
+    def create_categories(parent_id=None, categories_list=None):
+        for category_data in categories_list:
+            # Проверяем, существует ли уже категория с таким именем
+            existing_category = Category.query.filter_by(name=category_data['name'], parent_id=parent_id).first()
+            if not existing_category:
+                category = Category(
+                    name=category_data['name'],
+                    description=category_data.get('description', ''),
+                    parent_id=parent_id
+                )
+                db.session.add(category)
+                db.session.flush()  # Получаем ID созданной категории
+                print(f"[OK] Создана категория: {category_data['name']}")
+
+                # Рекурсивно создаем дочерние категории
+                if 'children' in category_data:
+                    create_categories(category.id, category_data['children'])
+
+    if Category.query.count() == 0:
+        create_categories(None, categories_structure)
+        db.session.commit()
+        print('[OK] Структура категорий создана')
+    else:
+        print('[INFO] Категории уже существуют в базе данных')
+
+
+def create_default_admin():
+    """Создает первого администратора если его нет"""
+    from app.models import User
+
+    admin_email = 'admin@example.com'
+    admin_user = User.query.filter_by(email=admin_email).first()
+    if not admin_user:
+        hashed_password = generate_password_hash('admin123')
+        admin_user = User(
+            company_name='Администратор системы',
+            email=admin_email,
+            password_hash=hashed_password,
+            phone='+7 (999) 123-45-67',
+            inn='1234567890',
+            role='admin'
+        )
+        db.session.add(admin_user)
+        db.session.commit()
+        print('[OK] Создан администратор: admin@example.com / admin123')
+
+
+def check_upload_folder():
+    """Создает папку загрузок и проверяет, что в нее можно писать"""
+    upload_folder = current_app.config.get('UPLOAD_FOLDER')
+    if not upload_folder:
+        return
+    try:
+        os.makedirs(upload_folder, exist_ok=True)
+        test_file = os.path.join(upload_folder, 'test.txt')
+        with open(test_file, 'w') as f:
+            f.write('test')
+        os.remove(test_file)
+        print(f"[OK] Папка загрузок доступна для записи: {upload_folder} (файлов: {len(os.listdir(upload_folder))})")
+    except Exception as e:
+        print(f"[ERROR] Ошибка папки загрузок: {e}")
+
+
+def register_commands(app):
+    """Регистрирует CLI-команды приложения"""
+
+    @app.cli.command('bootstrap')
+    def bootstrap():
+        """Однократная подготовка: миграция, категории, администратор, папка загрузок.
+
+        Запускается один раз перед стартом воркеров (см. Dockerfile, render.yaml),
+        а не при импорте приложения в каждом воркере.
+        """
+        migrate_database()
+        create_default_categories()
+        create_default_admin()
+        check_upload_folder()
+        print("[OK] База данных готова к работе")
+
+    @app.cli.command('refresh-category-counts')
+    def refresh_category_counts_command():
+        """Полный пересчёт счётчиков опубликованных товаров по категориям.
+
+        Счётчики поддерживаются инкрементально; команда нужна после ручных
+        правок в БД и для периодической сверки (cron).
+        """
+        from app.category_counts import refresh_category_counts
+        refresh_category_counts()
+        print("[OK] Счётчики товаров по категориям пересчитаны")
+
+    @app.cli.command('backfill-locations')
+    def backfill_locations_command():
+        """Проставляет region_id/city_id товарам, у которых есть только названия"""
+        from app.location_backfill import backfill_product_locations
+        result = backfill_product_locations()
+        print(f"[OK] Проверено товаров: {result['scanned']}, привязано: {result['updated']}")
+
+    @app.cli.command('load-city-coordinates')
+    @click.argument('path', default='city_coordinates.csv')
+    def load_city_coordinates_command(path):
+        """Загружает координаты городов из CSV (по умолчанию - city_coordinates.csv)"""
+        from app.geo import load_city_coordinates
+        result = load_city_coordinates(path)
+        print(f"[OK] Строк в файле: {result['rows']}, координаты проставлены городам: {result['updated']}")
+
+    @app.cli.command('purge-sessions')
+    def purge_sessions_command():
+        """Удаляет истёкшие серверные сессии и коды капчи (SESSION_BACKEND=db)"""
+        from app.session_store import get_store
+        store = get_store(app)
+        if store is None:
+            print("[INFO] Сессии хранятся в cookie, чистить нечего")
+            return
+        print(f"[OK] Удалено истёкших записей: {store.purge()}")
+
+    @app.cli.command('generate-feeds')
+    @click.option('--full', is_flag=True, help='Пересобрать все блоки, а не только изменившиеся')
+    def generate_feeds_command(full):
+        """Пересобирает YML-фид и sitemap в FEED_DIR (для cron, если FEED_INTERVAL=0)"""
+        from app.feeds import generate_feeds
+        result = generate_feeds(app, full=full)
+        yml = result['yml']
+        state = 'записан' if yml['written'] else 'без изменений'
+        print(f"[OK] YML: {yml['offers']} предложений, блоков {yml['buckets']}, "
+              f"изменено {yml['changed']}, файл {state} ({result['seconds']} с)")
+        sitemap = result['sitemap']
+        state = 'записан' if sitemap['written'] else 'без изменений'
+        print(f"[OK] Sitemap: {sitemap['urls']} ссылок, файлов товаров {sitemap['shards']}, "
+              f"изменено {sitemap['changed']}, индекс {state}")
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Минифицирует static/css и static/js в static/dist с хешем в имени, .gz и .br (шаг деплоя)"""
+        import time
+        from app.assets import assets, build_assets, load_manifest
+
+        started = time.perf_counter()
+        stats = build_assets(app.static_folder)
+        assets.manifest = load_manifest(assets.dist_dir)
+        br = f", brotli {stats['br'] / 1024:.0f} КБ" if stats['br'] is not None else ''
+        print(f"[OK] Статика: файлов {stats['files']}, {stats['source'] / 1024:.0f} КБ -> "
+              f"{stats['minified'] / 1024:.0f} КБ, gzip {stats['gzip'] / 1024:.0f} КБ{br}, "
+              f"удалено устаревших {stats['removed']}, {(time.perf_counter() - started) * 1000:.0f} мс")
+        if stats['br'] is None:
+            print("[WARN] Пакет Brotli не установлен: .br-копии не созданы")
+
+    @app.cli.command('precompile-templates')
+    @click.option('--clear', is_flag=True, help='Очистить кеш байткода перед компиляцией')
+    def precompile_templates_command(clear):
+        """Компилирует все шаблоны в кеш байткода TEMPLATE_CACHE_DIR (шаг деплоя)"""
+        import time
+        from app.templating import compile_templates
+
+        env = app.jinja_env
+        if env.bytecode_cache is None:
+            print("[WARN] TEMPLATE_CACHE_DIR не задан: шаблоны будут скомпилированы, но не сохранены")
+        elif clear:
+            env.bytecode_cache.clear()
+            env.cache.clear()
+        started = time.perf_counter()
+        names = env.list_templates()
+        loaded, errors = compile_templates(env, names)
+        for name, error in errors:
+            print(f"[ERROR] {name}: {error}")
+        print(f"[OK] Скомпилировано шаблонов: {loaded} из {len(names)} "
+              f"за {(time.perf_counter() - started) * 1000:.0f} мс -> {app.config.get('TEMPLATE_CACHE_DIR') or '-'}")
+        if errors:
+            raise SystemExit(1)
@@ -0,0 +1,141 @@
+"""Маршрутизация чтения на реплики PostgreSQL.
+
+Реплики задаются в DATABASE_REPLICA_URLS (через запятую) и регистрируются
+как binds ``replica_0``, ``replica_1``... (см. config.py). Представления,
+помеченные ``@read_replica`` (или целый blueprint через
+``read_replica_blueprint``), читают с реплики; запись, flush и всё прочее
+идёт на primary.
+
+После собственного POST пользователь REPLICA_STICKY_SECONDS секунд читает
+с primary (read-your-writes). Реплика, которая отстаёт больше
+REPLICA_MAX_LAG секунд или недоступна, исключается до следующей проверки.
+"""
+import time
+import random
+import logging
+import threading
+from functools import wraps
+
+from flask import g, session, request, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text, Select
+
+logger = logging.getLogger(__name__)
+
+STICKY_SESSION_KEY = '_db_primary_until'
+
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaRouter:
+    """Выбирает здоровую реплику и следит за её отставанием"""
+
+    def __init__(self):
+        self.max_lag = 1.0
+        self.check_interval = 5.0
+        self.sticky_seconds = 5
+        self._health = {}  # bind key -> (healthy, checked_at)
+        self._lock = threading.Lock()
+
+    def init_app(self, app, db):
+        self.max_lag = app.config.get('REPLICA_MAX_LAG', 1.0)
+        self.check_interval = app.config.get('REPLICA_CHECK_INTERVAL', 5.0)
+        self.sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 5)
+
+        with app.app_context():
+            replica_keys = self.replica_keys(db.engines)
+            for key in replica_keys:
+                self._watch_disconnects(key, db.engines[key])
+
+        @app.after_request
+        def remember_write(response):
+            # Read-your-writes: после изменяющего запроса читаем с primary.
+            # Без реплик метка не нужна - не перезаписываем сессию на каждый POST
+            if replica_keys and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+                session[STICKY_SESSION_KEY] = time.time() + self.sticky_seconds
+            return response
+
+    @staticmethod
+    def replica_keys(engines):
+        return [key for key in engines if key and key.startswith('replica_')]
+
+    def _watch_disconnects(self, key, engine):
+        @event.listens_for(engine, 'handle_error')
+        def mark_down(context):
+            if context.is_disconnect:
+                logger.warning(f"Реплика {key} недоступна, чтение переключено на primary")
+                self._set_health(key, False)
+
+    def _set_health(self, key, healthy):
+        with self._lock:
+            self._health[key] = (healthy, time.monotonic())
+
+    def _is_healthy(self, key, engine):
+        state = self._health.get(key)
+        if state and time.monotonic() - state[1] < self.check_interval:
+            return state[0]
+        try:
+            with engine.connect() as conn:
+                lag = float(conn.execute(LAG_QUERY).scalar() or 0)
+            healthy = lag <= self.max_lag
+            if not healthy:
+                logger.warning(f"Реплика {key} отстаёт на {lag:.1f} c, чтение с primary")
+        except Exception as e:
+            logger.warning(f"Реплика {key} не отвечает: {e}")
+            healthy = False
+        self._set_health(key, healthy)
+        return healthy
+
+    def pick(self, engines):
+        """Случайная здоровая реплика или None"""
+        keys = self.replica_keys(engines)
+        random.shuffle(keys)
+        for key in keys:
+            if self._is_healthy(key, engines[key]):
+                return engines[key]
+        return None
+
+
+replica_router = ReplicaRouter()
+
+
+def _reads_from_replica():
+    if not has_request_context() or not g.get('use_replica'):
+        return False
+    return session.get(STICKY_SESSION_KEY, 0) < time.time()
+
+
+class RoutingSession(Session):
+    """Сессия Flask-SQLAlchemy, отправляющая SELECT помеченных представлений на реплику"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and isinstance(clause, Select) and _reads_from_replica():
+            engine = replica_router.pick(self._db.engines)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _enable_replica():
+    g.use_replica = True
+
+
+def read_replica(view):
+    """Декоратор: представление допускает чтение с реплики (отставание до REPLICA_MAX_LAG)"""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        _enable_replica()
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def read_replica_blueprint(blueprint):
+    """Включает чтение с реплики для всех представлений blueprint"""
+    blueprint.before_request(_enable_replica)
+    return blueprint
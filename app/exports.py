@@ -0,0 +1,237 @@
+"""Потоковая выгрузка таблиц в CSV/XLSX (товары, пользователи, заявки).
+
+Строки читаются серверным курсором (``yield_per``: на PostgreSQL - именованный
+курсор psycopg) только нужными колонками и сразу уходят клиенту генератором
+ответа, поэтому память воркера не зависит от размера таблицы.
+
+CSV (разделитель ``;``, UTF-8 с BOM - открывается в Excel) отдаётся кусками
+по мере чтения. XLSX собирается openpyxl в режиме write_only (строки пишутся
+во временный файл, а не держатся в памяти) и отдаётся после сборки.
+``?gzip=1`` сжимает поток на лету (файл ``.csv.gz`` / ``.xlsx.gz``).
+
+Колонки товаров совпадают с заголовками загрузки (app/product_import.py):
+выгруженный файл можно отредактировать и загрузить обратно - импорт читает
+«Тип цены» и снимает апостроф, которым экранированы ячейки-формулы.
+"""
+import io
+import csv
+import zlib
+import tempfile
+from datetime import datetime
+
+from flask import Response, stream_with_context
+from sqlalchemy import select
+
+from app import db
+from app.models import Product, User, ContactRequest
+
+FORMATS = ('csv', 'xlsx')
+# Строк за одну выборку курсора и за один кусок CSV-ответа
+YIELD_PER = 1000
+CSV_CHUNK_ROWS = 500
+
+_MIMETYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+# Значения, которые Excel воспринял бы как формулу
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Column:
+    """Колонка выгрузки: заголовок, выражение SELECT и форматирование значения"""
+
+    def __init__(self, title, expression, format=None):
+        self.title = title
+        self.expression = expression
+        self.format = format
+
+
+def _status_text(status):
+    return {
+        Product.STATUS_PUBLISHED: 'Опубликован',
+        Product.STATUS_UNPUBLISHED: 'Снят с публикации',
+        Product.STATUS_READY_FOR_PUBLICATION: 'Готов к публикации',
+    }.get(status, '')
+
+
+def _price_text(price_type):
+    return {'from': 'от', 'negotiable': 'договорная'}.get(price_type, '')
+
+
+def _flag(value):
+    return 'да' if value else 'нет'
+
+
+def _condition(value):
+    return 'б/у' if value == 'used' else 'новое'
+
+
+def _category_paths():
+    """category_id -> «Родитель / Дочерняя» из снимка дерева категорий"""
+    from app.category_stats import catalog_stats
+
+    stats = catalog_stats()
+    paths = {}
+    for category_id in stats.nodes:
+        names = [stats.get(cid).category.name for cid in reversed(stats.ancestor_ids(category_id))]
+        paths[category_id] = ' / '.join(names)
+    return paths
+
+
+def product_columns(with_seller=False):
+    """Колонки выгрузки товаров; with_seller - для админа (email продавца)"""
+    paths = _category_paths()
+    columns = [
+        Column('ID', Product.id),
+        Column('Наименование', Product.title),
+        Column('Категория', Product.category_id, lambda value: paths.get(value, '')),
+        Column('Цена', Product.price),
+        Column('Тип цены', Product.price_type, _price_text),
+        Column('Количество', Product.quantity),
+        Column('Производитель', Product.manufacturer),
+        Column('Регион', Product.region),
+        Column('Город', Product.city),
+        Column('Состояние', Product.condition, _condition),
+        Column('НДС', Product.vat_included, _flag),
+        Column('Доставка', Product.delivery, _flag),
+        Column('Статус', Product.status, _status_text),
+        Column('Просмотры', Product.view_count),
+        Column('Создан', Product.created_at),
+        Column('Опубликован до', Product.expires_at),
+        Column('Описание', Product.description),
+    ]
+    if with_seller:
+        columns.insert(1, Column('Продавец', User.email))
+    return columns
+
+
+def product_export(criteria=(), with_seller=False):
+    """(колонки, SELECT) товаров по условию; порядок - по id"""
+    columns = product_columns(with_seller)
+    stmt = select(*[column.expression for column in columns]).where(*criteria).order_by(Product.id)
+    if with_seller:
+        stmt = stmt.join(User, User.id == Product.user_id)
+    return columns, stmt
+
+
+USER_COLUMNS = (
+    Column('ID', User.id),
+    Column('Email', User.email),
+    Column('Имя пользователя', User.username),
+    Column('Организация', User.company_name),
+    Column('ИНН', User.inn),
+    Column('Контактное лицо', User.contact_person),
+    Column('Должность', User.position),
+    Column('Телефон', User.phone),
+    Column('Отрасль', User.industry),
+    Column('Роль', User.role),
+    Column('Активен', User.is_active, _flag),
+    Column('Подтверждён', User.confirmed_at),
+    Column('Зарегистрирован', User.created_at),
+)
+
+
+def user_export(criteria=()):
+    return USER_COLUMNS, select(*[c.expression for c in USER_COLUMNS]).where(*criteria).order_by(User.id)
+
+
+CONTACT_REQUEST_COLUMNS = (
+    Column('ID', ContactRequest.id),
+    Column('Дата', ContactRequest.created_at),
+    Column('Тема', ContactRequest.category),
+    Column('Контакт', ContactRequest.contact_info),
+    Column('Статус', ContactRequest.status),
+    Column('Сообщение', ContactRequest.message),
+)
+
+
+def contact_request_export():
+    columns = CONTACT_REQUEST_COLUMNS
+    return columns, select(*[c.expression for c in columns]).order_by(ContactRequest.id)
+
+
+def _cell(value, column, as_text):
+    if column.format is not None:
+        value = column.format(value)
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S') if as_text else value
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_rows(stmt):
+    """Строки SELECT серверным курсором, по YIELD_PER за выборку"""
+    yield from db.session.execute(stmt, execution_options={'yield_per': YIELD_PER})
+
+
+def iter_csv(columns, stmt):
+    """Куски CSV (bytes): BOM и заголовок, затем по CSV_CHUNK_ROWS строк"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    buffer.write('\ufeff')
+    writer.writerow([column.title for column in columns])
+    for count, row in enumerate(iter_rows(stmt), 1):
+        writer.writerow([_cell(value, column, True) for value, column in zip(row, columns)])
+        if count % CSV_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def iter_xlsx(columns, stmt, sheet_title='Выгрузка', chunk_size=64 * 1024):
+    """Куски XLSX (bytes): книга write_only во временном файле, затем чтение кусками"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_title)
+    sheet.append([column.title for column in columns])
+    for row in iter_rows(stmt):
+        sheet.append([_cell(value, column, False) for value, column in zip(row, columns)])
+    with tempfile.TemporaryFile() as tmp:
+        workbook.save(tmp)
+        tmp.seek(0)
+        yield from iter(lambda: tmp.read(chunk_size), b'')
+
+
+def gzip_chunks(chunks, level=6):
+    """Сжимает поток кусков в формат gzip"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(columns, stmt, filename, file_format='csv', gzip=False, sheet_title='Выгрузка'):
+    """Response с потоковой выгрузкой; filename - без расширения"""
+    if file_format not in FORMATS:
+        raise ValueError(f'Неизвестный формат выгрузки: {file_format}')
+    if file_format == 'xlsx':
+        # Без openpyxl - ошибка до начала ответа, а не посреди потока
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            raise ValueError('Для выгрузки XLSX на сервере нужен пакет openpyxl; выберите CSV')
+        chunks = iter_xlsx(columns, stmt, sheet_title)
+    else:
+        chunks = iter_csv(columns, stmt)
+
+    filename = f'{filename}_{datetime.utcnow():%Y%m%d_%H%M}.{file_format}'
+    mimetype = _MIMETYPES[file_format]
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    # Прокси (nginx) не должен буферизовать ответ целиком
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,409 @@
+"""Фид товаров для агрегаторов в формате YML (Яндекс Маркет).
+
+Фид пишется в файл FEED_DIR/yandex.yml и отдаётся статически
+(/feeds/yandex.yml, ETag и Last-Modified по файлу). Каталог - дерево
+Category, предложения - опубликованные товары с ценой, картинками и регионом.
+
+Предложения читаются серверным курсором (``yield_per``) и пишутся в файл
+по одному (строка XML на предложение), весь каталог в памяти не собирается. Товары разбиты на
+блоки по BUCKET_SIZE id; у каждого блока - подпись (количество, max
+updated_at, сумма id), и при пересборке заново пишутся только блоки с
+изменившейся подписью. Итоговый файл склеивается из блоков во временный файл
+и атомарно подменяет прежний (``os.replace``); если не изменилось ничего,
+файл не трогается и ETag остаётся прежним.
+
+Пересборка (вместе с sitemap, app/sitemap.py) - раз в FEED_INTERVAL секунд фоновым потоком воркера (файловая
+блокировка не даёт нескольким воркерам собирать фид одновременно) или
+командой ``flask generate-feeds`` из cron.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from datetime import datetime
+from urllib.parse import quote
+from xml.sax.saxutils import escape, quoteattr
+
+from flask import current_app, url_for
+from sqlalchemy import select, func, or_
+
+from app import db
+from app.models import Product, Category
+from app.utils import _deserialize_images
+
+YML_FILENAME = 'yandex.yml'
+BUCKET_SIZE = 5000
+YIELD_PER = 1000
+# Ограничения формата YML
+MAX_PICTURES = 10
+DESCRIPTION_LENGTH = 3000
+
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _clean(value):
+    return _INVALID_XML_CHARS.sub('', str(value))
+
+
+def _element(name, text=None, attrs=None):
+    """Элемент XML строкой; текст и атрибуты экранируются"""
+    attrs = ''.join(f' {key}={quoteattr(_clean(value))}' for key, value in (attrs or {}).items())
+    if text is None:
+        return f'<{name}{attrs}/>'
+    return f'<{name}{attrs}>{escape(_clean(text))}</{name}>'
+
+
+def _url_prefix(endpoint, **values):
+    """Адрес endpoint без последнего сегмента: url_for один раз на сборку, а не на товар"""
+    return url_for(endpoint, _external=True, **values).rsplit('/', 1)[0] + '/'
+
+
+def atomic_write(path, write):
+    """Вызывает write(file) для временного файла рядом с path и подменяет path"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _load_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(path, manifest):
+    atomic_write(path, lambda f: f.write(json.dumps(manifest).encode('utf-8')))
+
+
+def offer_criteria():
+    """Товары в фиде: опубликованные с ценой (YML требует цену)"""
+    return [Product.status == Product.STATUS_PUBLISHED, Product.price > 0]
+
+
+def bucket_signatures(criteria, size=BUCKET_SIZE):
+    """{номер блока: [количество, max updated_at, сумма id]} одним GROUP BY"""
+    bucket = Product.id // size
+    rows = db.session.execute(
+        select(bucket, func.count(), func.max(Product.updated_at), func.sum(Product.id))
+        .where(*criteria)
+        .group_by(bucket)
+    ).all()
+    return {
+        str(number): [count, updated_at.isoformat() if updated_at else None, int(id_sum or 0)]
+        for number, count, updated_at, id_sum in rows
+    }
+
+
+def bucket_ranges(buckets, size=BUCKET_SIZE):
+    """Условие «id в одном из блоков buckets»"""
+    return or_(*[
+        Product.id.between(int(number) * size, (int(number) + 1) * size - 1)
+        for number in buckets
+    ])
+
+
+class YmlFeed:
+    """Сборка YML-фида в каталоге directory"""
+
+    def __init__(self, directory, site_url, shop_name, company):
+        self.directory = directory
+        self.parts_dir = os.path.join(directory, 'yml')
+        self.path = os.path.join(directory, YML_FILENAME)
+        self.manifest_path = os.path.join(self.parts_dir, 'manifest.json')
+        self.site_url = site_url
+        self.shop_name = shop_name
+        self.company = company
+
+    def _part_path(self, number):
+        return os.path.join(self.parts_dir, f'offers-{number}.xml')
+
+    def _settings(self):
+        # Смена адреса сайта или формата - полная пересборка блоков
+        return hashlib.md5(f'{self.site_url}|{MAX_PICTURES}|{DESCRIPTION_LENGTH}|1'.encode()).hexdigest()
+
+    def _categories_xml(self):
+        rows = db.session.execute(
+            select(Category.id, Category.name, Category.parent_id).order_by(Category.id)
+        ).all()
+        known = {row.id for row in rows}
+        parts = ['<categories>']
+        for row in rows:
+            attrs = {'id': row.id}
+            if row.parent_id in known:
+                attrs['parentId'] = row.parent_id
+            parts.append(_element('category', row.name, attrs))
+        parts.append('</categories>')
+        return ''.join(parts).encode('utf-8')
+
+    @staticmethod
+    def _offer_xml(row, product_url, upload_url):
+        parts = [
+            f'<offer id="{row.id}" available="true">',
+            _element('name', row.title),
+            f'<url>{escape(product_url)}{row.id}</url>',
+            _element('price', f'{row.price:.2f}', {'from': 'true'} if row.price_type == 'from' else None),
+            '<currencyId>RUR</currencyId>',
+            f'<categoryId>{row.category_id}</categoryId>',
+        ]
+        pictures = [
+            image for image in _deserialize_images(row.images)
+            if isinstance(image, str)
+        ][:MAX_PICTURES]
+        for image in pictures:
+            if image.startswith('http'):
+                parts.append(_element('picture', image))
+            else:
+                parts.append(_element('picture', upload_url + quote(image)))
+        parts.append('<delivery>true</delivery>' if row.delivery else '<delivery>false</delivery>')
+        if row.manufacturer:
+            parts.append(_element('vendor', row.manufacturer))
+        if row.description:
+            parts.append(_element('description', row.description))
+        if row.quantity:
+            parts.append(f'<count>{row.quantity}</count>')
+        if row.condition == 'used':
+            parts.append('<condition type="preowned"><quality>good</quality></condition>')
+        if row.region:
+            parts.append(_element('param', row.region, {'name': 'Регион'}))
+        if row.city:
+            parts.append(_element('param', row.city, {'name': 'Город'}))
+        parts.append(_element('param', 'с НДС' if row.vat_included else 'без НДС', {'name': 'НДС'}))
+        parts.append('</offer>')
+        return ''.join(parts).encode('utf-8')
+
+    def _write_parts(self, buckets, criteria):
+        """Перезаписывает файлы блоков buckets одним проходом курсора по id"""
+        stmt = (
+            select(
+                Product.id, Product.title, Product.price, Product.price_type, Product.category_id,
+                Product.images, Product.delivery, Product.manufacturer, Product.quantity,
+                Product.condition, Product.region, Product.city, Product.vat_included,
+                func.substr(Product.description, 1, DESCRIPTION_LENGTH).label('description'),
+            )
+            .where(*criteria, bucket_ranges(buckets))
+            .order_by(Product.id)
+        )
+        product_url = _url_prefix('main.product_detail', product_id=1)
+        upload_url = _url_prefix('main.serve_uploaded_file', filename='x')
+        current, handle, tmp_path = None, None, None
+
+        def close():
+            nonlocal handle
+            if handle is not None:
+                handle.close()
+                handle = None
+                os.replace(tmp_path, self._part_path(current))
+
+        try:
+            for row in db.session.execute(stmt, execution_options={'yield_per': YIELD_PER}):
+                number = str(row.id // BUCKET_SIZE)
+                if number != current:
+                    close()
+                    current = number
+                    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=self.parts_dir)
+                    handle = os.fdopen(fd, 'wb')
+                handle.write(self._offer_xml(row, product_url, upload_url))
+            close()
+        except BaseException:
+            if handle is not None:
+                handle.close()
+                os.remove(tmp_path)
+            raise
+
+    def _assemble(self, categories_xml, buckets, generated_at):
+        def write(f):
+            f.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+            f.write(''.join([
+                f'<yml_catalog date="{generated_at:%Y-%m-%dT%H:%M}+00:00"><shop>',
+                _element('name', self.shop_name),
+                _element('company', self.company),
+                _element('url', self.site_url + '/'),
+                '<currencies>', _element('currency', None, {'id': 'RUR', 'rate': '1'}), '</currencies>',
+            ]).encode('utf-8'))
+            f.write(categories_xml)
+            f.write(b'<offers>')
+            for number in sorted(buckets, key=int):
+                with open(self._part_path(number), 'rb') as part:
+                    while chunk := part.read(1024 * 1024):
+                        f.write(chunk)
+            f.write(b'</offers></shop></yml_catalog>\n')
+
+        atomic_write(self.path, write)
+
+    def generate(self, full=False):
+        """Пересобирает фид; возвращает {'offers', 'buckets', 'changed', 'written'}"""
+        os.makedirs(self.parts_dir, exist_ok=True)
+        manifest = {} if full else _load_manifest(self.manifest_path)
+        if manifest.get('settings') != self._settings():
+            manifest = {}
+
+        criteria = offer_criteria()
+        signatures = bucket_signatures(criteria)
+        previous = manifest.get('buckets', {})
+        changed = [
+            number for number, signature in signatures.items()
+            if previous.get(number) != signature or not os.path.exists(self._part_path(number))
+        ]
+        removed = [number for number in previous if number not in signatures]
+
+        categories_xml = self._categories_xml()
+        categories_hash = hashlib.md5(categories_xml).hexdigest()
+
+        if changed:
+            self._write_parts(changed, criteria)
+        for number in removed:
+            if os.path.exists(self._part_path(number)):
+                os.remove(self._part_path(number))
+
+        written = bool(changed or removed or manifest.get('categories') != categories_hash
+                       or not os.path.exists(self.path))
+        if written:
+            self._assemble(categories_xml, signatures, datetime.utcnow())
+        _save_manifest(self.manifest_path, {
+            'settings': self._settings(),
+            'categories': categories_hash,
+            'buckets': signatures,
+            'generated_at': datetime.utcnow().isoformat(),
+        })
+        return {
+            'offers': sum(signature[0] for signature in signatures.values()),
+            'buckets': len(signatures),
+            'changed': len(changed) + len(removed),
+            'written': written,
+        }
+
+
+def yml_feed(app=None):
+    app = app or current_app
+    return YmlFeed(
+        app.config['FEED_DIR'], app.config['SITE_URL'], app.config['SITE_NAME'], app.config['SITE_COMPANY']
+    )
+
+
+def generate_feeds(app, full=False):
+    """Пересборка всех фидов с адресами от SITE_URL (вне запроса)"""
+    with app.test_request_context(base_url=app.config['SITE_URL']):
+        started = time.monotonic()
+        result = {'yml': yml_feed(app).generate(full=full)}
+        from app.sitemap import sitemap
+        result['sitemap'] = sitemap(app).generate(full=full)
+        db.session.remove()
+    result['seconds'] = round(time.monotonic() - started, 2)
+    return result
+
+
+class _DirectoryLock:
+    """Неблокирующая межпроцессная блокировка каталога фидов (flock)"""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, '.lock')
+        self.handle = None
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.handle = open(self.path, 'a')
+        try:
+            import fcntl
+        except ImportError:
+            return True
+        try:
+            fcntl.flock(self.handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            self.handle.close()
+            self.handle = None
+            return False
+
+    def release(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+class FeedScheduler:
+    """Фоновый поток воркера, пересобирающий фиды раз в FEED_INTERVAL секунд.
+
+    Как и сборщик метрик, поток стартует лениво в каждом процессе (после
+    fork gunicorn). Сборку выполняет тот воркер, который первым взял
+    блокировку каталога, и только если фид не собирали последние interval
+    секунд.
+    """
+
+    def __init__(self):
+        self.interval = 0
+        self.app = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self.last_result = None
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('FEED_INTERVAL', 3600)
+        app.extensions['feed_scheduler'] = self
+        if self.interval:
+            app.before_request(self.ensure_started)
+
+    def ensure_started(self):
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='feed-scheduler', daemon=True)
+            self._thread.start()
+
+    def trigger(self):
+        """Собрать фиды сейчас (например, файла ещё нет)"""
+        self.ensure_started()
+        self._wake.set()
+
+    def _is_fresh(self):
+        manifest = os.path.join(self.app.config['FEED_DIR'], 'yml', 'manifest.json')
+        try:
+            return time.time() - os.path.getmtime(manifest) < self.interval * 0.9
+        except OSError:
+            return False
+
+    def run_once(self, force=False):
+        lock = _DirectoryLock(self.app.config['FEED_DIR'])
+        if not lock.acquire():
+            return None
+        try:
+            if not force and self._is_fresh():
+                return None
+            self.last_result = generate_feeds(self.app)
+            print(f"[OK] Фиды пересобраны: {self.last_result}")
+            return self.last_result
+        except Exception as e:
+            print(f"[ERROR] Сборка фидов: {e}")
+            return None
+        finally:
+            lock.release()
+
+    def _run(self):
+        # Первая сборка - сразу после старта, если фид устарел или его нет
+        force = False
+        while self._pid == os.getpid():
+            self.run_once(force=force)
+            force = self._wake.wait(self.interval or None)
+            self._wake.clear()
+
+
+feed_scheduler = FeedScheduler()
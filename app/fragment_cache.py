@@ -0,0 +1,204 @@
+"""Кеш HTML-фрагментов карточек товаров.
+
+Карточка в ленте (partials/product_grid.html) и в списке
+(partials/product_list.html) одинакова для всех посетителей, поэтому готовый
+HTML хранится по ключу (id товара, версия, вариант). Версия - ``updated_at``
+товара (сдвигается при любых изменениях, кроме просмотров, см.
+``_bump_versions`` и ``expire_published``) и отпечаток категории из снимка
+``catalog_stats()``: переименование или смена цвета категории тоже дают новый
+ключ. Старые записи не удаляются, а вытесняются LRU / истекают по TTL.
+
+Личное в закешированный HTML не попадает: избранное, счётчик просмотров и
+расстояние подставляются на место меток ``<!--card:...-->`` при каждом запросе.
+
+Хранилище - FRAGMENT_CACHE_URL: ``memory://`` - LRU в памяти воркера
+(FRAGMENT_CACHE_SIZE записей), ``redis://...`` - общий Redis-совместимый
+сервер (нужен пакет redis), ``off`` - без кеша.
+"""
+import zlib
+from datetime import datetime
+
+from flask import current_app
+from flask_login import current_user
+from markupsafe import Markup
+from sqlalchemy import event, inspect, select
+
+from app import db
+from app.cache_backends import make_backend
+from app.models import Product, user_favorites
+
+# Увеличить при изменении шаблонов карточек: в общем Redis лежит HTML
+# от предыдущей версии приложения
+FRAGMENT_VERSION = 1
+
+CARD_TEMPLATES = {
+    'grid': 'partials/product_card_grid.html',
+    'list': 'partials/product_card_list.html',
+}
+SLOTS_TEMPLATE = 'partials/product_card_slots.html'
+
+VIEWS_SLOT = '<!--card:views-->'
+DISTANCE_SLOT = '<!--card:distance-->'
+# Метка -> макрос из SLOTS_TEMPLATE (только для вошедших пользователей)
+FAVORITE_SLOTS = {
+    '<!--card:favorite-mobile-->': 'favorite_mobile',
+    '<!--card:favorite-->': 'favorite_button',
+    '<!--card:favorite-badge-->': 'favorite_badge',
+}
+
+# Поля, изменение которых не меняет карточку
+_UNVERSIONED = {'view_count', 'updated_at'}
+
+
+class FragmentCache:
+    def __init__(self):
+        self.backend = None
+        self.ttl = 86400
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.ttl = app.config.get('FRAGMENT_CACHE_TTL', 86400)
+        self.backend = make_backend(
+            app.config.get('FRAGMENT_CACHE_URL', 'memory://'),
+            app.config.get('FRAGMENT_CACHE_SIZE', 5000),
+            'Кеш карточек'
+        )
+
+        app.jinja_env.globals['product_cards'] = product_cards
+        app.extensions['fragment_cache'] = self
+
+    def get_many(self, keys):
+        if self.backend is None or not keys:
+            return {}
+        try:
+            found = self.backend.get_many(keys)
+        except Exception as e:
+            print(f"[ERROR] Кеш карточек недоступен: {e}")
+            found = {}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, mapping):
+        if self.backend is None or not mapping:
+            return
+        try:
+            self.backend.set_many(mapping, self.ttl)
+        except Exception as e:
+            print(f"[ERROR] Кеш карточек недоступен: {e}")
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear('card:')
+
+    def stats(self):
+        """Для мониторинга: хранилище, попадания, промахи, размер"""
+        size = None
+        if self.backend is not None:
+            try:
+                size = self.backend.size()
+            except Exception:
+                pass
+        requests = self.hits + self.misses
+        return {
+            'backend': self.backend.name if self.backend else 'off',
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / requests, 3) if requests else None,
+            'size': size,
+        }
+
+
+fragment_cache = FragmentCache()
+
+
+def _card_category(product, stats):
+    """(категория, цвет рамки) для карточки: из снимка catalog_stats без запросов"""
+    node = stats.get(product.category_id)
+    if node is not None:
+        category, root = node.category, stats.root(product.category_id).category
+    else:
+        # Категория новее снимка - берём из ORM, как раньше
+        category = product.product_category
+        root = category.get_ancestors()[0] if category else None
+    border_color = root.color if root is not None and root.color else '#e0e0e0'
+    return category, border_color
+
+
+def card_key(product, variant, category, border_color):
+    version = f'{product.updated_at:%Y%m%d%H%M%S%f}' if product.updated_at else '0'
+    appearance = f'{category.id}|{category.name}|{category.color}|{border_color}' if category else border_color
+    stamp = zlib.crc32(appearance.encode('utf-8'))
+    return f'card:{FRAGMENT_VERSION}:{variant}:{product.id}:{version}:{stamp:x}'
+
+
+def _favorite_ids(products):
+    """id избранных среди products одним запросом (None - гость)"""
+    if not current_user.is_authenticated:
+        return None
+    return set(db.session.scalars(
+        select(user_favorites.c.product_id).where(
+            user_favorites.c.user_id == current_user.id,
+            user_favorites.c.product_id.in_([p.id for p in products])
+        )
+    ))
+
+
+def product_cards(products, variant='grid', distances=None):
+    """HTML карточек в порядке products (Jinja: {{ product_cards(products) }})"""
+    products = list(products)
+    if not products:
+        return []
+    from app.category_stats import catalog_stats
+
+    stats = catalog_stats()
+    env = current_app.jinja_env
+    appearance = [_card_category(product, stats) for product in products]
+    keys = [card_key(product, variant, *look) for product, look in zip(products, appearance)]
+
+    fragments = fragment_cache.get_many(keys)
+    rendered = {}
+    template = None
+    for product, key, (category, border_color) in zip(products, keys, appearance):
+        if key in fragments:
+            continue
+        template = template or env.get_template(CARD_TEMPLATES[variant])
+        rendered[key] = fragments[key] = template.render(
+            product=product, category=category, border_color=border_color
+        )
+    fragment_cache.set_many(rendered)
+
+    favorite_ids = _favorite_ids(products)
+    slots = env.get_template(SLOTS_TEMPLATE).module if favorite_ids is not None else None
+    cards = []
+    for product, key in zip(products, keys):
+        html = fragments[key].replace(VIEWS_SLOT, str(product.view_count or 0))
+        if DISTANCE_SLOT in html:
+            km = distances.get(product.city_id) if distances else None
+            html = html.replace(DISTANCE_SLOT, f' · {round(km)} км' if km is not None else '')
+        for marker, macro in FAVORITE_SLOTS.items():
+            if marker in html:
+                html = html.replace(marker, str(getattr(slots, macro)(product.id, product.id in favorite_ids)) if slots else '')
+        cards.append(Markup(html))
+    return cards
+
+
+def _bump_versions(session, flush_context, instances):
+    now = datetime.utcnow()
+    for obj in session.dirty:
+        if not isinstance(obj, Product) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        if any(
+            state.attrs[key].history.has_changes()
+            for key in state.mapper.column_attrs.keys() if key not in _UNVERSIONED
+        ):
+            obj.updated_at = now
+
+
+def register_listeners(session_class):
+    """Сдвигает Product.updated_at при flush изменённых товаров"""
+    if event.contains(session_class, 'before_flush', _bump_versions):
+        return
+    event.listen(session_class, 'before_flush', _bump_versions)
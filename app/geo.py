@@ -0,0 +1,184 @@
+"""Поиск городов в радиусе N км от заданного города.
+
+На PostgreSQL с установленным PostGIS запрос идёт в БД (``ST_DWithin`` по
+функциональному GiST-индексу ``ix_city_geog``, см. миграцию). Иначе (SQLite,
+PostgreSQL без PostGIS) используется ``GeoIndex`` - сетка 1°×1° в памяти
+процесса: проверяются только ячейки, пересекающие окружность, расстояние
+уточняется по формуле гаверсинусов. Городов - тысячи, поэтому индекс
+строится за миллисекунды и кешируется на GEO_INDEX_TTL секунд.
+"""
+import time
+import threading
+from math import radians, degrees, sin, cos, asin, sqrt, floor, pi
+
+from flask import current_app
+from sqlalchemy import select, update, text
+
+from app import db
+from app.models import City
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Расстояние по дуге большого круга, км"""
+    lat1, lon1, lat2, lon2 = map(radians, (lat1, lon1, lat2, lon2))
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+
+
+class GeoIndex:
+    """Сеточный индекс точек (id, широта, долгота)"""
+
+    CELL_DEG = 1.0
+
+    def __init__(self, points):
+        self.points = {}
+        self.cells = {}
+        for point_id, lat, lon in points:
+            self.points[point_id] = (lat, lon)
+            self.cells.setdefault(self._cell(lat, lon), []).append(point_id)
+
+    def _cell(self, lat, lon):
+        return int(floor(lat / self.CELL_DEG)), int(floor(lon / self.CELL_DEG)) % int(360 / self.CELL_DEG)
+
+    def __len__(self):
+        return len(self.points)
+
+    def get(self, point_id):
+        return self.points.get(point_id)
+
+    def within(self, lat, lon, radius_km):
+        """[(id, расстояние_км)] в радиусе, по возрастанию расстояния"""
+        # Угловой радиус - в тех же единицах, что и haversine_km
+        angle = radius_km / EARTH_RADIUS_KM
+        dlat = degrees(angle)
+        lat_low, lat_high = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+        # Полуширина сферической шапки по долготе: asin(sin d / cos φ);
+        # шапка, накрывающая полюс, занимает все долготы
+        if radians(abs(lat)) + angle >= pi / 2:
+            dlon = 180.0
+        else:
+            dlon = min(180.0, degrees(asin(min(1.0, sin(angle) / cos(radians(lat))))))
+
+        row_low, col_low = self._cell(lat_low, lon - dlon)
+        row_high, _ = self._cell(lat_high, lon)
+        columns = int(360 / self.CELL_DEG)
+        col_span = min(columns - 1, int(floor((lon + dlon) / self.CELL_DEG)) - int(floor((lon - dlon) / self.CELL_DEG)))
+
+        found = []
+        for row in range(row_low, row_high + 1):
+            for offset in range(col_span + 1):
+                for point_id in self.cells.get((row, (col_low + offset) % columns), ()):
+                    p_lat, p_lon = self.points[point_id]
+                    distance = haversine_km(lat, lon, p_lat, p_lon)
+                    if distance <= radius_km:
+                        found.append((point_id, distance))
+        found.sort(key=lambda item: item[1])
+        return found
+
+
+_cache = {'index': None, 'loaded_at': 0.0, 'postgis': None}
+_lock = threading.Lock()
+
+
+def city_geo_index():
+    """GeoIndex по городам с координатами (кеш процесса)"""
+    ttl = current_app.config.get('GEO_INDEX_TTL', 300)
+    with _lock:
+        index = _cache['index']
+        if index is not None and time.monotonic() - _cache['loaded_at'] < ttl:
+            return index
+    rows = db.session.execute(
+        select(City.id, City.latitude, City.longitude)
+        .where(City.latitude.isnot(None), City.longitude.isnot(None))
+    ).all()
+    index = GeoIndex(rows)
+    with _lock:
+        _cache['index'] = index
+        _cache['loaded_at'] = time.monotonic()
+    return index
+
+
+def invalidate_geo_index():
+    with _lock:
+        _cache['index'] = None
+
+
+def postgis_available():
+    """Установлен ли PostGIS в основной БД (проверяется один раз на процесс)"""
+    if _cache['postgis'] is None:
+        available = False
+        if db.engine.dialect.name == 'postgresql':
+            available = db.session.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'postgis'")
+            ).first() is not None
+        _cache['postgis'] = available
+    return _cache['postgis']
+
+
+def _cities_within_postgis(lat, lon, radius_km):
+    # Выражение совпадает с индексом ix_city_geog
+    rows = db.session.execute(text("""
+        SELECT id, ST_Distance(
+                   geography(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)),
+                   geography(ST_SetSRID(ST_MakePoint(:lon, :lat), 4326))
+               ) / 1000.0 AS distance_km
+        FROM city
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+          AND ST_DWithin(
+                   geography(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)),
+                   geography(ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)),
+                   :meters)
+        ORDER BY distance_km
+    """), {'lat': lat, 'lon': lon, 'meters': radius_km * 1000}).all()
+    return [(row.id, row.distance_km) for row in rows]
+
+
+def cities_within(city_id, radius_km):
+    """Города в радиусе от города city_id: [(id, км)] по возрастанию.
+
+    None - у города нет координат (вызывающий код фильтрует по самому городу).
+    """
+    if postgis_available():
+        origin = db.session.execute(
+            select(City.latitude, City.longitude).where(City.id == city_id)
+        ).first()
+        if origin is None or origin.latitude is None or origin.longitude is None:
+            return None
+        return _cities_within_postgis(origin.latitude, origin.longitude, radius_km)
+
+    index = city_geo_index()
+    origin = index.get(city_id)
+    if origin is None:
+        return None
+    return index.within(origin[0], origin[1], radius_km)
+
+
+def load_city_coordinates(path):
+    """Проставляет координаты существующим городам из CSV
+    (регион;город;широта;долгота - формат загрузки локаций, см. city_coordinates.csv).
+
+    Город ищется по названию в своём регионе, иначе - по однозначному названию.
+    Возвращает {'rows', 'updated'}.
+    """
+    from app.location_import import iter_csv_rows
+    from app.location_backfill import LocationResolver
+
+    resolver = LocationResolver()
+    rows = changes = 0
+    updates = {}
+    for region_name, city_name, coords in iter_csv_rows(path):
+        rows += 1
+        if not coords:
+            continue
+        city_id = resolver.city_id(city_name, resolver.region_id(region_name))
+        if city_id is not None:
+            updates[city_id] = {'id': city_id, 'latitude': coords[0], 'longitude': coords[1]}
+    if updates:
+        # UPDATE по первичному ключу пачкой (executemany)
+        db.session.execute(update(City), list(updates.values()))
+        db.session.commit()
+        changes = len(updates)
+        invalidate_geo_index()
+    return {'rows': rows, 'updated': changes}
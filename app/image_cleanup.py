@@ -0,0 +1,56 @@
+"""Удаление файлов картинок удалённых товаров фоновой задачей.
+
+Запрос на удаление товаров не ждёт файловую систему: после коммита имена
+файлов передаются задаче ``cleanup_images`` (app/jobs.py), которая удаляет
+их из UPLOAD_FOLDER. Внешние ссылки (http...) и имена с путями пропускаются.
+"""
+import os
+
+from flask import current_app
+
+from app.jobs import start_job
+from app.utils import _deserialize_images
+
+
+def image_files(images_values):
+    """Имена локальных файлов из значений Product.images"""
+    filenames = []
+    for images in images_values:
+        for filename in _deserialize_images(images):
+            if not isinstance(filename, str) or filename.startswith('http'):
+                continue
+            if not filename or os.path.basename(filename) != filename:
+                continue
+            filenames.append(filename)
+    return filenames
+
+
+def remove_upload_files(progress, upload_folder, filenames):
+    """Задача: удаляет файлы из upload_folder, прогресс - по числу файлов"""
+    removed = missing = failed = 0
+    for done, filename in enumerate(filenames, 1):
+        try:
+            os.remove(os.path.join(upload_folder, filename))
+            removed += 1
+        except FileNotFoundError:
+            missing += 1
+        except OSError as e:
+            failed += 1
+            print(f"[ERROR] Не удалось удалить {filename}: {e}")
+        progress.update(done, len(filenames))
+    progress.update(len(filenames), len(filenames), force=True)
+    return {'removed': removed, 'missing': missing, 'failed': failed}
+
+
+def schedule_image_cleanup(images_values, user_id=None):
+    """Запускает удаление файлов; вызывать после коммита удаления товаров.
+
+    Возвращает id задачи или None, если удалять нечего.
+    """
+    filenames = image_files(images_values)
+    if not filenames:
+        return None
+    return start_job(
+        'cleanup_images', remove_upload_files, current_app.config['UPLOAD_FOLDER'], filenames,
+        user_id=user_id, total=len(filenames)
+    )
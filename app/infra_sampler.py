@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+import logging
+from collections import deque
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+class InfraSampler:
+    """Фоновый сборщик метрик инфраструктуры.
+
+    Раз в ``MONITORING_SAMPLE_INTERVAL`` секунд снимает CPU, память, диск,
+    RSS и открытые дескрипторы процесса и число воркеров gunicorn, и кладёт
+    снимок в кольцевой буфер. Эндпоинты мониторинга только читают буфер,
+    поэтому проба не блокирует воркер.
+
+    Буфер свой у каждого воркера gunicorn: история на графике - это история
+    ответившего воркера (его pid есть в ответе /monitoring/infra/history).
+    CPU процесса и системы - среднее за интервал между снимками, поэтому
+    первый снимок появляется через интервал после запуска сборщика.
+    """
+
+    def __init__(self):
+        self.interval = 5
+        self.disk_path = '/'
+        self._samples = deque(maxlen=120)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._process = None
+
+    def init_app(self, app):
+        """Читает настройки из конфига (поток стартует лениво, см. ``ensure_started``)"""
+        self.interval = app.config.get('MONITORING_SAMPLE_INTERVAL', 5)
+        self.disk_path = app.config.get('MONITORING_DISK_PATH', '/')
+        history_size = app.config.get('MONITORING_HISTORY_SIZE', 120)
+        with self._lock:
+            self._samples = deque(self._samples, maxlen=history_size)
+
+    def ensure_started(self):
+        """Запускает поток в текущем процессе.
+
+        Потоки не переживают fork, поэтому pid проверяется при каждом вызове:
+        после форка gunicorn каждый воркер поднимает собственный сборщик.
+        """
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                self._samples.clear()
+            self._pid = pid
+            self._process = psutil.Process(pid)
+            # Первый вызов cpu_percent(None) лишь запоминает точку отсчёта
+            psutil.cpu_percent(interval=None)
+            self._process.cpu_percent(interval=None)
+            self._thread = threading.Thread(target=self._run, name='infra-sampler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if self._pid != os.getpid():
+                return
+            try:
+                self._append(self.collect())
+            except Exception as e:
+                logger.error(f"Ошибка сбора метрик: {e}")
+
+    def _append(self, sample):
+        with self._lock:
+            self._samples.append(sample)
+
+    def collect(self, with_cpu=True):
+        """Снимает один набор метрик (неблокирующий).
+
+        with_cpu=False - без CPU (None): вызов cpu_percent вне сборщика сдвинул
+        бы его точку отсчёта, а сразу после запуска значение ничего не значит.
+        """
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        process = self._process or psutil.Process()
+
+        with process.oneshot():
+            process_info = {
+                "pid": process.pid,
+                "rss": process.memory_info().rss,
+                "cpu_percent": process.cpu_percent(interval=None) if with_cpu else None,
+                "num_threads": process.num_threads(),
+                "open_fds": process.num_fds() if hasattr(process, 'num_fds') else None,
+            }
+
+        now = time.time()
+        return {
+            "timestamp": now,
+            "cpu": {
+                "percent": psutil.cpu_percent(interval=None) if with_cpu else None
+            },
+            "memory": {
+                "total": memory.total,
+                "available": memory.available,
+                "percent": memory.percent,
+                "used": memory.used
+            },
+            "disk": {
+                "total": disk.total,
+                "used": disk.used,
+                "free": disk.free,
+                "percent": disk.percent
+            },
+            "process": process_info,
+            "gunicorn": self._gunicorn_info(process),
+            "uptime_seconds": now - psutil.boot_time(),
+        }
+
+    @staticmethod
+    def _gunicorn_info(process):
+        """Число воркеров gunicorn (дети мастер-процесса) и RSS мастера"""
+        try:
+            master = process.parent()
+            if master is None or 'gunicorn' not in ' '.join(master.cmdline()):
+                return None
+            workers = master.children()
+            return {
+                "master_pid": master.pid,
+                "workers": len(workers),
+                "workers_rss": sum(w.memory_info().rss for w in workers),
+            }
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+
+    def latest(self):
+        """Последний снимок (или None, если сборщик ещё не запускался)"""
+        with self._lock:
+            return self._samples[-1] if self._samples else None
+
+    def history(self, window=None):
+        """Снимки за последние ``window`` секунд (все, если не указано)"""
+        with self._lock:
+            samples = list(self._samples)
+        if window:
+            since = time.time() - window
+            samples = [s for s in samples if s['timestamp'] >= since]
+        return samples
+
+
+# Глобальный экземпляр сборщика
+infra_sampler = InfraSampler()
@@ -0,0 +1,69 @@
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime
+
+from flask import current_app
+
+from app import db
+from app.models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+
+class JobProgress:
+    """Передаётся в функцию задачи: обновляет прогресс не чаще раза в секунду"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._last_update = 0
+
+    def update(self, progress, total=None, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_update < 1:
+            return
+        self._last_update = now
+        values = {BackgroundJob.progress: progress}
+        if total is not None:
+            values[BackgroundJob.total] = total
+        BackgroundJob.query.filter_by(id=self.job_id).update(values)
+        db.session.commit()
+
+
+def start_job(kind, func, *args, user_id=None, total=None):
+    """Запускает func(progress, *args) в фоновом потоке с контекстом приложения.
+
+    Возвращает id задачи; состояние - BackgroundJob (см. /jobs/<id>).
+    Результат func сохраняется в BackgroundJob.result (должен сериализоваться в JSON).
+    """
+    job = BackgroundJob(id=uuid.uuid4().hex, kind=kind, user_id=user_id, total=total)
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    thread = threading.Thread(target=_run_job, args=(app, job.id, func, args), name=f'job-{kind}', daemon=True)
+    thread.start()
+    return job.id
+
+
+def _run_job(app, job_id, func, args):
+    with app.app_context():
+        BackgroundJob.query.filter_by(id=job_id).update({BackgroundJob.status: BackgroundJob.STATUS_RUNNING})
+        db.session.commit()
+        try:
+            result = func(JobProgress(job_id), *args)
+            values = {
+                BackgroundJob.status: BackgroundJob.STATUS_DONE,
+                BackgroundJob.result: result,
+            }
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Фоновая задача {job_id} завершилась с ошибкой: {e}")
+            values = {
+                BackgroundJob.status: BackgroundJob.STATUS_FAILED,
+                BackgroundJob.error: str(e),
+            }
+        values[BackgroundJob.finished_at] = datetime.utcnow()
+        BackgroundJob.query.filter_by(id=job_id).update(values)
+        db.session.commit()
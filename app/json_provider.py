@@ -0,0 +1,69 @@
+"""JSON-провайдер Flask на orjson (jsonify, request.get_json, app.json).
+
+orjson сериализует в несколько раз быстрее json из стандартной библиотеки и
+сразу отдаёт bytes (UTF-8, без \\uXXXX для кириллицы). Поведение совпадает с
+DefaultJSONProvider: ключи сортируются, даты уходят в прежний обработчик
+``default`` (формат HTTP-даты), поэтому существующие ответы не меняются; API
+отдаёт даты строками ISO 8601 сам. Без установленного orjson остаётся
+стандартный провайдер.
+
+``jsonify_ordered`` - ответ без сортировки ключей: порядок полей задаёт
+представление (JSON API), и сортировка не тратит время.
+"""
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """DefaultJSONProvider с сериализацией через orjson"""
+
+    def _option(self, sort_keys=False, indent=None):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        option = self._option(kwargs.get('sort_keys', self.sort_keys), kwargs.get('indent'))
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        return self._response(self._prepare_response_obj(args, kwargs), self.sort_keys)
+
+    def _response(self, obj, sort_keys):
+        indent = self._app.debug if self.compact is None else not self.compact
+        body = orjson.dumps(obj, default=self.default, option=self._option(sort_keys, indent))
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def jsonify_ordered(*args, **kwargs):
+    """jsonify с ключами в порядке построения словаря"""
+    provider = current_app.json
+    if isinstance(provider, OrjsonProvider):
+        return provider._response(provider._prepare_response_obj(args, kwargs), False)
+    obj = provider._prepare_response_obj(args, kwargs)
+    # Отступы и разделители - как в DefaultJSONProvider.response
+    if (provider.compact is None and current_app.debug) or provider.compact is False:
+        dump_args = {'indent': 2}
+    else:
+        dump_args = {'separators': (',', ':')}
+    body = provider.dumps(obj, sort_keys=False, **dump_args)
+    return current_app.response_class(f'{body}\n', mimetype=provider.mimetype)
+
+
+def init_app(app):
+    """Подключает OrjsonProvider, если orjson установлен"""
+    if orjson is None:
+        print("[WARN] orjson не установлен, JSON сериализуется стандартным модулем json")
+        return
+    app.json = OrjsonProvider(app)
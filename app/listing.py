@@ -0,0 +1,247 @@
+"""Модель чтения для списков товаров (лента, кабинет продавца, избранное).
+
+Списки показывают около десятка полей на карточку, поэтому вместо ORM-объектов
+Product (все колонки, включая description, identity map, отслеживание
+изменений, связанная Category) запрос выбирает только нужные колонки вместе
+с названием и цветом категории, а строка превращается в компактный
+``ProductRow`` со ``__slots__``. Вместо описания - первые EXCERPT_LENGTH
+символов (``substr`` в SQL), вместо списка картинок - первая.
+
+Шаблоны карточек работают и с ProductRow, и с Product: у обоих есть
+``first_image``, ``excerpt``, ``status_text``, ``days_remaining``.
+Замер - scripts/bench_listing.py.
+
+Кабинет продавца постраничный: фильтры (статус, категория, «скоро истекают»)
+и сортировка выполняются в SQL (``seller_page``), счётчики по статусам -
+один сгруппированный запрос (``seller_status_counts``).
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func, case
+
+from app import db
+from app.models import Product, Category, user_favorites
+from app.utils import _deserialize_images
+
+# Длина отрывка описания для карточек (в шаблонах - truncate до 100-150)
+EXCERPT_LENGTH = 200
+
+LISTING_COLUMNS = (
+    Product.id, Product.user_id, Product.category_id, Product.title, Product.price,
+    Product.price_type, Product.quantity, Product.manufacturer, Product.images,
+    Product.status, Product.created_at, Product.updated_at, Product.expires_at,
+    Product.view_count, Product.vat_included, Product.condition, Product.delivery,
+    Product.region, Product.city, Product.city_id,
+)
+
+
+class ProductRow:
+    """Товар в списке: только колонки карточки, без связи с сессией"""
+
+    __slots__ = (
+        'id', 'user_id', 'category_id', 'title', 'price', 'price_type', 'quantity',
+        'manufacturer', 'first_image', 'status', 'created_at', 'updated_at', 'expires_at',
+        'view_count', 'vat_included', 'condition', 'delivery', 'region', 'city', 'city_id',
+        'excerpt', 'category_name', 'category_color',
+    )
+
+    STATUS_PUBLISHED = Product.STATUS_PUBLISHED
+    STATUS_UNPUBLISHED = Product.STATUS_UNPUBLISHED
+    STATUS_READY_FOR_PUBLICATION = Product.STATUS_READY_FOR_PUBLICATION
+
+    # Те же вычисляемые поля, что у Product (зависят только от status/expires_at)
+    days_remaining = Product.days_remaining
+    is_expired = Product.is_expired
+    status_text = Product.status_text
+
+    def __init__(self, row):
+        mapping = row._mapping
+        for name in self.__slots__:
+            if name != 'first_image':
+                setattr(self, name, mapping[name])
+        images = _deserialize_images(mapping['images'])
+        self.first_image = images[0] if images else None
+
+    @property
+    def product_category(self):
+        """Category - для редких мест, где нужен сам объект (запрос по id)"""
+        return db.session.get(Category, self.category_id) if self.category_id else None
+
+    def __repr__(self):
+        return f'<ProductRow {self.id}>'
+
+
+def listing_select(*criteria):
+    """SELECT колонок карточки с категорией; дальше - .where/.order_by/.limit"""
+    return (
+        select(
+            *LISTING_COLUMNS,
+            func.substr(Product.description, 1, EXCERPT_LENGTH).label('excerpt'),
+            Category.name.label('category_name'),
+            Category.color.label('category_color'),
+        )
+        .outerjoin(Category, Category.id == Product.category_id)
+        .where(*criteria)
+    )
+
+
+def load_rows(stmt):
+    """Выполняет listing_select(...) и возвращает список ProductRow"""
+    return [ProductRow(row) for row in db.session.execute(stmt)]
+
+
+def favorite_rows(user_id):
+    """Избранное пользователя, новые товары сверху"""
+    return load_rows(
+        listing_select()
+        .join(user_favorites, user_favorites.c.product_id == Product.id)
+        .where(user_favorites.c.user_id == user_id)
+        .order_by(Product.created_at.desc(), Product.id.desc())
+    )
+
+
+# --- Кабинет продавца ------------------------------------------------------
+
+# Поля JSON кабинета (/dashboard/products.json); ?fields= выбирает подмножество
+SELLER_FIELDS = (
+    'id', 'title', 'price', 'price_type', 'quantity', 'manufacturer', 'category_id',
+    'category_name', 'first_image', 'status', 'status_text', 'created_at', 'expires_at',
+    'days_remaining', 'is_expired', 'view_count', 'vat_included', 'condition', 'region',
+    'city', 'delivery', 'excerpt',
+)
+
+# ?sort= -> колонка; порядок - ?dir=asc|desc, при равенстве - по id
+SELLER_SORTS = {
+    'created_at': Product.created_at,
+    'title': Product.title,
+    'price': Product.price,
+    'expires_at': Product.expires_at,
+    'view_count': Product.view_count,
+    'status': Product.status,
+    'vat_included': Product.vat_included,
+    'condition': Product.condition,
+    'region': Product.region,
+    'city': Product.city,
+    'delivery': Product.delivery,
+}
+
+# Вкладки статусов кабинета
+SELLER_STATUS_TABS = (
+    (Product.STATUS_PUBLISHED, 'Опубликованы'),
+    (Product.STATUS_UNPUBLISHED, 'Сняты'),
+    (Product.STATUS_READY_FOR_PUBLICATION, 'Готовы к публикации'),
+)
+SELLER_STATUSES = tuple(status for status, _ in SELLER_STATUS_TABS)
+
+
+class ListingPage:
+    """Страница списка: строки, всего найдено, номер и размер страницы"""
+
+    def __init__(self, items, total, page, per_page):
+        self.items = items
+        self.total = total
+        self.page = page
+        self.per_page = per_page
+
+    @property
+    def pages(self):
+        return max(1, -(-self.total // self.per_page))
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+
+def parse_seller_args(args, max_per_page=100, default_per_page=24):
+    """Фильтры, сортировка и страница кабинета из request.args"""
+    status = args.get('status', type=int)
+    sort = args.get('sort', 'created_at')
+    if sort not in SELLER_SORTS:
+        sort = 'created_at'
+    fields = [f for f in args.get('fields', '').split(',') if f in SELLER_FIELDS]
+    return {
+        'status': status if status in SELLER_STATUSES else None,
+        'category_id': args.get('category_id', type=int),
+        'expiring': args.get('expiring') == '1',
+        'sort': sort,
+        'dir': 'asc' if args.get('dir') == 'asc' else 'desc',
+        'page': max(1, args.get('page', 1, type=int)),
+        'per_page': min(max(1, args.get('per_page', default_per_page, type=int)), max_per_page),
+        'fields': fields or list(SELLER_FIELDS),
+    }
+
+
+def _expiring_soon(days):
+    """Опубликован и истекает в ближайшие days дней"""
+    return (Product.status == Product.STATUS_PUBLISHED) & Product.expires_at.isnot(None) & (
+        Product.expires_at <= datetime.utcnow() + timedelta(days=days)
+    )
+
+
+def seller_criteria(user_id, query, expiring_days=3):
+    """Условия WHERE по фильтрам parse_seller_args (категория - вместе с потомками)"""
+    criteria = [Product.user_id == user_id]
+    if query['status'] is not None:
+        criteria.append(Product.status == query['status'])
+    if query['category_id']:
+        from app.category_stats import catalog_stats
+        criteria.append(Product.category_id.in_(catalog_stats().descendant_ids(query['category_id'])))
+    if query['expiring']:
+        criteria.append(_expiring_soon(expiring_days))
+    return criteria
+
+
+def seller_status_counts(user_id, expiring_days=3):
+    """Товары продавца по статусам и «скоро истекают» одним GROUP BY"""
+    rows = db.session.execute(
+        select(
+            Product.status,
+            func.count(),
+            func.sum(case((_expiring_soon(expiring_days), 1), else_=0)),
+        )
+        .where(Product.user_id == user_id)
+        .group_by(Product.status)
+    ).all()
+    counts = {'total': 0, 'expiring': 0, 'by_status': {status: 0 for status in SELLER_STATUSES}}
+    for status, count, expiring in rows:
+        counts['total'] += count
+        counts['expiring'] += expiring or 0
+        counts['by_status'][status] = counts['by_status'].get(status, 0) + count
+    return counts
+
+
+def seller_page(user_id, query, counts=None, expiring_days=3):
+    """Страница товаров продавца (ListingPage из ProductRow).
+
+    counts - результат seller_status_counts: без фильтра по категории и
+    сроку итог берётся из него, а не отдельным COUNT.
+    """
+    criteria = seller_criteria(user_id, query, expiring_days)
+    if counts is not None and not query['category_id'] and not query['expiring']:
+        total = counts['by_status'].get(query['status'], 0) if query['status'] is not None else counts['total']
+    else:
+        total = db.session.scalar(select(func.count()).select_from(Product).where(*criteria))
+
+    column = SELLER_SORTS[query['sort']]
+    order = column.asc() if query['dir'] == 'asc' else column.desc()
+    tiebreak = Product.id.asc() if query['dir'] == 'asc' else Product.id.desc()
+    items = load_rows(
+        listing_select(*criteria)
+        .order_by(order, tiebreak)
+        .limit(query['per_page'])
+        .offset((query['page'] - 1) * query['per_page'])
+    )
+    return ListingPage(items, total, query['page'], query['per_page'])
+
+
+def row_to_dict(row, fields=SELLER_FIELDS):
+    """Выбранные поля ProductRow для JSON (даты - ISO 8601)"""
+    data = {}
+    for name in fields:
+        value = getattr(row, name)
+        data[name] = value.isoformat() if isinstance(value, datetime) else value
+    return data
@@ -0,0 +1,106 @@
+"""Привязка старых товаров к справочнику регионов и городов.
+
+У товаров, созданных до появления справочника, заполнены только строки
+``region``/``city``. Задача пачками (keyset по id) сопоставляет их с
+``Region``/``City`` и проставляет ``region_id``/``city_id``; у товаров с
+известным городом, но без региона, регион берётся из города. Фильтр
+каталога по местоположению работает только по id (см. app/catalog_search.py).
+"""
+from sqlalchemy import select, update, or_, and_
+
+from app import db
+from app.models import Product, Region, City
+
+BATCH_SIZE = 1000
+
+
+class LocationResolver:
+    """Сопоставление названий с id по справочнику, загруженному один раз"""
+
+    def __init__(self):
+        self.regions = {}
+        for region_id, name, parent_id in db.session.execute(select(Region.id, Region.name, Region.parent_id)):
+            key = self._key(name)
+            # Регион верхнего уровня приоритетнее одноимённого подрегиона
+            if key not in self.regions or parent_id is None:
+                self.regions[key] = region_id
+
+        self.cities = {}
+        self.cities_by_name = {}
+        self.city_regions = {}
+        for city_id, name, region_id in db.session.execute(select(City.id, City.name, City.region_id)):
+            key = self._key(name)
+            self.cities[(key, region_id)] = city_id
+            self.cities_by_name.setdefault(key, []).append(city_id)
+            self.city_regions[city_id] = region_id
+
+    @staticmethod
+    def _key(name):
+        return (name or '').strip().lower()
+
+    def region_id(self, name):
+        return self.regions.get(self._key(name))
+
+    def city_id(self, name, region_id=None):
+        key = self._key(name)
+        if region_id is not None and (key, region_id) in self.cities:
+            return self.cities[(key, region_id)]
+        candidates = self.cities_by_name.get(key, [])
+        # Без региона принимаем только однозначное совпадение
+        return candidates[0] if len(candidates) == 1 else None
+
+    def resolve(self, region_name, city_name, region_id=None, city_id=None):
+        """(region_id, city_id) по названиям, не затирая уже заданные id"""
+        if region_id is None and region_name:
+            region_id = self.region_id(region_name)
+        if city_id is None and city_name:
+            city_id = self.city_id(city_name, region_id)
+        if region_id is None and city_id is not None:
+            region_id = self.city_regions.get(city_id)
+        return region_id, city_id
+
+
+def backfill_product_locations(progress=None, batch_size=BATCH_SIZE):
+    """Проставляет region_id/city_id товарам со строковыми region/city.
+
+    progress - JobProgress или None. Возвращает {'scanned', 'updated'}.
+    """
+    resolver = LocationResolver()
+    pending = and_(
+        or_(Product.region_id.is_(None), Product.city_id.is_(None)),
+        or_(Product.region.isnot(None), Product.city.isnot(None), Product.city_id.isnot(None))
+    )
+    total = db.session.scalar(select(db.func.count()).select_from(Product).where(pending))
+    if progress:
+        progress.update(0, total, force=True)
+
+    scanned = updated = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Product.id, Product.region, Product.city, Product.region_id, Product.city_id)
+            .where(pending, Product.id > last_id)
+            .order_by(Product.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        scanned += len(rows)
+
+        changes = []
+        for row in rows:
+            region_id, city_id = resolver.resolve(row.region, row.city, row.region_id, row.city_id)
+            if (region_id, city_id) != (row.region_id, row.city_id):
+                changes.append({'id': row.id, 'region_id': region_id, 'city_id': city_id})
+        if changes:
+            # UPDATE по первичному ключу пачкой (executemany)
+            db.session.execute(update(Product), changes)
+            updated += len(changes)
+        db.session.commit()
+        if progress:
+            progress.update(scanned)
+
+    if progress:
+        progress.update(scanned, force=True)
+    return {'scanned': scanned, 'updated': updated}
@@ -0,0 +1,200 @@
+"""Массовая загрузка регионов и городов.
+
+Файл читается потоково (CSV построчно), пары (регион, город) дедуплицируются
+в памяти, затем регионы и города вставляются пачками через
+``INSERT ... ON CONFLICT DO NOTHING RETURNING`` по уникальным ключам
+``uq_region_root_name`` и ``uq_city_name_region``: несколько запросов на
+пачку вместо нескольких запросов на строку. Координаты городов, если они
+есть в файле, обновляются пачками по (название, регион).
+
+С replace=True старый справочник удаляется в той же транзакции, что и
+загрузка нового: ошибка на любом шаге откатывает всё, и сайт не остаётся
+без регионов и городов.
+"""
+import csv
+import json
+from datetime import datetime
+
+from sqlalchemy import select, bindparam, func
+
+from app import db
+from app.models import Region, City, Product
+
+BATCH_SIZE = 1000
+
+
+def _insert(model):
+    """insert() с поддержкой ON CONFLICT для текущего диалекта"""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+def _batches(items, size=BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _coordinate(value, limit):
+    """Широта/долгота из файла: число в пределах ±limit или None"""
+    try:
+        value = float(str(value).strip().replace(',', '.'))
+    except (TypeError, ValueError):
+        return None
+    return value if -limit <= value <= limit else None
+
+
+def _coordinates(lat, lon):
+    lat, lon = _coordinate(lat, 90), _coordinate(lon, 180)
+    return (lat, lon) if lat is not None and lon is not None else None
+
+
+def iter_csv_rows(path):
+    """(регион, город, координаты) из CSV; разделитель ; , или табуляция.
+
+    Необязательные 3-я и 4-я колонки - широта и долгота города.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        first_line = f.readline()
+        delimiter = max([';', ',', '\t'], key=first_line.count)
+        f.seek(0)
+        for i, row in enumerate(csv.reader(f, delimiter=delimiter)):
+            if len(row) < 2:
+                continue
+            if i == 0 and row[0].strip().lower() in ('регион', 'region'):
+                continue
+            coords = _coordinates(row[2], row[3]) if len(row) >= 4 else None
+            yield row[0], row[1], coords
+
+
+def iter_json_rows(path):
+    """(регион, город, координаты) из двух поддерживаемых JSON-раскладок.
+
+    Город - строка или объект {"name", "lat", "lon"}.
+    Стандартный json не умеет потоковый разбор; размер файла ограничен
+    MAX_CONTENT_LENGTH.
+    """
+    with open(path, encoding='utf-8-sig') as f:
+        data = json.load(f)
+    if isinstance(data, dict) and 'regions' in data:
+        for region_data in data['regions']:
+            region_name = region_data.get('name', '')
+            for city in region_data.get('cities', []):
+                if isinstance(city, str):
+                    yield region_name, city, None
+                elif isinstance(city, dict):
+                    yield region_name, city.get('name', ''), _coordinates(city.get('lat'), city.get('lon'))
+    elif isinstance(data, list):
+        for item in data:
+            if isinstance(item, dict):
+                yield item.get('region', ''), item.get('city', ''), _coordinates(item.get('lat'), item.get('lon'))
+    else:
+        raise ValueError('Неподдерживаемый формат JSON файла')
+
+
+def iter_location_rows(path, file_type):
+    if file_type == 'csv':
+        return iter_csv_rows(path)
+    return iter_json_rows(path)
+
+
+def linked_products_count():
+    """Сколько товаров ссылается на регионы и города справочника"""
+    return db.session.scalar(
+        select(func.count()).select_from(Product)
+        .where(Product.region_id.isnot(None) | Product.city_id.isnot(None))
+    )
+
+
+def import_locations(progress, path, file_type, replace=False):
+    """Загружает локации из файла; progress - JobProgress или None.
+
+    replace - заменить весь справочник (удаление и загрузка одной транзакцией).
+
+    Возвращает {'regions': добавлено, 'cities': добавлено, 'rows': уникальных пар}.
+    """
+    # Дедупликация в памяти: регион -> {город: координаты или None}
+    locations = {}
+    for region_name, city_name, coords in iter_location_rows(path, file_type):
+        region_name = (region_name or '').strip()
+        city_name = (city_name or '').strip()
+        if region_name and city_name:
+            cities = locations.setdefault(region_name, {})
+            cities[city_name] = coords or cities.get(city_name)
+
+    total = sum(len(cities) for cities in locations.values())
+    if progress:
+        progress.update(0, total, force=True)
+
+    def checkpoint(done=None):
+        # При замене - без промежуточных коммитов (JobProgress.update тоже коммитит)
+        if replace:
+            return
+        db.session.commit()
+        if progress and done is not None:
+            progress.update(done)
+
+    if replace:
+        # Проверка в той же транзакции, что и удаление: фоновый импорт идёт
+        # позже запроса, и товары могли появиться за это время
+        linked = linked_products_count()
+        if linked:
+            raise ValueError(f'Нельзя удалить существующие данные - {linked} товаров связаны с ними')
+        City.query.delete()
+        Region.query.delete()
+
+    now = datetime.utcnow()
+    added_regions = 0
+    region_ids = {}
+    for batch in _batches(sorted(locations)):
+        stmt = _insert(Region).values([
+            {'name': name, 'created_at': now} for name in batch
+        ]).on_conflict_do_nothing(
+            index_elements=['name'],
+            index_where=Region.parent_id.is_(None)
+        ).returning(Region.id)
+        added_regions += len(db.session.execute(stmt).all())
+        region_ids.update(db.session.execute(
+            select(Region.name, Region.id).where(Region.parent_id.is_(None), Region.name.in_(batch))
+        ).all())
+    checkpoint()
+
+    city_rows = [
+        {'name': city_name, 'region_id': region_ids[region_name], 'created_at': now}
+        for region_name, cities in locations.items()
+        for city_name in sorted(cities)
+    ]
+    added_cities = 0
+    done = 0
+    for batch in _batches(city_rows):
+        stmt = _insert(City).values(batch).on_conflict_do_nothing(
+            index_elements=['name', 'region_id']
+        ).returning(City.id)
+        added_cities += len(db.session.execute(stmt).all())
+        done += len(batch)
+        checkpoint(done)
+
+    # Координаты - и для новых, и для уже существующих городов
+    coord_rows = [
+        {'b_name': city_name, 'b_region': region_ids[region_name], 'b_lat': coords[0], 'b_lon': coords[1]}
+        for region_name, cities in locations.items()
+        for city_name, coords in cities.items() if coords
+    ]
+    if coord_rows:
+        city_table = City.__table__
+        stmt = city_table.update().where(
+            city_table.c.name == bindparam('b_name'), city_table.c.region_id == bindparam('b_region')
+        ).values(latitude=bindparam('b_lat'), longitude=bindparam('b_lon'))
+        for batch in _batches(coord_rows):
+            db.session.execute(stmt, batch)
+    db.session.commit()
+
+    if coord_rows or replace:
+        from app.geo import invalidate_geo_index
+        invalidate_geo_index()
+
+    if progress:
+        progress.update(done, force=True)
+    return {'regions': added_regions, 'cities': added_cities, 'rows': total, 'coordinates': len(coord_rows)}
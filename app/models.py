@@ -1,11 +1,7 @@
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
-from app import db, login_manager
-
-@login_manager.user_loader
-def load_user(user_id):
-    return db.session.get(User, int(user_id))
+from app import db
 
 user_favorites = db.Table('user_favorites',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
@@ -29,11 +25,17 @@ class User(UserMixin, db.Model):
     is_active = db.Column(db.Boolean, default=True)
     confirmed_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Растёт при смене пароля, блокировке и смене роли (см. app/user_cache.py)
+    session_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     favorited_products = db.relationship('Product', secondary=user_favorites, lazy='dynamic', backref='favorited_by')
     
     products = db.relationship('Product', backref='owner', lazy=True)
     
+    def get_id(self):
+        """Значение для сессии Flask-Login: id и версия сессий пользователя"""
+        return f'{self.id}:{self.session_version or 0}'
+
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
     
@@ -127,10 +129,36 @@ class Category(db.Model):
     def __repr__(self):
         return f'<Category {self.name}>'
 
+class CategoryProductCount(db.Model):
+    """Число опубликованных товаров непосредственно в категории.
+
+    Поддерживается инкрементально (app/category_counts.py); суммы по
+    поддереву считаются при чтении, поэтому перенос категории в другую
+    ветку не требует пересчёта.
+    """
+    __tablename__ = 'category_product_count'
+
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id', ondelete='CASCADE'), primary_key=True)
+    published = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CategoryProductCount {self.category_id}: {self.published}>'
+
 class Product(db.Model):
     STATUS_PUBLISHED = 1
     STATUS_UNPUBLISHED = 2
     STATUS_READY_FOR_PUBLICATION = 3
+
+    __table_args__ = (
+        # Лента каталога: опубликованные, новые сверху
+        db.Index('ix_product_status_created', 'status', 'created_at'),
+        # Счётчики фасетов (app/catalog_search.py): на PostgreSQL - index-only scan
+        db.Index('ix_product_facets', 'status', 'category_id',
+                 postgresql_include=['price', 'condition', 'delivery', 'vat_included', 'price_type', 'manufacturer']),
+        # Фильтр каталога по местоположению (id региона / города)
+        db.Index('ix_product_region_status_created', 'region_id', 'status', 'created_at'),
+        db.Index('ix_product_city_status_created', 'city_id', 'status', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -139,11 +167,15 @@ class Product(db.Model):
     price_type = db.Column(db.String(20), default='fixed') # fixed, from, negotiable
     quantity = db.Column(db.Integer, default=1)
     manufacturer = db.Column(db.String(100))
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    # active_history: прежние значения нужны счётчикам категорий (app/category_counts.py)
+    category_id = db.column_property(db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False), active_history=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     images = db.Column(db.JSON)
-    status = db.Column(db.Integer, default=STATUS_PUBLISHED)
+    status = db.column_property(db.Column(db.Integer, default=STATUS_PUBLISHED), active_history=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Версия карточки: сдвигается при изменении любых полей, кроме просмотров
+    # (app/fragment_cache.py), не через onupdate - иначе её двигал бы счётчик просмотров
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
     expires_at = db.Column(db.DateTime)
     view_count = db.Column(db.Integer, default=0)
     vat_included = db.Column(db.Boolean, default=False)
@@ -192,6 +224,19 @@ class Product(db.Model):
             return datetime.utcnow() > self.expires_at
         return False
     
+    @property
+    def first_image(self):
+        """Имя файла первой картинки (как ProductRow.first_image в app/listing.py)"""
+        from app.utils import _deserialize_images
+        images = _deserialize_images(self.images)
+        return images[0] if images else None
+
+    @property
+    def excerpt(self):
+        """Начало описания для карточек (как ProductRow.excerpt)"""
+        from app.listing import EXCERPT_LENGTH
+        return self.description[:EXCERPT_LENGTH] if self.description else self.description
+
     @property
     def status_text(self):
         status_map = {
@@ -237,6 +282,12 @@ class Review(db.Model):
 # === МОДЕЛЬ: РЕГИОН ===
 class Region(db.Model):
     __tablename__ = 'region'
+    __table_args__ = (
+        # Имена регионов верхнего уровня уникальны (ключ для ON CONFLICT)
+        db.Index('uq_region_root_name', 'name', unique=True,
+                 postgresql_where=db.text('parent_id IS NULL'),
+                 sqlite_where=db.text('parent_id IS NULL')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -258,12 +309,19 @@ class Region(db.Model):
 # === НОВАЯ МОДЕЛЬ: ГОРОД ===
 class City(db.Model):
     __tablename__ = 'city'
+    __table_args__ = (
+        # Ключ для INSERT ... ON CONFLICT при массовой загрузке локаций
+        db.UniqueConstraint('name', 'region_id', name='uq_city_name_region'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     region_id = db.Column(db.Integer, db.ForeignKey('region.id'), nullable=False)
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Координаты центра города (поиск «в радиусе N км», app/geo.py)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
     
     # Связи
     region = db.relationship('Region', backref='cities')
@@ -288,3 +346,56 @@ class ContactRequest(db.Model):
 
     def __repr__(self):
         return f'<ContactRequest {self.id} {self.category}>'
+
+class BackgroundJob(db.Model):
+    """Фоновая задача (импорт и т.п.): состояние хранится в БД, чтобы прогресс
+    был виден из любого воркера"""
+    __tablename__ = 'background_job'
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), default=STATUS_PENDING)
+    progress = db.Column(db.Integer, default=0)
+    total = db.Column(db.Integer)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'total': self.total,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f'<BackgroundJob {self.kind} {self.status}>'
+
+
+class WebSession(db.Model):
+    """Серверная сессия или одноразовое значение (капча) со сроком жизни.
+
+    Читается и пишется не через ORM, а отдельными запросами
+    (см. app/session_store.py).
+    """
+    __tablename__ = 'web_session'
+
+    id = db.Column(db.String(128), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<WebSession {self.id[:8]}>'
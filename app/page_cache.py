@@ -0,0 +1,312 @@
+"""Кеш целых страниц для гостей (включается PAGE_CACHE_ENABLED).
+
+Анонимные GET-запросы к ленте (``/``, ``/?category_id=...``), карточке
+товара (``/product/<id>``) и JSON API (``/api/v1/...``) получают одинаковый
+ответ, поэтому он хранится по
+нормализованному URL: параметры отсортированы, пустые и рекламные метки
+(utm_*, fbclid, ...) отброшены. Вошедшие пользователи, запросы с
+flash-сообщениями и ответы не 200 / не HTML и не JSON кешем не обслуживаются.
+
+Свежесть - PAGE_CACHE_TTL секунд, затем ещё PAGE_CACHE_STALE секунд запись
+отдаётся устаревшей, пока один запрос (блокировка ``add``) пересобирает
+страницу: stale-while-revalidate.
+
+Теги: представление помечает страницу ``tag_page('product-12', ...)``.
+Изменения товаров, категорий и продавцов после коммита сдвигают время
+своих тегов, и записи старше тега перестают отдаваться. Слушатель сессии
+ловит изменения через ORM (правка, публикация, снятие, удаление); массовые
+UPDATE/DELETE передают id в ``queue_invalidation`` (см. app/category_counts.py).
+С Redis время тегов видят все воркеры, с памятью процесса - только текущий,
+остальные догонят по TTL.
+
+CSRF-токен в кеш не попадает: на его месте метка, вместо которой
+подставляется токен сессии посетителя. Поэтому такие страницы можно хранить
+только здесь: им отдаётся Cache-Control: private, а Surrogate-Control
+(разрешение обратному прокси - Varnish, Fastly) - лишь ответам без токена,
+например JSON API. Surrogate-Key - теги для сброса в прокси, X-Page-Cache -
+HIT / STALE / MISS.
+
+Ответ не сохраняется, если представление поставило cookie или изменило
+сессию (кроме CSRF-токена): заголовок Set-Cookie сессии Flask добавляет уже
+после представления, поэтому сессия сравнивается до и после него.
+"""
+import json
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, request, session, g, make_response
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+from sqlalchemy import event, inspect
+
+from app.cache_backends import make_backend, LRUBackend
+from app.models import Product, Category, User
+
+PAGE_PREFIX = 'page:'
+TAG_PREFIX = 'pagetag:'
+LOCK_PREFIX = 'pagelock:'
+CSRF_MARKER = '__PAGE_CACHE_CSRF__'
+IGNORED_ARGS = {'fbclid', 'gclid', 'yclid', '_openstat'}
+MAX_QUERY_LENGTH = 512
+CACHEABLE_MIMETYPES = ('text/html', 'application/json')
+
+_PENDING_KEY = 'page_cache_tags'
+
+
+def normalized_url():
+    """Путь и отсортированные непустые параметры без рекламных меток"""
+    args = sorted(
+        (key, value) for key, value in request.args.items(multi=True)
+        if value and key not in IGNORED_ARGS and not key.startswith('utm_')
+    )
+    return f'{request.path}?{urlencode(args)}' if args else request.path
+
+
+def _session_state():
+    """Содержимое сессии без CSRF-токена (его кеш подменяет сам)"""
+    return {key: value for key, value in session.items() if key != 'csrf_token'}
+
+
+def tag_page(*tags):
+    """Теги текущей страницы (вызывается из представления)"""
+    g.setdefault('page_cache_tags', set()).update(tags)
+
+
+class PageCache:
+    def __init__(self):
+        self.enabled = False
+        self.backend = None
+        self.tags = None
+        self.ttl = 30
+        self.stale = 120
+        self.lock_seconds = 10
+        self.counters = {'hit': 0, 'stale': 0, 'miss': 0, 'bypass': 0, 'invalidated': 0}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PAGE_CACHE_ENABLED', False)
+        self.ttl = app.config.get('PAGE_CACHE_TTL', 30)
+        self.stale = app.config.get('PAGE_CACHE_STALE', 120)
+        self.lock_seconds = app.config.get('PAGE_CACHE_LOCK_SECONDS', 10)
+        if not self.enabled:
+            return
+        self.backend = make_backend(
+            app.config.get('PAGE_CACHE_URL', 'memory://'),
+            app.config.get('PAGE_CACHE_SIZE', 2000),
+            'Кеш страниц'
+        )
+        # В памяти теги хранятся отдельно от страниц: вытеснение тега из
+        # общего LRU «воскресило» бы устаревшие страницы
+        self.tags = LRUBackend(100000) if isinstance(self.backend, LRUBackend) else self.backend
+        app.extensions['page_cache'] = self
+
+    # --- Чтение / запись -------------------------------------------------
+
+    def _lookup(self, key):
+        """(запись, 'hit' | 'stale') или (None, 'miss')"""
+        raw = self.backend.get_many([key]).get(key)
+        if raw is None:
+            return None, 'miss'
+        entry = json.loads(raw)
+        if entry['tags']:
+            tag_keys = [TAG_PREFIX + tag for tag in entry['tags']]
+            if any(float(stamp) >= entry['created'] for stamp in self.tags.get_many(tag_keys).values()):
+                self.counters['invalidated'] += 1
+                return None, 'miss'
+        return entry, 'hit' if time.time() < entry['fresh_until'] else 'stale'
+
+    def _store(self, key, response, session_before):
+        if (response.status_code != 200 or response.mimetype not in CACHEABLE_MIMETYPES
+                or response.direct_passthrough or 'Set-Cookie' in response.headers
+                or session.get('_flashes') or _session_state() != session_before):
+            return
+        body = response.get_data(as_text=True)
+        token = g.get('csrf_token')
+        if token and token in body:
+            body = body.replace(token, CSRF_MARKER)
+        now = time.time()
+        entry = {
+            'body': body,
+            'mimetype': response.mimetype,
+            'tags': sorted(g.get('page_cache_tags', ())),
+            'created': now,
+            'fresh_until': now + self.ttl,
+        }
+        self.backend.set_many({key: json.dumps(entry)}, self.ttl + self.stale)
+        self._decorate(response, entry['tags'], 'MISS')
+
+    def _respond(self, entry, state):
+        body = entry['body']
+        if CSRF_MARKER in body:
+            body = body.replace(CSRF_MARKER, generate_csrf())
+        response = current_app.response_class(body, mimetype=entry['mimetype'])
+        self._decorate(response, entry['tags'], state.upper())
+        return response
+
+    def _decorate(self, response, tags, state):
+        response.headers['X-Page-Cache'] = state
+        response.headers['Surrogate-Key'] = ' '.join(['page', *tags])
+        if g.get('csrf_token') and g.csrf_token in response.get_data(as_text=True):
+            # В странице токен посетителя: общему кешу прокси её хранить нельзя
+            response.cache_control.private = True
+        else:
+            response.headers['Surrogate-Control'] = f'max-age={self.ttl}, stale-while-revalidate={self.stale}'
+
+    def _cacheable_request(self):
+        return (
+            self.enabled and self.backend is not None
+            and request.method == 'GET'
+            and len(request.query_string) <= MAX_QUERY_LENGTH
+            and not current_user.is_authenticated
+            and not session.get('_flashes')
+        )
+
+    def cached(self, on_hit=None):
+        """Декоратор представления; on_hit(*args, **kwargs) вызывается и при
+        ответе из кеша (например, счётчик просмотров)"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self._cacheable_request():
+                    if self.enabled:
+                        self.counters['bypass'] += 1
+                    return view(*args, **kwargs)
+
+                key = PAGE_PREFIX + normalized_url()
+                session_before = _session_state()
+                lock_key = LOCK_PREFIX + key
+                try:
+                    entry, state = self._lookup(key)
+                    # Устаревшую запись пересобирает только получивший блокировку
+                    from_cache = state == 'hit' or (
+                        state == 'stale' and not self.backend.add(lock_key, '1', self.lock_seconds)
+                    )
+                except Exception as e:
+                    print(f"[ERROR] Кеш страниц недоступен: {e}")
+                    return view(*args, **kwargs)
+                if from_cache:
+                    self.counters[state] += 1
+                    if on_hit:
+                        on_hit(*args, **kwargs)
+                    return self._respond(entry, state)
+
+                self.counters['miss'] += 1
+                response = make_response(view(*args, **kwargs))
+                try:
+                    self._store(key, response, session_before)
+                    if state == 'stale':
+                        self.backend.delete(lock_key)
+                except Exception as e:
+                    print(f"[ERROR] Кеш страниц недоступен: {e}")
+                return response
+            return wrapper
+        return decorator
+
+    # --- Инвалидация ---------------------------------------------------
+
+    def invalidate(self, tags):
+        """Помечает теги изменёнными: записи, созданные раньше, не отдаются"""
+        if not self.enabled or self.tags is None or not tags:
+            return
+        stamp = str(time.time())
+        try:
+            self.tags.set_many({TAG_PREFIX + tag: stamp for tag in tags}, self.ttl + self.stale)
+        except Exception as e:
+            print(f"[ERROR] Кеш страниц недоступен: {e}")
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear(PAGE_PREFIX)
+
+    def stats(self):
+        """Для мониторинга: счётчики текущего воркера и доля попаданий"""
+        served = self.counters['hit'] + self.counters['stale'] + self.counters['miss']
+        size = None
+        if self.backend is not None:
+            try:
+                size = self.backend.size()
+            except Exception:
+                pass
+        return {
+            'enabled': self.enabled,
+            'backend': self.backend.name if self.backend else 'off',
+            **self.counters,
+            'hit_ratio': round((self.counters['hit'] + self.counters['stale']) / served, 3) if served else None,
+            'size': size,
+            'ttl_seconds': self.ttl,
+            'stale_seconds': self.stale,
+        }
+
+
+page_cache = PageCache()
+
+
+def _category_tags(category_ids):
+    """Теги лент категорий и всех их предков (лента раздела включает подразделы)"""
+    from app.category_stats import cached_catalog_stats
+
+    stats = cached_catalog_stats()
+    if stats is None:
+        # Дерева в памяти нет - сбрасываем все ленты
+        return {'listing'}
+    tags = {'category-all'}
+    for category_id in category_ids:
+        if category_id:
+            tags.update(f'category-{cid}' for cid in stats.ancestor_ids(category_id))
+    return tags
+
+
+def queue_invalidation(session, product_ids=(), category_ids=(), tags=()):
+    """Теги к сбросу после коммита сессии (для массовых UPDATE/DELETE)"""
+    pending = session.info.setdefault(_PENDING_KEY, {'products': set(), 'categories': set(), 'tags': set()})
+    pending['products'].update(product_ids)
+    pending['categories'].update(category_ids)
+    pending['tags'].update(tags)
+
+
+def _old_value(state, attr):
+    history = state.attrs[attr].history
+    return history.deleted[0] if history.deleted else getattr(state.obj(), attr)
+
+
+def _collect_tags(session, flush_context, instances):
+    products, categories, tags = set(), set(), set()
+    for obj in session.new:
+        if isinstance(obj, Product):
+            categories.add(obj.category_id)
+        elif isinstance(obj, Category):
+            tags.add('listing')
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Product):
+            state = inspect(obj)
+            products.add(obj.id)
+            categories.update({_old_value(state, 'category_id'), obj.category_id})
+        elif isinstance(obj, Category):
+            tags.add('listing')
+        elif isinstance(obj, User):
+            tags.add(f'seller-{obj.id}')
+    if products or categories or tags:
+        queue_invalidation(session, products, categories, tags)
+
+
+def _flush_tags(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    tags = set(pending['tags']) | {f'product-{pid}' for pid in pending['products'] if pid}
+    if pending['categories']:
+        tags |= _category_tags(pending['categories'])
+    page_cache.invalidate(tags)
+
+
+def _discard_tags(session, previous_transaction=None):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_listeners(session_class):
+    """Сброс тегов страниц после коммита изменений товаров, категорий, продавцов"""
+    if event.contains(session_class, 'before_flush', _collect_tags):
+        return
+    event.listen(session_class, 'before_flush', _collect_tags)
+    event.listen(session_class, 'after_commit', _flush_tags)
+    event.listen(session_class, 'after_soft_rollback', _discard_tags)
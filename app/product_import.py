@@ -0,0 +1,400 @@
+"""Массовая загрузка товаров продавца из CSV/XLSX (выгрузки ERP).
+
+Файл читается потоково: CSV - построчно, XLSX - через openpyxl в режиме
+read_only (строки листа не держатся в памяти целиком). Колонки сопоставляются
+полям Product по заголовку (FIELD_ALIASES) или по явной раскладке
+``{поле: заголовок}``. Категория задаётся путём «Родитель / Дочерняя»
+(разделители / > » |) или уникальным названием; регион и город - по
+названиям. Справочники категорий и локаций загружаются в память один раз
+на импорт.
+
+Строки вставляются пачками по BATCH_SIZE одним ``INSERT`` с executemany,
+счётчики категорий и кеш страниц обновляются по пачке. Ошибочные строки не
+прерывают импорт: они попадают в отчёт с номером строки файла. Если пачка не
+вставилась целиком, её строки вставляются по одной, чтобы найти виноватую.
+"""
+import re
+import csv
+import math
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, insert
+
+from app import db
+from app.models import Product, Category
+from app.location_backfill import LocationResolver
+
+BATCH_SIZE = 1000
+# Сколько ошибок по строкам сохраняется в отчёте задачи
+MAX_REPORTED_ERRORS = 500
+
+# Поле Product -> допустимые заголовки колонок (без учёта регистра)
+FIELD_ALIASES = {
+    'title': ('название', 'наименование', 'товар', 'title', 'name'),
+    'description': ('описание', 'description'),
+    'price': ('цена', 'стоимость', 'price'),
+    'price_type': ('тип цены', 'price_type'),
+    'quantity': ('количество', 'кол-во', 'остаток', 'quantity', 'qty'),
+    'manufacturer': ('производитель', 'бренд', 'manufacturer', 'brand'),
+    'category': ('категория', 'путь категории', 'category'),
+    'region': ('регион', 'субъект рф', 'область', 'region'),
+    'city': ('город', 'city'),
+    'condition': ('состояние', 'condition'),
+    'vat_included': ('ндс', 'с ндс', 'vat', 'vat_included'),
+    'delivery': ('доставка', 'delivery'),
+}
+REQUIRED_FIELDS = ('title', 'category')
+
+_PATH_SEPARATORS = re.compile(r'\s*[/>»|\\]\s*')
+_TRUE_VALUES = {'да', 'yes', 'true', '1', '+', 'есть', 'с ндс', 'y'}
+_USED_VALUES = {'б/у', 'бу', 'б у', 'used', 'бывший в употреблении'}
+_FROM_VALUES = {'от', 'from'}
+# Выгрузка (app/exports.py) экранирует апострофом ячейки, похожие на формулы
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+_NEGOTIABLE_VALUES = {'', 'договорная', 'по договоренности', 'по договорённости', 'negotiable'}
+
+
+class ImportRowError(ValueError):
+    """Строка файла не может быть загружена (текст - для отчёта продавцу)"""
+
+
+class CategoryResolver:
+    """id категории по пути или уникальному названию; дерево загружается один раз"""
+
+    def __init__(self):
+        rows = db.session.execute(select(Category.id, Category.name, Category.parent_id)).all()
+        by_id = {row.id: row for row in rows}
+        self.paths = {}
+        self.names = {}
+        for row in rows:
+            path = []
+            node, seen = row, set()
+            while node is not None and node.id not in seen:
+                seen.add(node.id)
+                path.append(self._key(node.name))
+                node = by_id.get(node.parent_id)
+            self.paths[tuple(reversed(path))] = row.id
+            self.names.setdefault(self._key(row.name), []).append(row.id)
+
+    @staticmethod
+    def _key(name):
+        return (name or '').strip().lower()
+
+    def resolve(self, value):
+        parts = tuple(self._key(part) for part in _PATH_SEPARATORS.split(str(value or '').strip()) if part.strip())
+        if not parts:
+            return None
+        if parts in self.paths:
+            return self.paths[parts]
+        # Одно название без пути - только если оно однозначно
+        if len(parts) == 1:
+            candidates = self.names.get(parts[0], [])
+            return candidates[0] if len(candidates) == 1 else None
+        return None
+
+
+def _decode_sample(path):
+    """Кодировка CSV: UTF-8 (с BOM или без), иначе cp1251 - типично для выгрузок 1С"""
+    with open(path, 'rb') as f:
+        sample = f.read(64 * 1024)
+    try:
+        sample.decode('utf-8')
+        return 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        # Обрезанный в середине символ в конце образца - всё ещё UTF-8
+        return 'utf-8-sig' if e.start >= len(sample) - 3 else 'cp1251'
+
+
+def iter_csv_rows(path):
+    """Строки CSV списками; разделитель ; , или табуляция - по заголовку"""
+    encoding = _decode_sample(path)
+    with open(path, newline='', encoding=encoding) as f:
+        first_line = f.readline()
+        delimiter = max([';', ',', '\t'], key=first_line.count)
+        f.seek(0)
+        yield from csv.reader(f, delimiter=delimiter)
+
+
+def iter_xlsx_rows(path):
+    """Строки первого листа XLSX (значения, не формулы)"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError('Для загрузки XLSX на сервере нужен пакет openpyxl; сохраните файл как CSV')
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if value is None else value for value in row]
+    finally:
+        workbook.close()
+
+
+def iter_rows(path, file_type):
+    if file_type == 'xlsx':
+        return iter_xlsx_rows(path)
+    return iter_csv_rows(path)
+
+
+def count_rows(path, file_type):
+    """Примерное число строк данных - для прогресса (без разбора файла)"""
+    if file_type == 'xlsx':
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            return None
+        workbook = load_workbook(path, read_only=True)
+        try:
+            max_row = workbook.active.max_row
+        finally:
+            workbook.close()
+        return max(max_row - 1, 0) if max_row else None
+    lines = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            lines += chunk.count(b'\n')
+    return max(lines - 1, 0)
+
+
+def resolve_columns(header, mapping=None):
+    """{поле: индекс колонки} по заголовку; mapping - явное {поле: заголовок}"""
+    names = [str(value or '').strip().lower() for value in header]
+    columns = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            if alias in names:
+                columns[field] = names.index(alias)
+                break
+    for field, title in (mapping or {}).items():
+        title = str(title or '').strip().lower()
+        if field in FIELD_ALIASES and title in names:
+            columns[field] = names.index(title)
+    missing = [field for field in REQUIRED_FIELDS if field not in columns]
+    if missing:
+        expected = '; '.join(f'«{FIELD_ALIASES[field][0]}» ({", ".join(FIELD_ALIASES[field])})' for field in missing)
+        raise ValueError(f'В файле нет обязательных колонок: {expected}')
+    return columns
+
+
+def _text(value, max_length=None, field=None):
+    text = str(value).strip() if value is not None else ''
+    if max_length and len(text) > max_length:
+        raise ImportRowError(f'{field}: длиннее {max_length} символов')
+    return text or None
+
+
+def _price(value, kind=None):
+    """(цена, тип цены): пусто или «договорная» - negotiable, «от 100» - from.
+
+    kind - колонка «Тип цены» (как в выгрузке): «договорная» или «от»;
+    пустая - тип определяется по самой цене.
+    """
+    kind = str(kind or '').strip().lower()
+    if kind and kind in _NEGOTIABLE_VALUES:
+        return 0.0, 'negotiable'
+    price, price_type = _parse_price(value)
+    if kind in _FROM_VALUES and price_type == 'fixed':
+        price_type = 'from'
+    return price, price_type
+
+
+def _parse_price(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # Числа из xlsx: nan, inf и целые вне диапазона float - не цена
+        try:
+            price = float(value)
+        except OverflowError:
+            price = math.inf
+        if not math.isfinite(price):
+            raise ImportRowError(f'цена: не число ({value})')
+        if price < 0:
+            raise ImportRowError('цена: отрицательное значение')
+        return price, 'fixed'
+    text = str(value or '').strip().lower()
+    if text in _NEGOTIABLE_VALUES:
+        return 0.0, 'negotiable'
+    price_type = 'fixed'
+    if text.startswith('от'):
+        price_type = 'from'
+        text = text[2:]
+    text = re.sub(r'[\s ₽]|руб\.?|р\.', '', text).replace(',', '.')
+    try:
+        price = float(text)
+    except ValueError:
+        raise ImportRowError(f'цена: не число ({value})')
+    if not math.isfinite(price):
+        raise ImportRowError(f'цена: не число ({value})')
+    if price < 0:
+        raise ImportRowError('цена: отрицательное значение')
+    return price, price_type
+
+
+def _quantity(value):
+    if value in (None, ''):
+        return 1
+    try:
+        quantity = int(float(str(value).strip().replace(',', '.')))
+    except (ValueError, OverflowError):
+        raise ImportRowError(f'количество: не число ({value})')
+    return max(quantity, 1)
+
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in _TRUE_VALUES
+
+
+def _condition(value):
+    return 'used' if str(value or '').strip().lower() in _USED_VALUES else 'new'
+
+
+class ProductRowParser:
+    """Строка файла -> словарь колонок Product для INSERT"""
+
+    def __init__(self, columns, user_id, publish=True):
+        self.columns = columns
+        self.user_id = user_id
+        self.publish = publish
+        self.categories = CategoryResolver()
+        self.locations = LocationResolver()
+
+    def _value(self, values, field):
+        index = self.columns.get(field)
+        value = values[index] if index is not None and index < len(values) else None
+        if isinstance(value, str) and value[:1] == "'" and value[1:2] and value[1:].startswith(_FORMULA_PREFIXES):
+            return value[1:]
+        return value
+
+    def parse(self, values, now):
+        get = lambda field: self._value(values, field)
+        title = _text(get('title'), 200, 'название')
+        if not title:
+            raise ImportRowError('нет названия')
+        category_id = self.categories.resolve(get('category'))
+        if category_id is None:
+            raise ImportRowError(f'категория не найдена: {get("category") or "(пусто)"}')
+        price, price_type = _price(get('price'), get('price_type'))
+        region = _text(get('region'), 100, 'регион')
+        city = _text(get('city'), 100, 'город')
+        region_id, city_id = self.locations.resolve(region, city)
+        return {
+            'title': title,
+            'description': _text(get('description')),
+            'price': price,
+            'price_type': price_type,
+            'quantity': _quantity(get('quantity')),
+            'manufacturer': _text(get('manufacturer'), 100, 'производитель'),
+            'category_id': category_id,
+            'user_id': self.user_id,
+            'images': None,
+            'status': Product.STATUS_PUBLISHED if self.publish else Product.STATUS_READY_FOR_PUBLICATION,
+            'created_at': now,
+            'updated_at': now,
+            # Срок размещения - как у Product.publish
+            'expires_at': now + timedelta(days=30) if self.publish else None,
+            'view_count': 0,
+            'vat_included': _flag(get('vat_included')),
+            'condition': _condition(get('condition')),
+            'delivery': _flag(get('delivery')),
+            'region': region,
+            'city': city,
+            'region_id': region_id,
+            'city_id': city_id,
+        }
+
+
+class ImportReport:
+    """Итог импорта для BackgroundJob.result"""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.errors = []
+        self.failed = 0
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': line, 'error': message})
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+
+def _insert_batch(batch, report):
+    """Вставка пачки [(номер строки, колонки)]; при ошибке - по одной строке"""
+    from app.category_counts import apply_category_deltas
+    from app.page_cache import queue_invalidation
+
+    def commit(rows):
+        db.session.execute(insert(Product), [values for _, values in rows])
+        published = Counter(
+            values['category_id'] for _, values in rows if values['status'] == Product.STATUS_PUBLISHED
+        )
+        apply_category_deltas(published)
+        queue_invalidation(db.session(), category_ids={values['category_id'] for _, values in rows})
+        db.session.commit()
+
+    try:
+        commit(batch)
+        report.imported += len(batch)
+        return
+    except Exception as e:
+        db.session.rollback()
+        print(f"[WARN] Пачка импорта не вставилась ({e}), вставляем по строке")
+    for line, values in batch:
+        try:
+            commit([(line, values)])
+            report.imported += 1
+        except Exception as e:
+            db.session.rollback()
+            report.error(line, f'ошибка записи: {str(e).splitlines()[0]}')
+
+
+def import_products(progress, path, file_type, user_id, publish=True, mapping=None, batch_size=BATCH_SIZE):
+    """Загружает товары продавца user_id из файла; progress - JobProgress или None.
+
+    Возвращает отчёт {'rows', 'imported', 'failed', 'errors': [{'row', 'error'}], ...}.
+    Нет обязательных колонок - ValueError (задача завершается с ошибкой).
+    """
+    rows = iter_rows(path, file_type)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError('Файл пуст')
+    parser = ProductRowParser(resolve_columns(header, mapping), user_id, publish)
+
+    total = count_rows(path, file_type)
+    if progress:
+        progress.update(0, total, force=True)
+
+    report = ImportReport()
+    batch = []
+    now = datetime.utcnow()
+    # Строка 1 - заголовок; номера строк в отчёте совпадают с файлом
+    for line, values in enumerate(rows, start=2):
+        if not any(str(value).strip() for value in values):
+            continue
+        report.rows += 1
+        try:
+            batch.append((line, parser.parse(values, now)))
+        except ImportRowError as e:
+            report.error(line, str(e))
+        if len(batch) >= batch_size:
+            _insert_batch(batch, report)
+            batch = []
+            if progress:
+                progress.update(report.rows, max(total or 0, report.rows))
+    if batch:
+        _insert_batch(batch, report)
+
+    if progress:
+        progress.update(report.rows, report.rows, force=True)
+    print(f"[OK] Импорт товаров пользователя {user_id}: {report.imported} из {report.rows}, ошибок {report.failed}")
+    return report.to_dict()
@@ -0,0 +1,361 @@
+"""Сессии на стороне сервера (SESSION_BACKEND).
+
+``cookie`` - стандартная подписанная cookie Flask (всё содержимое сессии
+ездит в каждом запросе). ``db`` - таблица web_session, ``redis://...`` -
+Redis-совместимый сервер (ключи ``session:<id>``). В серверном режиме в
+cookie лежит только случайный непрозрачный id.
+
+Сессия записывается, только если её изменили; без изменений запись лишь
+продлевается, когда до истечения осталось меньше половины срока. Новая
+пустая сессия не сохраняется и cookie не получает, опустевшая - удаляется.
+Для статики сессия не загружается вовсе.
+
+Анонимный посетитель хранилище не нагружает: CSRF-токен есть на каждой
+странице (форма в base.html), и строка на каждый GET без cookie (краулеры,
+ответы кеша страниц) росла бы быстрее, чем её чистит purge. Пока в новой
+сессии только ключи из COOKIE_ONLY_KEYS, она живёт в подписанной cookie, как
+SESSION_BACKEND=cookie: ноль запросов к хранилищу, только Set-Cookie при
+выдаче токена. В хранилище сессия переезжает, когда появляется что-то ещё -
+вход, корзина, flash-сообщение.
+
+Истёкшие строки web_session удаляются пачками: каждый воркер не чаще раза
+в SESSION_PURGE_INTERVAL секунд и командой ``flask purge-sessions`` (cron).
+
+То же хранилище держит одноразовые значения с коротким сроком - коды капчи
+(см. app/captcha.py), чтобы они не попадали в саму сессию.
+"""
+import re
+import time
+import secrets
+import threading
+from datetime import datetime, timedelta
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin, SecureCookieSessionInterface
+from sqlalchemy import select, update, delete, insert
+from werkzeug.datastructures import CallbackDict
+
+from app.models import WebSession
+
+SESSION_PREFIX = 'session:'
+# id сессии в хранилище; подписанная cookie содержит «.» и сюда не подходит
+_SID_RE = re.compile(r'^[A-Za-z0-9_-]{32,64}$')
+# Ключи анонимной сессии (CSRF-токен и служебные метки Flask-Login),
+# которые можно держать в подписанной cookie без строки в хранилище
+COOKIE_ONLY_KEYS = frozenset({'csrf_token', '_fresh', '_remember'})
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Содержимое сессии; modified выставляется при любом изменении"""
+
+    def __init__(self, initial=None, sid=None, new=False, refresh=False):
+        def on_update(session):
+            session.modified = True
+            session.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.refresh = refresh      # пора продлить срок без перезаписи данных
+        self.loaded_user = (initial or {}).get('_user_id')
+        self.from_cookie = False    # содержимое пришло из подписанной cookie
+        self.modified = False
+        self.accessed = False
+
+    @property
+    def cookie_only(self):
+        """Новая сессия, которую можно не класть в хранилище"""
+        return self.new and self.keys() <= COOKIE_ONLY_KEYS
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+
+class DatabaseStore:
+    """Таблица web_session; запросы идут отдельным соединением с primary,
+    а не через db.session представления"""
+
+    name = 'db'
+
+    def __init__(self, db):
+        self.db = db
+        self.table = WebSession.__table__
+
+    def get(self, key):
+        """(значение, истекает_в) или None"""
+        with self.db.engine.connect() as conn:
+            row = conn.execute(
+                select(self.table.c.data, self.table.c.expires_at).where(
+                    self.table.c.id == key, self.table.c.expires_at > datetime.utcnow()
+                )
+            ).first()
+        return (row.data, row.expires_at) if row else None
+
+    def set(self, key, value, ttl):
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        with self.db.engine.begin() as conn:
+            updated = conn.execute(
+                update(self.table).where(self.table.c.id == key)
+                .values(data=value, expires_at=expires_at)
+            ).rowcount
+            if not updated:
+                conn.execute(insert(self.table).values(id=key, data=value, expires_at=expires_at))
+
+    def touch(self, key, ttl):
+        with self.db.engine.begin() as conn:
+            conn.execute(
+                update(self.table).where(self.table.c.id == key)
+                .values(expires_at=datetime.utcnow() + timedelta(seconds=ttl))
+            )
+
+    def pop(self, key):
+        """Удаляет и возвращает живое значение (одноразовые коды)"""
+        with self.db.engine.begin() as conn:
+            row = conn.execute(
+                delete(self.table).where(self.table.c.id == key)
+                .returning(self.table.c.data, self.table.c.expires_at)
+            ).first()
+        return row.data if row and row.expires_at > datetime.utcnow() else None
+
+    def delete(self, key):
+        with self.db.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.id == key))
+
+    def purge(self, batch_size=1000, max_batches=None):
+        """Удаляет истёкшие строки пачками по batch_size; возвращает количество"""
+        removed = batches = 0
+        while max_batches is None or batches < max_batches:
+            expired = (
+                select(self.table.c.id)
+                .where(self.table.c.expires_at <= datetime.utcnow())
+                .limit(batch_size)
+                .scalar_subquery()
+            )
+            with self.db.engine.begin() as conn:
+                count = conn.execute(delete(self.table).where(self.table.c.id.in_(expired))).rowcount
+            removed += count
+            batches += 1
+            if count < batch_size:
+                break
+        return removed
+
+
+class RedisStore:
+    """Redis-совместимый сервер: срок жизни - TTL ключа, чистка не нужна"""
+
+    name = 'redis'
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def get(self, key):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.ttl(key)
+        value, ttl = pipe.execute()
+        if value is None:
+            return None
+        return value.decode('utf-8'), datetime.utcnow() + timedelta(seconds=max(ttl, 0))
+
+    def set(self, key, value, ttl):
+        self.client.set(key, value, ex=ttl)
+
+    def touch(self, key, ttl):
+        self.client.expire(key, ttl)
+
+    def pop(self, key):
+        pipe = self.client.pipeline()
+        pipe.get(key)
+        pipe.delete(key)
+        value, _ = pipe.execute()
+        return value.decode('utf-8') if value is not None else None
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def purge(self, batch_size=1000, max_batches=None):
+        return 0
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Сессия Flask в хранилище; в cookie - только id"""
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, purge_interval=300):
+        self.store = store
+        self.purge_interval = purge_interval
+        self._next_purge = time.monotonic() + purge_interval
+        self._purge_lock = threading.Lock()
+        self._cookie_interface = SecureCookieSessionInterface()
+
+    def _lifetime(self, app):
+        return int(app.permanent_session_lifetime.total_seconds())
+
+    def open_session(self, app, request):
+        # Статике и загрузкам сессия не нужна - не ходим в хранилище
+        if app.static_url_path and request.path.startswith(app.static_url_path + '/'):
+            return self.make_null_session(app)
+
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid:
+            return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+        if not _SID_RE.match(sid):
+            return self._open_cookie_session(app, sid)
+        try:
+            stored = self.store.get(SESSION_PREFIX + sid)
+        except Exception as e:
+            print(f"[ERROR] Хранилище сессий недоступно: {e}")
+            stored = None
+        if stored is None:
+            # Неизвестный или истёкший id не переиспользуем
+            return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+        data, expires_at = stored
+        try:
+            initial = self.serializer.loads(data)
+        except Exception:
+            initial = None
+        remaining = (expires_at - datetime.utcnow()).total_seconds()
+        return ServerSession(initial, sid=sid, refresh=remaining < self._lifetime(app) / 2)
+
+    def _open_cookie_session(self, app, value):
+        """Анонимная сессия из подписанной cookie (см. COOKIE_ONLY_KEYS)"""
+        session = ServerSession(sid=secrets.token_urlsafe(32), new=True)
+        signer = self._cookie_interface.get_signing_serializer(app)
+        if signer is not None:
+            try:
+                data = signer.loads(value, max_age=self._lifetime(app))
+            except Exception:
+                data = None
+            if isinstance(data, dict):
+                session = ServerSession(data, sid=session.sid, new=True)
+                session.from_cookie = True
+        return session
+
+    def _save_cookie_session(self, app, session, response):
+        signer = self._cookie_interface.get_signing_serializer(app)
+        if signer is None:
+            return
+        response.set_cookie(
+            self.get_cookie_name(app), signer.dumps(dict(session)),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app), domain=self.get_cookie_domain(app),
+            path=self.get_cookie_path(app), secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+        response.vary.add('Cookie')
+
+    def save_session(self, app, session, response):
+        if not isinstance(session, ServerSession):
+            return
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session and session.cookie_only:
+            if session.modified:
+                self._save_cookie_session(app, session, response)
+            return
+
+        key = SESSION_PREFIX + session.sid
+        try:
+            if not session:
+                if session.from_cookie and session.modified:
+                    response.delete_cookie(
+                        name, domain=domain, path=path, secure=secure,
+                        samesite=samesite, httponly=httponly
+                    )
+                    response.vary.add('Cookie')
+                elif not session.new and session.modified:
+                    self.store.delete(key)
+                    response.delete_cookie(
+                        name, domain=domain, path=path, secure=secure,
+                        samesite=samesite, httponly=httponly
+                    )
+                    response.vary.add('Cookie')
+                return
+            if session.modified:
+                if not session.new and session.get('_user_id') != session.loaded_user:
+                    # Вход / смена пользователя - новый id (защита от фиксации сессии)
+                    self.store.delete(key)
+                    session.sid = secrets.token_urlsafe(32)
+                    key = SESSION_PREFIX + session.sid
+                self.store.set(key, self.serializer.dumps(dict(session)), self._lifetime(app))
+            elif session.refresh:
+                self.store.touch(key, self._lifetime(app))
+            else:
+                return
+        except Exception as e:
+            print(f"[ERROR] Не удалось сохранить сессию: {e}")
+            return
+        finally:
+            self._maybe_purge()
+
+        response.set_cookie(
+            name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=httponly, domain=domain, path=path,
+            secure=secure, samesite=samesite
+        )
+        response.vary.add('Cookie')
+
+    def _maybe_purge(self):
+        """Пачка удалений истёкших сессий не чаще раза в purge_interval"""
+        if not self.purge_interval or time.monotonic() < self._next_purge:
+            return
+        if not self._purge_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_purge = time.monotonic() + self.purge_interval
+            self.store.purge(max_batches=1)
+        except Exception as e:
+            print(f"[ERROR] Очистка истёкших сессий: {e}")
+        finally:
+            self._purge_lock.release()
+
+
+def make_store(url, db):
+    """Хранилище по SESSION_BACKEND (None - cookie-сессии Flask)"""
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            store = RedisStore(url)
+            print(f"[OK] Сессии: Redis {url.split('@')[-1]}")
+            return store
+        except ImportError:
+            print("[ERROR] Сессии: для redis://... нужен пакет redis, используем таблицу web_session")
+            url = 'db'
+    if url == 'db':
+        return DatabaseStore(db)
+    return None
+
+
+def init_app(app, db):
+    """Подключает серверные сессии, если SESSION_BACKEND не cookie"""
+    store = make_store(app.config.get('SESSION_BACKEND', 'cookie'), db)
+    app.extensions['session_store'] = store
+    if store is None:
+        return
+    app.session_interface = ServerSideSessionInterface(
+        store, purge_interval=app.config.get('SESSION_PURGE_INTERVAL', 300)
+    )
+
+
+def get_store(app):
+    """Серверное хранилище приложения (None - cookie-сессии)"""
+    return app.extensions.get('session_store')
@@ -0,0 +1,185 @@
+"""Sitemap для поисковых роботов: индекс и сжатые файлы со ссылками.
+
+Файлы лежат в FEED_DIR/sitemap и отдаются статически из корня сайта
+(/sitemap.xml, /sitemap-products-<n>.xml.gz - по протоколу sitemap файл может
+ссылаться только на адреса не выше своего каталога), с ETag и Last-Modified.
+
+Карточки товаров разбиты на файлы по SHARD_SIZE id (не больше 50 000 ссылок
+на файл - ограничение протокола), ``lastmod`` - время последнего изменения
+товара (Product.updated_at). Как и YML-фид (app/feeds.py), файл товаров
+перезаписывается, только если изменилась подпись его блока id; индекс - если
+изменился хотя бы один файл. Категории (страницы каталога ``/?category_id=``)
+- отдельный небольшой файл, ``lastmod`` категории - самое свежее изменение
+товара в ней или в подкатегориях.
+"""
+import os
+import gzip
+import hashlib
+from xml.sax.saxutils import escape
+
+from flask import current_app, url_for
+from sqlalchemy import select, func
+
+from app import db
+from app.models import Product
+from app.feeds import atomic_write, bucket_signatures, bucket_ranges, _load_manifest, _save_manifest
+
+INDEX_FILENAME = 'sitemap.xml'
+CATEGORIES_FILENAME = 'sitemap-categories.xml.gz'
+# Ограничение протокола - 50 000 ссылок на файл; блок id не больше этого
+SHARD_SIZE = 50000
+YIELD_PER = 5000
+
+_URLSET_OPEN = b'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+_URLSET_CLOSE = b'</urlset>\n'
+
+
+def shard_filename(number):
+    return f'sitemap-products-{number}.xml.gz'
+
+
+def _lastmod(value):
+    """W3C Datetime; updated_at хранится в UTC без зоны"""
+    return value.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+def _url_xml(loc, lastmod=None, changefreq=None):
+    parts = ['<url><loc>', escape(loc), '</loc>']
+    if lastmod:
+        parts += ['<lastmod>', lastmod, '</lastmod>']
+    if changefreq:
+        parts += ['<changefreq>', changefreq, '</changefreq>']
+    parts.append('</url>\n')
+    return ''.join(parts).encode('utf-8')
+
+
+def _write_gzip(path, chunks):
+    """Атомарно пишет сжатый файл; mtime=0 - одинаковое содержимое даёт одинаковые байты"""
+    def write(f):
+        with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=9, mtime=0) as out:
+            out.write(_URLSET_OPEN)
+            for chunk in chunks:
+                out.write(chunk)
+            out.write(_URLSET_CLOSE)
+
+    atomic_write(path, write)
+
+
+class Sitemap:
+    """Сборка sitemap в каталоге directory"""
+
+    def __init__(self, directory, site_url):
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_FILENAME)
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        self.site_url = site_url
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def _product_urls(self, number, criteria):
+        # Адрес карточки - префикс от url_for один раз на файл, а не на товар
+        prefix = url_for('main.product_detail', product_id=1, _external=True).rsplit('/', 1)[0] + '/'
+        stmt = (
+            select(Product.id, Product.updated_at)
+            .where(*criteria, bucket_ranges([number], SHARD_SIZE))
+            .order_by(Product.id)
+        )
+        for row in db.session.execute(stmt, execution_options={'yield_per': YIELD_PER}):
+            yield _url_xml(f'{prefix}{row.id}', _lastmod(row.updated_at) if row.updated_at else None)
+
+    def _category_urls(self):
+        """Главная и страницы категорий с опубликованными товарами"""
+        from app.category_stats import catalog_stats
+
+        stats = catalog_stats()
+        updated = dict(db.session.execute(
+            select(Product.category_id, func.max(Product.updated_at))
+            .where(Product.status == Product.STATUS_PUBLISHED)
+            .group_by(Product.category_id)
+        ).all())
+        # Свежесть категории - по всему поддереву
+        latest = {}
+        for category_id, updated_at in updated.items():
+            if updated_at is None or category_id not in stats.nodes:
+                continue
+            for ancestor_id in stats.ancestor_ids(category_id):
+                if ancestor_id not in latest or latest[ancestor_id] < updated_at:
+                    latest[ancestor_id] = updated_at
+
+        newest = max(latest.values(), default=None)
+        urls = [_url_xml(url_for('main.index', _external=True), newest and _lastmod(newest), 'daily')]
+        for category_id in sorted(latest):
+            urls.append(_url_xml(
+                url_for('main.index', category_id=category_id, _external=True),
+                _lastmod(latest[category_id]), 'daily'
+            ))
+        return urls, newest
+
+    def _write_index(self, entries):
+        """entries - [(имя файла, lastmod или None)]"""
+        def write(f):
+            f.write(b'<?xml version="1.0" encoding="UTF-8"?>\n'
+                    b'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+            for filename, lastmod in entries:
+                loc = escape(f'{self.site_url}/{filename}')
+                item = f'<sitemap><loc>{loc}</loc>'
+                if lastmod:
+                    item += f'<lastmod>{lastmod}</lastmod>'
+                f.write((item + '</sitemap>\n').encode('utf-8'))
+            f.write(b'</sitemapindex>\n')
+
+        atomic_write(self.index_path, write)
+
+    def generate(self, full=False):
+        """Пересобирает sitemap; возвращает {'urls', 'shards', 'changed', 'written'}"""
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = {} if full else _load_manifest(self.manifest_path)
+        if manifest.get('site_url') != self.site_url:
+            manifest = {}
+
+        criteria = [Product.status == Product.STATUS_PUBLISHED]
+        signatures = bucket_signatures(criteria, SHARD_SIZE)
+        previous = manifest.get('shards', {})
+        changed = [
+            number for number, signature in signatures.items()
+            if previous.get(number) != signature or not os.path.exists(self._path(shard_filename(number)))
+        ]
+        removed = [number for number in previous if number not in signatures]
+
+        for number in changed:
+            _write_gzip(self._path(shard_filename(number)), self._product_urls(number, criteria))
+        for number in removed:
+            if os.path.exists(self._path(shard_filename(number))):
+                os.remove(self._path(shard_filename(number)))
+
+        category_urls, newest = self._category_urls()
+        categories_hash = hashlib.md5(b''.join(category_urls)).hexdigest()
+        categories_changed = (manifest.get('categories') != categories_hash
+                              or not os.path.exists(self._path(CATEGORIES_FILENAME)))
+        if categories_changed:
+            _write_gzip(self._path(CATEGORIES_FILENAME), category_urls)
+
+        written = bool(changed or removed or categories_changed or not os.path.exists(self.index_path))
+        if written:
+            entries = [(CATEGORIES_FILENAME, newest and _lastmod(newest))]
+            for number in sorted(signatures, key=int):
+                updated_at = signatures[number][1]
+                entries.append((shard_filename(number), updated_at and updated_at[:19] + '+00:00'))
+            self._write_index(entries)
+        _save_manifest(self.manifest_path, {
+            'site_url': self.site_url,
+            'categories': categories_hash,
+            'shards': signatures,
+        })
+        return {
+            'urls': sum(signature[0] for signature in signatures.values()) + len(category_urls),
+            'shards': len(signatures),
+            'changed': len(changed) + len(removed) + int(categories_changed),
+            'written': written,
+        }
+
+
+def sitemap(app=None):
+    app = app or current_app
+    return Sitemap(os.path.join(app.config['FEED_DIR'], 'sitemap'), app.config['SITE_URL'])
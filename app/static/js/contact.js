@@ -8,9 +8,18 @@ document.addEventListener('DOMContentLoaded', function () {
     const captchaImage = document.getElementById('contact-captcha-image');
     const refreshBtn = document.getElementById('contact-refresh-captcha');
 
+    // Свой id на каждую картинку: вкладки не перетирают коды друг друга
+    function newCaptchaId() {
+        const bytes = new Uint8Array(12);
+        window.crypto.getRandomValues(bytes);
+        return Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+    }
+
     function reloadCaptcha() {
         if (captchaImage) {
-            captchaImage.src = '/contact_captcha?v=' + new Date().getTime();
+            const captchaId = newCaptchaId();
+            document.getElementById('contact-captcha-id').value = captchaId;
+            captchaImage.src = '/contact_captcha?cid=' + captchaId;
             document.getElementById('contact-captcha-input').value = '';
         }
     }
@@ -0,0 +1,300 @@
+// Выбор категории по уровням (select'ы в #category-container)
+function handleCategoryChange(selectElement) {
+    const container = document.getElementById('category-container');
+    const hiddenInput = document.getElementById('category_id_hidden');
+    const currentLevel = parseInt(selectElement.getAttribute('data-level'));
+    const selectedId = selectElement.value;
+
+    // 1. Update hidden input (always the currently selected value, effectively)
+    // We need to find the *last* selected valid value in the chain.
+    updateHiddenInput();
+
+    // 2. Remove all deeper levels
+    const selects = Array.from(container.querySelectorAll('select'));
+    selects.forEach(sel => {
+        if (parseInt(sel.getAttribute('data-level')) > currentLevel) {
+            sel.remove();
+        }
+    });
+
+    if (!selectedId) {
+        // Deselected current level
+        return;
+    }
+
+    // 3. Fetch children
+    fetch(`/api/categories/children/${selectedId}`)
+        .then(response => response.json())
+        .then(children => {
+            if (children.length > 0) {
+                // Create new select
+                const newLevel = currentLevel + 1;
+                const newSelect = document.createElement('select');
+                newSelect.className = 'form-select mb-2';
+                newSelect.setAttribute('data-level', newLevel);
+                newSelect.onchange = function () { handleCategoryChange(this); };
+
+                const defaultOption = document.createElement('option');
+                defaultOption.value = '';
+                defaultOption.textContent = '-- Уточните категорию --';
+                newSelect.appendChild(defaultOption);
+
+                children.forEach(child => {
+                    const option = document.createElement('option');
+                    option.value = child.id;
+                    option.textContent = child.name;
+                    newSelect.appendChild(option);
+                });
+
+                container.appendChild(newSelect);
+            }
+        })
+        .catch(err => console.error('Error loading categories:', err));
+}
+
+function updateHiddenInput() {
+    const selects = Array.from(document.querySelectorAll('#category-container select'));
+    let lastSelectedId = '';
+
+    // Iterate and find the deepest selected value
+    // Requirement: "обязателен только верхний уровень" (mandatory is only top level)
+    // But usually we want the deepest.
+    // However, the user said "mandatory is only top level". 
+    // So if I select level 1, and level 2 is available but I don't select it, is it valid?
+    // "после открывалось поле выбора дочерней категории (если имеется) далее при наличии следующий уровень."
+    // Usually in e-commerce you must select the leaf.
+    // But the user said "mandatory is only top level".
+    // So I will set the value to the deepest *selected* value.
+
+    for (let sel of selects) {
+        if (sel.value) {
+            lastSelectedId = sel.value;
+        } else {
+            break;
+        }
+    }
+    document.getElementById('category_id_hidden').value = lastSelectedId;
+}
+
+let selectedFiles = [];
+let croppieInstance = null;
+let currentFileIndex = null;
+
+document.addEventListener('DOMContentLoaded', function () {
+    const fileInput = document.getElementById('image_files');
+    const uploadArea = document.getElementById('file-upload-area');
+    const regionSelect = document.getElementById('region_id');
+    const citySelect = document.getElementById('city_id');
+
+    // Обработчик изменения региона
+    regionSelect.addEventListener('change', function () {
+        loadCitiesForRegion(this.value);
+    });
+
+    fileInput.addEventListener('change', handleFileSelect);
+
+    uploadArea.addEventListener('dragover', (e) => {
+        e.preventDefault();
+        uploadArea.classList.add('drag-over');
+    });
+
+    uploadArea.addEventListener('dragleave', (e) => {
+        e.preventDefault();
+        uploadArea.classList.remove('drag-over');
+    });
+
+    uploadArea.addEventListener('drop', (e) => {
+        e.preventDefault();
+        uploadArea.classList.remove('drag-over');
+        if (e.dataTransfer.files.length) {
+            fileInput.files = e.dataTransfer.files;
+            handleFileSelect({ target: fileInput });
+        }
+    });
+
+    uploadArea.addEventListener('click', function (e) {
+        if (e.target === uploadArea || e.target.closest('.upload-placeholder')) {
+            fileInput.click();
+        }
+    });
+});
+
+// Загрузка городов для выбранного региона
+function loadCitiesForRegion(regionId) {
+    const citySelect = document.getElementById('city_id');
+
+    if (!regionId) {
+        citySelect.innerHTML = '<option value="">Сначала выберите субъект РФ</option>';
+        citySelect.disabled = true;
+        return;
+    }
+
+    citySelect.innerHTML = '<option value="">Загрузка городов...</option>';
+    citySelect.disabled = true;
+
+    // AJAX запрос для получения городов
+    fetch(`/api/cities/by-region/${regionId}`)
+        .then(response => response.json())
+        .then(cities => {
+            citySelect.innerHTML = '<option value="">Выберите город</option>';
+            cities.forEach(city => {
+                const option = document.createElement('option');
+                option.value = city.id;
+                option.textContent = city.name;
+                citySelect.appendChild(option);
+            });
+            citySelect.disabled = false;
+        })
+        .catch(error => {
+            console.error('Ошибка при загрузке городов:', error);
+            citySelect.innerHTML = '<option value="">Ошибка загрузки городов</option>';
+        });
+}
+
+function handleFileSelect(event) {
+    const files = Array.from(event.target.files);
+
+    if (files.length > 4) {
+        alert('Можно выбрать не более 4 изображений!');
+        event.target.value = '';
+        return;
+    }
+
+    if (files.some(f => f.size > 5 * 1024 * 1024)) {
+        alert('Один или несколько файлов превышают 5 МБ!');
+        event.target.value = '';
+        return;
+    }
+
+    selectedFiles = files.map(file => ({
+        originalFile: file,
+        croppedBlob: null,
+        croppedFile: null,
+        url: URL.createObjectURL(file)
+    }));
+
+    renderPreview();
+    document.getElementById('image-preview-container').style.display = 'block';
+}
+
+function renderPreview() {
+    const container = document.getElementById('image-preview');
+    container.innerHTML = '';
+
+    selectedFiles.forEach((item, index) => {
+        const div = document.createElement('div');
+        div.className = 'preview-wrapper';
+        div.innerHTML = `
+        <div class="preview-image" onclick="openCropper(${index})">
+            <img src="${item.croppedBlob ? URL.createObjectURL(item.croppedBlob) : item.url}" alt="Preview">
+        </div>
+        <small>${item.originalFile.name.length > 15 ? item.originalFile.name.substring(0, 12) + '...' : item.originalFile.name}</small>
+        <button type="button" class="remove-image-small" onclick="event.stopPropagation(); removeImage(${index})">×</button>
+    `;
+        container.appendChild(div);
+    });
+
+    document.getElementById('image-count').textContent = selectedFiles.length;
+}
+
+function openCropper(index) {
+    currentFileIndex = index;
+    const imageUrl = selectedFiles[index].url;
+
+    const container = document.getElementById('cropper-container');
+    container.innerHTML = '';
+
+    croppieInstance = new Croppie(container, {
+        viewport: { width: 300, height: 200, type: 'rectangle' },
+        boundary: { width: 350, height: 250 },
+        enableOrientation: true,
+        enableZoom: true,
+        mouseWheelZoom: true
+    });
+
+    croppieInstance.bind({ url: imageUrl });
+    document.getElementById('cropper-modal').style.display = 'flex';
+}
+
+function closeCropper() {
+    if (croppieInstance) {
+        croppieInstance.destroy();
+        croppieInstance = null;
+    }
+    document.getElementById('cropper-modal').style.display = 'none';
+    currentFileIndex = null;
+}
+
+function applyCrop() {
+    if (!croppieInstance || currentFileIndex === null) return;
+
+    croppieInstance.result({
+        type: 'blob',
+        size: { width: 600, height: 400 },
+        format: 'jpeg',
+        quality: 0.92
+    }).then(blob => {
+        const originalFile = selectedFiles[currentFileIndex].originalFile;
+        const newFile = new File([blob], originalFile.name.replace(/\.[^/.]+$/, "") + ".jpg", {
+            type: 'image/jpeg',
+            lastModified: Date.now()
+        });
+
+        selectedFiles[currentFileIndex].croppedBlob = blob;
+        selectedFiles[currentFileIndex].croppedFile = newFile;
+
+        closeCropper();
+        renderPreview();
+    });
+}
+
+function removeImage(index) {
+    if (confirm('Удалить это изображение?')) {
+        selectedFiles.splice(index, 1);
+        renderPreview();
+        if (selectedFiles.length === 0) {
+            document.getElementById('image-preview-container').style.display = 'none';
+        }
+    }
+}
+
+function clearImages() {
+    if (confirm('Очистить все изображения?')) {
+        selectedFiles = [];
+        document.getElementById('image_files').value = '';
+        document.getElementById('image-preview-container').style.display = 'none';
+    }
+}
+
+// Перед отправкой — подменяем файлы на обрезанные
+document.getElementById('addProductForm').addEventListener('submit', function (e) {
+    const dataTransfer = new DataTransfer();
+    let hasImages = false;
+
+    selectedFiles.forEach(item => {
+        if (item.croppedFile) {
+            dataTransfer.items.add(item.croppedFile);
+            hasImages = true;
+        } else if (item.originalFile) {
+            dataTransfer.items.add(item.originalFile);
+            hasImages = true;
+        }
+    });
+
+    if (hasImages) {
+        document.getElementById('image_files').files = dataTransfer.files;
+    }
+
+    // Заполняем старые поля для обратной совместимости
+    const regionSelect = document.getElementById('region_id');
+    const citySelect = document.getElementById('city_id');
+    const regionOption = regionSelect.options[regionSelect.selectedIndex];
+    const cityOption = citySelect.options[citySelect.selectedIndex];
+
+    if (regionOption && regionOption.dataset.regionName) {
+        document.getElementById('old_region').value = regionOption.dataset.regionName;
+    }
+    if (cityOption) {
+        document.getElementById('old_city').value = cityOption.textContent;
+    }
+});
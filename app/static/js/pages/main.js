@@ -0,0 +1,514 @@
+    let currentLocation = localStorage.getItem('userLocation') || 'Все регионы';
+    // id из справочника: city_12 / region_5 (фильтр каталога работает по нему)
+    let currentLocationId = localStorage.getItem('userLocationId') || '';
+    // id категории из адреса страницы - data-атрибут тега <script>
+    let selectedCategoryId = document.currentScript.dataset.categoryId || '';
+    let searchTimeout = null;
+
+    function selectCategory(categoryElement, categoryId) {
+        // Убираем активный класс у всех категорий
+        document.querySelectorAll('.main-category-item').forEach(item => {
+            item.classList.remove('active');
+        });
+
+        // Добавляем активный класс выбранной категории
+        categoryElement.classList.add('active');
+
+        // Сохраняем выбранную категорию
+        selectedCategoryId = categoryId;
+        localStorage.setItem('selectedCategoryId', categoryId);
+
+        // Обновляем селект выбора категории
+        const categorySelect = document.getElementById('categoryFilter');
+        if (categorySelect) {
+            // Находим опцию с нужным значением или с текстом
+            let found = false;
+            for (let option of categorySelect.options) {
+                if (option.value === categoryId || option.text === categoryElement.dataset.categoryName) {
+                    option.selected = true;
+                    found = true;
+                    break;
+                }
+            }
+            // Если не нашли точного соответствия, выбираем "Все категории"
+            if (!found && categorySelect.options.length > 0) {
+                categorySelect.options[0].selected = true;
+            }
+        }
+
+        // Применяем фильтры
+        const searchInput = document.getElementById('searchInput');
+        const searchTerm = searchInput ? searchInput.value.trim() : '';
+        applyFilters(categoryId, searchTerm);
+    }
+
+    function openLocationModal() {
+        const modal = document.getElementById('locationModal');
+        if (modal) {
+            modal.style.display = 'block';
+            const input = document.getElementById('locationInput');
+            if (input) input.focus();
+            loadPopularLocations();
+        }
+    }
+
+    function closeLocationModal() {
+        const modal = document.getElementById('locationModal');
+        if (modal) modal.style.display = 'none';
+    }
+
+    function clearLocationInput() {
+        const input = document.getElementById('locationInput');
+        if (input) {
+            input.value = '';
+            input.focus();
+            loadPopularLocations();
+        }
+    }
+
+    function applyFilters(categoryId, searchTerm) {
+        let url = new URL(window.location.href);
+        if (categoryId) url.searchParams.set('category_id', categoryId);
+        else url.searchParams.delete('category_id');
+
+        if (searchTerm) url.searchParams.set('search', searchTerm);
+        else url.searchParams.delete('search');
+        url.searchParams.delete('page');
+
+        url.searchParams.delete('location');
+        url.searchParams.delete('location_id');
+        if (currentLocationId) {
+            url.searchParams.set('location_id', currentLocationId);
+        } else if (currentLocation && currentLocation !== 'Все регионы') {
+            url.searchParams.set('location', currentLocation);
+        }
+
+        window.location.href = url.toString();
+    }
+
+    async function loadPopularLocations() {
+        const suggestions = document.getElementById('locationSuggestions');
+        if (!suggestions) return;
+
+        try {
+            // Популярные города с id из справочника
+            const response = await fetch('/api/locations');
+            const locations = await response.json();
+            suggestions.innerHTML = '';
+            // 1. Текущий выбранный город, если он есть и это не "Все регионы"
+
+            if (currentLocation && currentLocation !== 'Все регионы') {
+                const currentDiv = document.createElement('div');
+                currentDiv.className = 'suggestion-item current-location';
+                currentDiv.innerHTML = `<strong>${currentLocation}</strong> (текущий)`;
+                currentDiv.onclick = function () {
+                    closeLocationModal();
+                };
+                suggestions.appendChild(currentDiv);
+            }
+            // 2. "Все регионы" всегда на видном месте
+            const allRegionsDiv = document.createElement('div');
+            allRegionsDiv.className = 'suggestion-item all-regions';
+            allRegionsDiv.innerHTML = 'Все регионы';
+            allRegionsDiv.onclick = function () {
+                setLocation('Все регионы');
+            };
+            suggestions.appendChild(allRegionsDiv);
+            // 3. Разделитель
+            const separator = document.createElement('div');
+            separator.className = 'suggestion-separator';
+            separator.innerHTML = 'Другие регионы и города';
+            suggestions.appendChild(separator);
+            // 4. Остальные локации из API
+            for (let location of locations) {
+                // Пропускаем "Все регионы" (уже добавили) и текущий город (уже добавили)
+                if (location.display_name === 'Все регионы') continue;
+                if (location.display_name === currentLocation) continue;
+                const div = document.createElement('div');
+                div.className = 'suggestion-item';
+                div.innerHTML = location.display_name;
+                div.onclick = function () {
+                    setLocation(location.display_name, location.id);
+                };
+                suggestions.appendChild(div);
+            }
+        } catch (error) {
+            console.error('Ошибка загрузки локаций:', error);
+            // Запасной статичный список
+            suggestions.innerHTML = `
+<div class="suggestion-item" onclick="setLocation('Все регионы')">
+    Все регионы
+</div>
+<div class="suggestion-item" onclick="setLocation('Москва')">
+    Москва
+</div>
+<div class="suggestion-item" onclick="setLocation('Санкт-Петербург')">
+    Санкт-Петербург
+</div>
+<div class="suggestion-item" onclick="setLocation('Казань')">
+    Казань
+</div>
+<div class="suggestion-item no-results">Ошибка загрузки данных</div>
+`;
+        }
+    }
+
+    // Функция поиска локаций через API
+    async function searchLocations(searchTerm) {
+        const suggestions = document.getElementById('locationSuggestions');
+        if (!searchTerm || searchTerm.trim() === '') {
+            // Если поле пустое, показываем популярные
+            loadPopularLocations();
+            return;
+        }
+        // Показываем индикатор загрузки
+        suggestions.innerHTML = `
+<div class="suggestion-item" onclick="setLocation('Все регионы')">
+    Все регионы
+</div>
+<div class="loading-indicator">Поиск</div>
+`;
+        try {
+            const response = await fetch(`/api/locations?search=${encodeURIComponent(searchTerm)}&limit=30`);
+            const locations = await response.json();
+            suggestions.innerHTML = '';
+            // 1. Всегда показываем "Все регионы"
+            const allRegionsDiv = document.createElement('div');
+            allRegionsDiv.className = 'suggestion-item all-regions';
+            allRegionsDiv.innerHTML = 'Все регионы';
+            allRegionsDiv.onclick = function () {
+                setLocation('Все регионы');
+            };
+            suggestions.appendChild(allRegionsDiv);
+            // 2. Разделитель
+            const separator = document.createElement('div');
+            separator.className = 'suggestion-separator';
+            separator.innerHTML = 'Результаты поиска';
+            suggestions.appendChild(separator);
+            // 3. Добавляем найденные локации
+            let hasResults = false;
+            for (let location of locations) {
+                if (location.display_name === 'Все регионы') continue;
+                const div = document.createElement('div');
+                div.className = 'suggestion-item';
+                div.innerHTML = location.display_name;
+                div.onclick = function () {
+                    setLocation(location.display_name, location.id);
+                };
+                suggestions.appendChild(div);
+                hasResults = true;
+            }
+            // 4. Если результатов нет (кроме "Все регионы")
+            if (!hasResults) {
+                suggestions.innerHTML += '<div class="suggestion-item no-results">Ничего не найдено</div>';
+            }
+        } catch (error) {
+            console.error('Ошибка поиска локаций:', error);
+            suggestions.innerHTML = `
+<div class="suggestion-item" onclick="setLocation('Все регионы')">
+    Все регионы
+</div>
+<div class="suggestion-item no-results">Ошибка поиска</div>
+`;
+        }
+    }
+
+    // Функция для задержки поиска (debounce)
+    function debounceSearch() {
+        const input = document.getElementById('locationInput');
+        const searchTerm = input.value.trim();
+        // Очищаем предыдущий таймаут
+        if (searchTimeout) {
+            clearTimeout(searchTimeout);
+        }
+        // Устанавливаем новый таймаут
+        searchTimeout = setTimeout(() => {
+            searchLocations(searchTerm);
+        }, 300);
+    }
+
+    function setLocation(location, locationId) {
+        currentLocation = location.trim();
+        currentLocationId = locationId && locationId !== 'all' ? locationId : '';
+        localStorage.setItem('userLocation', currentLocation);
+        localStorage.setItem('userLocationId', currentLocationId);
+        document.getElementById('locationText').textContent = currentLocation;
+        closeLocationModal();
+        // Применяем фильтры с новым местоположением
+        const categorySelect = document.getElementById('categoryFilter');
+        const searchInput = document.getElementById('searchInput');
+        const categoryId = categorySelect ? categorySelect.value : '';
+        const searchTerm = searchInput ? searchInput.value.trim() : '';
+        applyFilters(categoryId, searchTerm);
+    }
+
+    // === ИНИЦИАЛИЗАЦИЯ ===
+    document.addEventListener('DOMContentLoaded', function () {
+        // Восстанавливаем выбранную категорию при загрузке
+        if (selectedCategoryId) {
+            const categoryElement = document.querySelector(`.main-category-item[data-category-id="${selectedCategoryId}"]`);
+            if (categoryElement) {
+                categoryElement.classList.add('active');
+            } else {
+                // Если не нашли по id, ищем по имени категории из localStorage
+                const categoryName = localStorage.getItem('selectedCategoryName');
+                if (categoryName) {
+                    const categoryElementByName = document.querySelector(`.main-category-item[data-category-name="${categoryName}"]`);
+                    if (categoryElementByName) {
+                        categoryElementByName.classList.add('active');
+                        selectedCategoryId = categoryElementByName.dataset.categoryId;
+                    }
+                }
+            }
+        } else {
+            // Если категория не выбрана, активируем "Все категории"
+            const allCategories = document.querySelector('.main-category-item[data-category-id=""]');
+            if (allCategories) {
+                allCategories.classList.add('active');
+            }
+        }
+
+        // Сохраняем имя категории при клике
+        document.querySelectorAll('.main-category-item').forEach(item => {
+            item.addEventListener('click', function () {
+                const categoryName = this.dataset.categoryName;
+                if (categoryName) {
+                    localStorage.setItem('selectedCategoryName', categoryName);
+                }
+            });
+        });
+
+        // Устанавливаем текущую локацию
+        const locationText = document.getElementById('locationText');
+        if (locationText) {
+            locationText.textContent = currentLocation;
+        }
+
+        // Спрашиваем локацию при первом посещении
+        const alreadyAsked = localStorage.getItem('locationAsked');
+        if (!alreadyAsked) {
+            setTimeout(() => {
+                openLocationModal();
+                localStorage.setItem('locationAsked', 'true');
+            }, 1500);
+        }
+
+        // Обработчики для модального окна
+        const locationDisplay = document.getElementById('locationDisplay');
+        if (locationDisplay) {
+            locationDisplay.addEventListener('click', openLocationModal);
+        }
+
+        const locationInput = document.getElementById('locationInput');
+        if (locationInput) {
+            locationInput.addEventListener('input', debounceSearch);
+            locationInput.addEventListener('keypress', function (e) {
+                if (e.key === 'Enter') {
+                    debounceSearch();
+                }
+            });
+        }
+
+        // Обработчики для фильтров
+        const categorySelect = document.getElementById('categoryFilter');
+        const searchInput = document.getElementById('searchInput');
+        const searchBtn = document.querySelector('.search-btn');
+
+        if (searchBtn) {
+            searchBtn.addEventListener('click', function () {
+                const categoryId = categorySelect ? categorySelect.value : '';
+                const searchTerm = searchInput ? searchInput.value.trim() : '';
+                applyFilters(categoryId, searchTerm);
+            });
+        }
+
+        if (categorySelect) {
+            categorySelect.addEventListener('change', function () {
+                // При изменении селекта, обновляем активную категорию в блоке картинок
+                const selectedValue = this.value;
+                document.querySelectorAll('.main-category-item').forEach(item => {
+                    item.classList.remove('active');
+                });
+
+                // Ищем соответствующий элемент категории
+                let found = false;
+                document.querySelectorAll('.main-category-item').forEach(item => {
+                    if (item.dataset.categoryId === selectedValue) {
+                        item.classList.add('active');
+                        found = true;
+                        selectedCategoryId = selectedValue;
+                        localStorage.setItem('selectedCategoryId', selectedValue);
+                    }
+                });
+
+                // Если не нашли, активируем "Все категории"
+                if (!found) {
+                    const allCategories = document.querySelector('.main-category-item[data-category-id=""]');
+                    if (allCategories) {
+                        allCategories.classList.add('active');
+                        selectedCategoryId = '';
+                        localStorage.setItem('selectedCategoryId', '');
+                    }
+                }
+
+                const searchTerm = searchInput ? searchInput.value.trim() : '';
+                applyFilters(selectedValue, searchTerm);
+            });
+        }
+
+        if (searchInput) {
+            searchInput.addEventListener('keypress', function (e) {
+                if (e.key === 'Enter') {
+                    const categoryId = categorySelect ? categorySelect.value : '';
+                    applyFilters(categoryId, this.value.trim());
+                }
+            });
+        }
+
+        // Закрытие модального окна при клике вне его
+        window.addEventListener('click', function (event) {
+            const modal = document.getElementById('locationModal');
+            if (event.target === modal) {
+                closeLocationModal();
+            }
+        });
+
+        // Закрытие модального окна по ESC
+        document.addEventListener('keydown', function (event) {
+            if (event.key === 'Escape') {
+                closeLocationModal();
+            }
+        });
+
+        // Переключение видов товаров
+        const viewButtons = document.querySelectorAll('.view-btn');
+
+        function activateView(viewType) {
+            const containers = {
+                grid: document.getElementById('productsGridView'),
+                list: document.getElementById('productsListView'),
+                table: document.getElementById('productsTableView')
+            };
+
+            // Показываем только выбранный вид, скрываем остальные
+            for (let key in containers) {
+                if (containers[key]) {
+                    containers[key].style.display = key === viewType ? 'block' : 'none';
+                }
+            }
+
+            // Обновляем активную кнопку
+            viewButtons.forEach(btn => {
+                btn.classList.toggle('active', btn.getAttribute('data-view') === viewType);
+            });
+
+            // Сохраняем выбор в localStorage
+            localStorage.setItem('mainView', viewType);
+        }
+
+        viewButtons.forEach(button => {
+            button.addEventListener('click', () => {
+                const viewType = button.getAttribute('data-view');
+                activateView(viewType);
+            });
+        });
+
+        // Инициализация представления при загрузке
+        const savedView = localStorage.getItem('mainView') || 'grid';
+        activateView(savedView);
+
+
+
+
+
+        // AJAX Favorite Toggle
+        // AJAX Favorite Toggle
+        window.toggleFavorite = function (event, productId, csrfToken) {
+            event.preventDefault();
+            event.stopPropagation();
+
+            // Select ALL heart containers for this product (desktop, mobile, list view, etc.)
+            const containers = document.querySelectorAll(`.favorite-icon-container[data-product-id="${productId}"]`);
+            if (containers.length === 0) return;
+
+            // Determine new state based on the first container found
+            const firstContainer = containers[0];
+            const currentlyFavorited = firstContainer.getAttribute('data-is-favorited') === 'true';
+            const newState = !currentlyFavorited;
+
+            // Optimistic update for ALL containers
+            containers.forEach(container => {
+                const filledHeart = container.querySelector('.heart-filled');
+                const outlineHeart = container.querySelector('.heart-outline');
+
+                if (newState) {
+                    if (filledHeart) filledHeart.style.display = 'block';
+                    if (outlineHeart) outlineHeart.style.display = 'none';
+                    container.setAttribute('data-is-favorited', 'true');
+                    // Also toggle active class on button if it exists
+                    const btn = container.closest('.favorite-icon-btn');
+                    if (btn) btn.classList.add('active');
+                } else {
+                    if (filledHeart) filledHeart.style.display = 'none';
+                    if (outlineHeart) outlineHeart.style.display = 'block';
+                    container.setAttribute('data-is-favorited', 'false');
+                    const btn = container.closest('.favorite-icon-btn');
+                    if (btn) btn.classList.remove('active');
+                }
+            });
+
+            fetch(`/product/${productId}/favorite`, {
+                method: 'POST',
+                headers: {
+                    'X-CSRFToken': csrfToken,
+                    'Content-Type': 'application/json',
+                    'Accept': 'application/json'
+                }
+            })
+                .then(response => {
+                    if (response.ok) {
+                        return response.json();
+                    }
+                    throw new Error('Network response form favorite toggle was not ok');
+                })
+                .then(data => {
+                    if (data && data.success) {
+                        // Ensure state matches server (verification)
+                        const serverState = data.is_favorited;
+                        containers.forEach(container => {
+                            const filledHeart = container.querySelector('.heart-filled');
+                            const outlineHeart = container.querySelector('.heart-outline');
+
+                            if (serverState) {
+                                if (filledHeart) filledHeart.style.display = 'block';
+                                if (outlineHeart) outlineHeart.style.display = 'none';
+                                container.setAttribute('data-is-favorited', 'true');
+                            } else {
+                                if (filledHeart) filledHeart.style.display = 'none';
+                                if (outlineHeart) outlineHeart.style.display = 'block';
+                                container.setAttribute('data-is-favorited', 'false');
+                            }
+                        });
+                    }
+                })
+                .catch(error => {
+                    console.error('Error toggling favorite:', error);
+                    // Revert on error
+                    containers.forEach(container => {
+                        const filledHeart = container.querySelector('.heart-filled');
+                        const outlineHeart = container.querySelector('.heart-outline');
+
+                        if (currentlyFavorited) {
+                            if (filledHeart) filledHeart.style.display = 'block';
+                            if (outlineHeart) outlineHeart.style.display = 'none';
+                            container.setAttribute('data-is-favorited', 'true');
+                        } else {
+                            if (filledHeart) filledHeart.style.display = 'none';
+                            if (outlineHeart) outlineHeart.style.display = 'block';
+                            container.setAttribute('data-is-favorited', 'false');
+                        }
+                    });
+                });
+        };
+
+    });
@@ -0,0 +1,300 @@
+// Глобальная переменная для ID товара
+const product_id = Number(document.currentScript.dataset.productId);
+
+// Функции для галереи изображений
+function changeImage(thumb) {
+    const mainImage = document.getElementById('mainImage');
+    if (mainImage) {
+        mainImage.src = thumb.src;
+    }
+    document.querySelectorAll('.thumbnail').forEach(t => t.classList.remove('active'));
+    thumb.classList.add('active');
+}
+
+// === МОДАЛЬНЫЕ ОКНА ===
+function showFullPhone() {
+    document.getElementById('phoneModal').style.display = 'block';
+}
+
+function closePhoneModal() {
+    document.getElementById('phoneModal').style.display = 'none';
+}
+
+function reportProduct() {
+    document.getElementById('reportModal').style.display = 'block';
+}
+
+function closeReportModal() {
+    document.getElementById('reportModal').style.display = 'none';
+}
+
+// Модальное окно профиля продавца
+function openSellerProfile(userId) {
+    const modal = document.getElementById('sellerProfileModal');
+    const content = document.getElementById('sellerProfileContent');
+
+    // Показываем загрузку
+    content.innerHTML = '<div class="spinner">Загрузка...</div>';
+    modal.style.display = 'block';
+
+    // Загружаем профиль через AJAX
+    fetch(`/user/${userId}/profile?product_id=${product_id}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Ошибка сети');
+            }
+            return response.text();
+        })
+        .then(html => {
+            content.innerHTML = html;
+        })
+        .catch(error => {
+            content.innerHTML = '<div class="text-danger">Ошибка загрузки профиля</div>';
+            console.error('Ошибка:', error);
+        });
+}
+
+function closeSellerProfileModal() {
+    document.getElementById('sellerProfileModal').style.display = 'none';
+}
+
+// === МОДАЛЬНОЕ ОКНО ОТЗЫВОВ ===
+function openReviewsModal(userId) {
+    const modal = document.getElementById('reviewsModal');
+    const content = document.getElementById('reviewsModalContent');
+    content.innerHTML = '<div class="spinner">Загрузка...</div>';
+    modal.style.display = 'block';
+
+    fetch(`/user/${userId}/reviews_content`)
+        .then(response => {
+            if (!response.ok) throw new Error('Ошибка загрузки');
+            return response.text();
+        })
+        .then(html => {
+            content.innerHTML = html;
+        })
+        .catch(err => {
+            content.innerHTML = '<div class="text-danger p-3">Не удалось загрузить отзывы.</div>';
+            console.error(err);
+        });
+}
+
+function closeReviewsModal() {
+    document.getElementById('reviewsModal').style.display = 'none';
+}
+
+
+// Закрытие по клику вне окна
+window.onclick = function (event) {
+    const phoneModal = document.getElementById('phoneModal');
+    const reportModal = document.getElementById('reportModal');
+    const sellerProfileModal = document.getElementById('sellerProfileModal');
+    const reviewsModal = document.getElementById('reviewsModal');
+    const reviewFormModal = document.getElementById('reviewFormModal');
+
+    if (event.target === phoneModal) phoneModal.style.display = 'none';
+    if (event.target === reportModal) reportModal.style.display = 'none';
+    if (event.target === sellerProfileModal) sellerProfileModal.style.display = 'none';
+    if (event.target === reviewsModal) reviewsModal.style.display = 'none';
+    if (event.target === reviewFormModal) reviewFormModal.style.display = 'none';
+}
+
+// Функции для сворачиваемого описания
+function toggleDescription() {
+    const wrapper = document.getElementById('descriptionWrapper');
+    const toggle = document.getElementById('descriptionToggle');
+    const toggleIcon = toggle.querySelector('.toggle-icon');
+    const toggleText = toggle.querySelector('.toggle-text');
+
+    if (wrapper.classList.contains('collapsed')) {
+        wrapper.classList.remove('collapsed');
+        wrapper.classList.add('expanded');
+        toggleIcon.classList.remove('collapsed');
+        toggleIcon.classList.add('expanded');
+        toggleText.textContent = 'Показать меньше';
+    } else {
+        wrapper.classList.remove('expanded');
+        wrapper.classList.add('collapsed');
+        toggleIcon.classList.remove('expanded');
+        toggleIcon.classList.add('collapsed');
+        toggleText.textContent = 'Показать больше';
+    }
+}
+
+function checkDescriptionHeight() {
+    const content = document.getElementById('descriptionContent');
+    const wrapper = document.getElementById('descriptionWrapper');
+    const toggle = document.getElementById('descriptionToggle');
+
+    if (!content || !wrapper || !toggle) return;
+
+    // Сбросим высоту, чтобы получить реальную высоту контента
+    wrapper.style.maxHeight = 'none';
+    const contentHeight = content.scrollHeight;
+    wrapper.style.maxHeight = '';
+
+    // Если высота контента больше 100px (примерно 4 строки), показываем кнопку
+    if (contentHeight > 100) {
+        toggle.style.display = 'block';
+        wrapper.classList.add('collapsed');
+        wrapper.classList.remove('expanded');
+
+        const toggleIcon = toggle.querySelector('.toggle-icon');
+        const toggleText = toggle.querySelector('.toggle-text');
+        toggleIcon.classList.add('collapsed');
+        toggleText.textContent = 'Показать больше';
+    } else {
+        toggle.style.display = 'none';
+        wrapper.classList.remove('collapsed', 'expanded');
+    }
+}
+
+// Автоматическая подгонка размера шрифта цены
+function adjustPriceFontSize() {
+    const priceElements = document.querySelectorAll('.product-price');
+    priceElements.forEach(el => {
+        const container = el.parentElement;
+        const maxWidth = container.clientWidth - 20; // Оставляем немного места
+        let fontSize = 28; // Начальный размер
+
+        // Создаем временный элемент для проверки
+        const temp = document.createElement('span');
+        temp.style.fontSize = fontSize + 'px';
+        temp.style.fontWeight = '800';
+        temp.style.visibility = 'hidden';
+        temp.style.position = 'absolute';
+        temp.style.whiteSpace = 'nowrap';
+        temp.textContent = el.textContent;
+        document.body.appendChild(temp);
+
+        // Уменьшаем размер пока не влезет
+        while (temp.scrollWidth > maxWidth && fontSize > 14) {
+            fontSize -= 1;
+            temp.style.fontSize = fontSize + 'px';
+        }
+
+        document.body.removeChild(temp);
+
+        // Применяем найденный размер
+        el.style.fontSize = fontSize + 'px';
+
+        // Если цена все еще не влезает, включаем ellipsis
+        if (el.scrollWidth > container.clientWidth) {
+            el.style.overflow = 'hidden';
+            el.style.textOverflow = 'ellipsis';
+        } else {
+            el.style.overflow = 'visible';
+            el.style.textOverflow = 'clip';
+        }
+    });
+}
+
+// Инициализация при загрузке страницы
+document.addEventListener('DOMContentLoaded', function () {
+    // Обработка ошибок изображений
+    const images = document.querySelectorAll('.product-gallery img');
+    images.forEach(img => {
+        img.addEventListener('error', function () {
+            this.src = '/static/images/no-image.png';
+        });
+    });
+
+    // Обработчик клика на сердечко (для анимации)
+    const favoriteButtons = document.querySelectorAll('.favorite-icon-btn');
+    favoriteButtons.forEach(btn => {
+        btn.addEventListener('click', function () {
+            const svg = this.querySelector('svg');
+            if (svg.getAttribute('fill') === 'none') {
+                svg.setAttribute('fill', 'red');
+                svg.setAttribute('stroke', 'red');
+                this.classList.add('active');
+            } else {
+                svg.setAttribute('fill', 'none');
+                svg.setAttribute('stroke', 'gray');
+                this.classList.remove('active');
+            }
+        });
+    });
+
+    // Проверяем высоту описания
+    setTimeout(checkDescriptionHeight, 100);
+
+    // Подгонка размера шрифта цены
+    adjustPriceFontSize();
+
+    // Обработчик изменения размера окна
+    window.addEventListener('resize', function () {
+        adjustPriceFontSize();
+        checkDescriptionHeight();
+    });
+
+    // Обработчик скролла для липкого блока (только на десктопе)
+    if (window.innerWidth >= 769) {
+        const stickySidebar = document.querySelector('.sticky-sidebar');
+
+        if (stickySidebar) {
+            window.addEventListener('scroll', function () {
+                if (window.scrollY > 80) {
+                    document.body.classList.add('scrolled');
+                    stickySidebar.style.top = '68px';
+                } else {
+                    document.body.classList.remove('scrolled');
+                    stickySidebar.style.top = '84px';
+                }
+            });
+        }
+    }
+});
+
+// === МОДАЛЬНОЕ ОКНО ФОРМЫ ОТЗЫВА ===
+function openReviewFormModal(userId) {
+    const modal = document.getElementById('reviewFormModal');
+    const content = document.getElementById('reviewFormContent');
+    content.innerHTML = '<div class="spinner">Загрузка...</div>';
+    modal.style.display = 'block';
+
+    fetch(`/user/${userId}/review_form`)
+        .then(response => {
+            if (!response.ok) throw new Error('Ошибка загрузки формы');
+            return response.text();
+        })
+        .then(html => {
+            content.innerHTML = html;
+            // Переназначаем обработчик для кнопки "Отмена", если нужно
+        })
+        .catch(err => {
+            content.innerHTML = '<div class="text-danger p-3">Не удалось загрузить форму отзыва.</div>';
+            console.error(err);
+        });
+}
+
+function closeReviewFormModal() {
+    document.getElementById('reviewFormModal').style.display = 'none';
+}
+
+// === ИНТЕРАКТИВНЫЕ ЗВЁЗДЫ В ФОРМЕ ОТЗЫВА ===
+let currentRating = 0;
+
+function highlightStars(element) {
+    const rating = parseInt(element.getAttribute('data-rating'));
+    document.querySelectorAll('.star-rating .star').forEach((star, idx) => {
+        star.style.color = idx < rating ? '#ffc107' : '#dee2e6';
+    });
+}
+
+function resetStars() {
+    const selected = currentRating;
+    document.querySelectorAll('.star-rating .star').forEach((star, idx) => {
+        star.style.color = idx < selected ? '#ffc107' : '#dee2e6';
+    });
+}
+
+function selectStar(element) {
+    const rating = parseInt(element.getAttribute('data-rating'));
+    currentRating = rating;
+    const hiddenInput = document.getElementById('selectedRating');
+    if (hiddenInput) {
+        hiddenInput.value = rating;
+    }
+    resetStars();
+}
@@ -33,6 +33,11 @@ class TelegramBot:
                 'disable_web_page_preview': disable_web_page_preview
             }
             
+            # Под ASGI отправляем в фоне через общий пул httpx, не блокируя запрос
+            from app.aio import submit_background
+            if submit_background(self._send_async(url, payload)):
+                return True
+
             logger.info(f"Отправляем сообщение в Telegram: {text[:50]}...")
             response = requests.post(url, json=payload, timeout=10)
             response.raise_for_status()
@@ -50,6 +55,16 @@ class TelegramBot:
             logger.error(f"❌ Ошибка отправки сообщения в Telegram: {e}")
             return False
     
+    async def _send_async(self, url, payload):
+        """Отправка сообщения из event loop ASGI-сервера"""
+        from app.aio import http_request
+        try:
+            response = await http_request('POST', url, json=payload)
+            response.raise_for_status()
+            logger.info(f"✅ Сообщение успешно отправлено в Telegram")
+        except Exception as e:
+            logger.error(f"❌ Ошибка отправки сообщения в Telegram: {e}")
+
     def send_new_user_notification(self, user):
         """Отправляет уведомление о новом пользователе"""
         if not user:
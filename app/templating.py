@@ -0,0 +1,73 @@
+"""Профиль шаблонов Jinja: перечитывание, кеш байткода, прогрев.
+
+В разработке (DEBUG) шаблоны перечитываются при изменении: на каждый
+render_template Jinja проверяет mtime файла и всех шаблонов, от которых он
+наследуется. В продакшене TEMPLATES_AUTO_RELOAD выключен - шаблон
+компилируется один раз на процесс и дальше берётся из памяти.
+
+Компиляция (разбор и генерация Python-кода) крупного шаблона - main.html,
+product_detail.html, edit_product.html - десятки миллисекунд.
+FileSystemBytecodeCache (TEMPLATE_CACHE_DIR) сохраняет скомпилированный код
+на диск, и новый процесс загружает его вместо компиляции. В ключ записи
+входит контрольная сумма исходника: изменённый шаблон перекомпилируется сам.
+Заполнить кеш заранее - ``flask precompile-templates`` (шаг деплоя).
+
+Прогрев (TEMPLATE_WARMUP) загружает шаблоны сайта в конце create_app. С
+preload_app в gunicorn это происходит один раз в мастере, и воркеры
+получают готовые шаблоны через fork. Замер - scripts/bench_templates.py.
+"""
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+# Шаблоны flask-admin и писем в прогрев не входят (их компилирует precompile-templates)
+WARMUP_SKIP_PREFIXES = ('admin/', 'email/')
+
+
+def site_templates(env):
+    """HTML-шаблоны сайта: страницы, base.html и partials"""
+    return sorted(
+        name for name in env.list_templates(extensions=['html'])
+        if not name.startswith(WARMUP_SKIP_PREFIXES)
+    )
+
+
+def compile_templates(env, names):
+    """Загружает шаблоны в кеш окружения (и в кеш байткода, если он включён).
+
+    Возвращает (число загруженных, [(имя, ошибка)]).
+    """
+    loaded, errors = 0, []
+    for name in names:
+        try:
+            env.get_template(name)
+            loaded += 1
+        except Exception as e:
+            errors.append((name, e))
+    return loaded, errors
+
+
+def warm_up(app):
+    """Загружает шаблоны сайта; результат - в app.extensions['template_warmup']"""
+    started = time.perf_counter()
+    loaded, errors = compile_templates(app.jinja_env, site_templates(app.jinja_env))
+    for name, error in errors:
+        print(f"[ERROR] Шаблон {name}: {error}")
+    result = {'templates': loaded, 'errors': len(errors), 'ms': round((time.perf_counter() - started) * 1000, 1)}
+    app.extensions['template_warmup'] = result
+    return result
+
+
+def init_app(app):
+    """Кеш байткода и прогрев; вызывать последним в create_app - после
+    регистрации всех фильтров (их наличие проверяется при компиляции)"""
+    cache_dir = app.config.get('TEMPLATE_CACHE_DIR')
+    if cache_dir:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+        except OSError as e:
+            print(f"[WARN] Кеш байткода шаблонов недоступен ({cache_dir}): {e}")
+    if app.config.get('TEMPLATE_WARMUP'):
+        warm_up(app)
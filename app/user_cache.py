@@ -0,0 +1,195 @@
+"""Загрузка пользователя для Flask-Login с кешем в процессе.
+
+Текущий пользователь нужен почти каждому запросу вошедшего посетителя, поэтому
+колонки User держатся в памяти воркера USER_CACHE_TTL секунд, а из кеша
+собирается объект, привязанный к сессии без SELECT (``merge(load=False)``):
+связи (избранное, товары) по-прежнему подгружаются лениво.
+
+В сессии Flask хранится ``<id>:<session_version>`` (``User.get_id``). Смена
+пароля, блокировка и смена роли увеличивают ``User.session_version``: записи
+кеша с прежней версией не отдаются, а сессии с ней (другие браузеры, украденная
+cookie) перестают действовать. Слушатель сессии SQLAlchemy сбрасывает запись
+после коммита любых изменений пользователя в текущем воркере.
+
+Чтобы блокировка или смена роли в одном воркере сразу действовала во всех,
+при попадании в кеш актуальная версия сверяется со штампом ``userver:<id>`` в
+Redis (USER_CACHE_URL=redis://...): его пишет воркер, закоммитивший
+изменение. Поэтому кеш включается только вместе с Redis; без общего
+хранилища версий пользователь читается из БД на каждый запрос, как при
+USER_CACHE_TTL=0 - иначе попадание в кеш всё равно стоило бы запроса к БД.
+"""
+import time
+import threading
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import make_transient_to_detached
+
+from app import db, login_manager
+from app.cache_backends import make_backend, RedisBackend
+from app.models import User
+
+# Изменения, после которых прежние сессии пользователя недействительны
+SECURITY_FIELDS = ('password_hash', 'is_active', 'role')
+
+_PENDING_KEY = 'user_cache_ids'
+VERSION_PREFIX = 'userver:'
+# Штамп версии в Redis; без штампа версия читается из БД
+VERSION_TTL = 86400
+# Версия удалённого пользователя: не совпадает ни с одной сессией
+DELETED_VERSION = -1
+
+
+def parse_user_id(value):
+    """(id, версия) из значения ``_user_id`` сессии; старый формат - версия 0"""
+    user_id, _, version = str(value).partition(':')
+    try:
+        return int(user_id), int(version or 0)
+    except ValueError:
+        return None, None
+
+
+class UserCache:
+    def __init__(self):
+        self.ttl = 30
+        self._entries = {}      # id -> (версия, колонки, загружено_в)
+        self._lock = threading.Lock()
+        self.versions = None    # RedisBackend со штампами версий или None (сверка по БД)
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.ttl = app.config.get('USER_CACHE_TTL', 30)
+        url = app.config.get('USER_CACHE_URL', 'memory://')
+        backend = make_backend(url, 1, 'Версии пользователей') if self.ttl else None
+        # Штампы в памяти процесса другим воркерам не видны: без Redis кеш выключен
+        self.versions = backend if isinstance(backend, RedisBackend) else None
+        if self.versions is None:
+            if self.ttl:
+                print("[INFO] Кеш пользователей выключен: нужен USER_CACHE_URL=redis://...")
+            self.ttl = 0
+        login_manager.user_loader(self.load)
+        app.extensions['user_cache'] = self
+
+    def current_version(self, user_id):
+        """Актуальная session_version: штамп из Redis, без штампа - из БД"""
+        key = VERSION_PREFIX + str(user_id)
+        try:
+            stamp = self.versions.get_many([key]).get(key)
+            if stamp is not None:
+                return int(stamp)
+        except Exception as e:
+            print(f"[ERROR] Версии пользователей недоступны: {e}")
+        version = db.session.scalar(select(User.session_version).where(User.id == user_id))
+        version = DELETED_VERSION if version is None else version
+        try:
+            # add, а не set: не затираем версию, опубликованную другим воркером
+            self.versions.add(key, str(version), VERSION_TTL)
+        except Exception:
+            pass
+        return version
+
+    def publish(self, versions):
+        """Новые версии после коммита - для остальных воркеров (только с Redis)"""
+        if self.versions is None or not versions:
+            return
+        try:
+            self.versions.set_many(
+                {VERSION_PREFIX + str(user_id): str(version) for user_id, version in versions.items()},
+                VERSION_TTL
+            )
+        except Exception as e:
+            print(f"[ERROR] Версии пользователей недоступны: {e}")
+
+    def load(self, value):
+        """user_loader Flask-Login"""
+        user_id, version = parse_user_id(value)
+        if user_id is None:
+            return None
+
+        if self.ttl:
+            with self._lock:
+                entry = self._entries.get(user_id)
+            if (entry is not None and entry[0] == version and time.monotonic() - entry[2] < self.ttl
+                    and self.current_version(user_id) == version):
+                self.hits += 1
+                return self._attach(entry[1])
+        self.misses += 1
+
+        user = db.session.get(User, user_id)
+        if user is None or (user.session_version or 0) != version:
+            return None
+        if self.ttl:
+            columns = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+            with self._lock:
+                self._entries[user_id] = (version, columns, time.monotonic())
+        return user
+
+    @staticmethod
+    def _attach(columns):
+        user = User(**columns)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def invalidate(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            'enabled': bool(self.ttl),
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / requests, 3) if requests else None,
+            'size': len(self._entries),
+        }
+
+
+user_cache = UserCache()
+
+
+def _collect_users(session, flush_context, instances):
+    """id изменённых пользователей -> новая версия (None - версия не менялась)"""
+    changed = {}
+    for obj in list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, User):
+            continue
+        changed[obj.id] = None
+        if obj in session.deleted:
+            changed[obj.id] = DELETED_VERSION
+            continue
+        state = inspect(obj)
+        if any(state.attrs[key].history.has_changes() for key in SECURITY_FIELDS):
+            obj.session_version = (obj.session_version or 0) + 1
+            changed[obj.id] = obj.session_version
+    if changed:
+        pending = session.info.setdefault(_PENDING_KEY, {})
+        for user_id, version in changed.items():
+            if version is not None or user_id not in pending:
+                pending[user_id] = version
+
+
+def _flush_users(session):
+    changed = session.info.pop(_PENDING_KEY, None)
+    if changed:
+        user_cache.invalidate(changed)
+        user_cache.publish({user_id: version for user_id, version in changed.items() if version is not None})
+
+
+def _discard_users(session, previous_transaction=None):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def register_listeners(session_class):
+    """Сброс кеша пользователей после коммита их изменений"""
+    if event.contains(session_class, 'before_flush', _collect_users):
+        return
+    event.listen(session_class, 'before_flush', _collect_users)
+    event.listen(session_class, 'after_commit', _flush_users)
+    event.listen(session_class, 'after_soft_rollback', _discard_users)
@@ -247,22 +247,29 @@ def save_uploaded_files(files):
 
 def get_category_choices(parent_id=None, level=0):
     """
-    Рекурсивно получает категории для выпадающего списка с учетом иерархии.
+    Категории для выпадающего списка с учетом иерархии (один запрос на всё дерево).
     Возвращает список словарей: {'id', 'name', 'level', 'display_name'}
     """
+    from app import db
     from app.models import Category
     
-    choices = []
     # Сортировка по алфавиту
-    cats = Category.query.filter_by(parent_id=parent_id).order_by(Category.name).all()
-    for cat in cats:
-        choices.append({
-            'id': cat.id,
-            'name': cat.name,
-            'level': level,
-            'display_name': ('— ' * level) + cat.name
-        })
-        choices.extend(get_category_choices(cat.id, level + 1))
+    rows = db.session.query(Category.id, Category.name, Category.parent_id).order_by(Category.name).all()
+    by_parent = {}
+    for row in rows:
+        by_parent.setdefault(row.parent_id, []).append(row)
+    
+    choices = []
+    def walk(pid, lvl):
+        for cat in by_parent.get(pid, []):
+            choices.append({
+                'id': cat.id,
+                'name': cat.name,
+                'level': lvl,
+                'display_name': ('— ' * lvl) + cat.name
+            })
+            walk(cat.id, lvl + 1)
+    walk(parent_id, level)
     return choices
 
 def format_price(value):
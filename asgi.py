@@ -0,0 +1,20 @@
+"""ASGI-точка входа (асинхронный режим).
+
+    DB_WORKER_CLASS=asgi gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+
+или без gunicorn: uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+
+async-представления (api.get_dadata_company) и фоновая отправка в Telegram
+выполняются в event loop; синхронные представления - в пуле из
+ASGI_SYNC_THREADS потоков. Рекомендуется 2-4 процесса на сервер,
+ASGI_SYNC_THREADS=10 и DB_WORKER_CLASS=asgi (пул БД 10+10 на процесс).
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import create_app
+from app.aio import AsgiDispatcher
+
+flask_app = create_app()
+app = AsgiDispatcher(flask_app)
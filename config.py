@@ -1,6 +1,82 @@
 import os
 import tempfile
 
+
+# Размеры пула соединений (pool_size, max_overflow) на один процесс-воркер.
+# Sync-воркер обслуживает один запрос за раз, потоковым и асинхронным нужен
+# пул под число одновременных запросов.
+POOL_PROFILES = {
+    'sync': (2, 3),
+    'gthread': (int(os.environ.get('GUNICORN_THREADS', 4)), 2),
+    'gevent': (10, 20),
+    'asgi': (10, 10),
+}
+
+
+def build_engine_options(database_url):
+    """Собирает SQLALCHEMY_ENGINE_OPTIONS из переменных окружения.
+
+    DB_WORKER_CLASS      профиль пула: sync, gthread, gevent, asgi
+    DB_POOL_SIZE         переопределяет pool_size профиля
+    DB_MAX_OVERFLOW      переопределяет max_overflow профиля
+    DB_POOL_RECYCLE      пересоздавать соединение старше N секунд (1800)
+    DB_POOL_TIMEOUT      ожидание свободного соединения, секунд (10)
+    DB_STATEMENT_TIMEOUT statement_timeout в мс, 0 - без ограничения (30000)
+    DB_PGBOUNCER         1 - режим transaction pooling за pgbouncer
+    """
+    if not database_url.startswith('postgresql'):
+        return {'pool_pre_ping': True}
+
+    worker_class = os.environ.get('DB_WORKER_CLASS', 'sync')
+    pool_size, max_overflow = POOL_PROFILES.get(worker_class, POOL_PROFILES['sync'])
+
+    options = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', pool_size)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', max_overflow)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        # Проверяем соединение перед выдачей из пула: после failover БД
+        # мёртвые соединения отбрасываются вместо 500-й ошибки
+        'pool_pre_ping': True,
+    }
+
+    connect_args = {}
+    statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT', 30000))
+    if os.environ.get('DB_PGBOUNCER') == '1':
+        # pgbouncer в режиме transaction pooling не умеет server-side
+        # prepared statements и startup-параметр options: отключаем подготовку
+        # запросов psycopg3, а statement_timeout задаём на роли в БД
+        # (ALTER ROLE ... SET statement_timeout = ...)
+        connect_args['prepare_threshold'] = None
+    elif statement_timeout:
+        connect_args['options'] = f'-c statement_timeout={statement_timeout}'
+    options['connect_args'] = connect_args
+    return options
+
+
+def normalize_database_url(database_url):
+    """Приводит postgres:// и postgresql:// к диалекту psycopg3"""
+    if database_url.startswith("postgres://"):
+        return database_url.replace("postgres://", "postgresql+psycopg://", 1)
+    if database_url.startswith("postgresql://"):
+        return database_url.replace("postgresql://", "postgresql+psycopg://", 1)
+    return database_url
+
+
+def build_replica_binds(replica_urls):
+    """SQLALCHEMY_BINDS для реплик из DATABASE_REPLICA_URLS (через запятую)"""
+    binds = {}
+    urls = [url.strip() for url in replica_urls.split(',') if url.strip()]
+    for i, url in enumerate(urls):
+        url = normalize_database_url(url)
+        options = build_engine_options(url)
+        if url.startswith('postgresql'):
+            # Недоступная реплика не должна подвешивать запрос
+            options['connect_args']['connect_timeout'] = 2
+        binds[f'replica_{i}'] = {'url': url, **options}
+    return binds
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-123'
 
@@ -12,13 +88,7 @@ class Config:
         database_url = os.environ.get('DATABASE_URL', '')
         
         # Исправляем URL и добавляем диалект для psycopg3
-        if database_url.startswith("postgres://"):
-            database_url = database_url.replace("postgres://", "postgresql+psycopg://", 1)
-        elif database_url.startswith("postgresql://"):
-            # Меняем диалект на psycopg3
-            database_url = database_url.replace("postgresql://", "postgresql+psycopg://", 1)
-        
-        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_DATABASE_URI = normalize_database_url(database_url)
         DEBUG = False
         
         # В продакшене используем временную папку (лучше настроить S3 в будущем)
@@ -32,6 +102,14 @@ class Config:
         UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'static', 'uploads')
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = build_engine_options(SQLALCHEMY_DATABASE_URI)
+    # Реплики для чтения (см. app/db_routing.py)
+    SQLALCHEMY_BINDS = build_replica_binds(os.environ.get('DATABASE_REPLICA_URLS', ''))
+    REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 1.0))
+    REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5.0))
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+    # Базовое имя в pg_stat_activity; к нему добавляется pid воркера
+    DB_APPLICATION_NAME = os.environ.get('DB_APPLICATION_NAME', 'flask_inventory')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
@@ -48,5 +126,95 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD') or '!Mat604192'
     MAIL_DEFAULT_SENDER = 'no-reply@asauda.ru'
 
+    # Мониторинг: фоновый сборщик метрик (см. app/infra_sampler.py)
+    MONITORING_SAMPLE_INTERVAL = int(os.environ.get('MONITORING_SAMPLE_INTERVAL', 5))
+    MONITORING_HISTORY_SIZE = int(os.environ.get('MONITORING_HISTORY_SIZE', 120))
+    MONITORING_DISK_PATH = os.environ.get('MONITORING_DISK_PATH', '/')
+
+    # Импорт локаций крупнее этого размера выполняется фоновой задачей
+    LOCATION_IMPORT_BACKGROUND_BYTES = int(os.environ.get('LOCATION_IMPORT_BACKGROUND_BYTES', 256 * 1024))
+
+    # Сколько секунд воркер держит в памяти дерево категорий со счётчиками
+    CATALOG_STATS_TTL = int(os.environ.get('CATALOG_STATS_TTL', 60))
+
+    # Товаров на странице каталога
+    CATALOG_PER_PAGE = int(os.environ.get('CATALOG_PER_PAGE', 60))
+
+    # Кабинет продавца: товаров на странице и порог «скоро истекают» (дней)
+    DASHBOARD_PER_PAGE = int(os.environ.get('DASHBOARD_PER_PAGE', 24))
+    DASHBOARD_EXPIRING_DAYS = int(os.environ.get('DASHBOARD_EXPIRING_DAYS', 3))
+    # Массовые действия кабинета: сколько id можно передать списком
+    BULK_ACTION_MAX_IDS = int(os.environ.get('BULK_ACTION_MAX_IDS', 1000))
+
+    # JSON API (/api/v1): товаров на странице по умолчанию и максимум (?limit=),
+    # max-age ответов для клиентов и прокси (дальше - условный запрос по ETag)
+    API_PER_PAGE = int(os.environ.get('API_PER_PAGE', 50))
+    API_MAX_PER_PAGE = int(os.environ.get('API_MAX_PER_PAGE', 200))
+    API_CACHE_MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE', 30))
+
+    # Время жизни индекса координат городов в памяти воркера (без PostGIS)
+    GEO_INDEX_TTL = int(os.environ.get('GEO_INDEX_TTL', 300))
+
+    # Кеш HTML карточек товаров (app/fragment_cache.py): memory:// - LRU
+    # в памяти воркера, redis://host:6379/0 - общий для всех воркеров, off - выключен
+    FRAGMENT_CACHE_URL = os.environ.get('FRAGMENT_CACHE_URL', 'memory://')
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 5000))
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', 86400))
+
+    # Кеш страниц для гостей (app/page_cache.py): лента и карточка товара.
+    # PAGE_CACHE_TTL - свежесть, PAGE_CACHE_STALE - сколько ещё отдавать
+    # устаревшую копию, пока один запрос её пересобирает
+    PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED') == '1'
+    PAGE_CACHE_URL = os.environ.get('PAGE_CACHE_URL', 'memory://')
+    PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', 2000))
+    PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 30))
+    PAGE_CACHE_STALE = int(os.environ.get('PAGE_CACHE_STALE', 120))
+    PAGE_CACHE_LOCK_SECONDS = int(os.environ.get('PAGE_CACHE_LOCK_SECONDS', 10))
+
+    # Сколько секунд воркер держит в памяти колонки вошедшего пользователя
+    # (app/user_cache.py); 0 - читать из БД на каждый запрос. Кеш работает
+    # только с общими штампами session_version в Redis (USER_CACHE_URL=
+    # redis://host:6379/0); с memory:// он выключен - блокировка и смена роли
+    # в одном воркере не дошли бы до остальных
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 30))
+    USER_CACHE_URL = os.environ.get('USER_CACHE_URL', 'memory://')
+
+    # Хранилище сессий (app/session_store.py): cookie - подписанная cookie Flask,
+    # db - таблица web_session, redis://host:6379/1 - Redis. В серверном режиме
+    # в cookie только id; истёкшие строки web_session чистятся пачками раз в
+    # SESSION_PURGE_INTERVAL секунд каждым воркером и `flask purge-sessions`
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cookie')
+    SESSION_PURGE_INTERVAL = int(os.environ.get('SESSION_PURGE_INTERVAL', 300))
+    # Сколько секунд живёт код капчи в серверном хранилище
+    CAPTCHA_TTL = int(os.environ.get('CAPTCHA_TTL', 600))
+
+    # Внешний адрес сайта для ссылок, которые строятся вне запроса (фиды, sitemap)
+    SITE_URL = os.environ.get('SITE_URL', 'https://asauda.ru').rstrip('/')
+    SITE_NAME = os.environ.get('SITE_NAME', 'ASAUDA')
+    SITE_COMPANY = os.environ.get('SITE_COMPANY', 'ASAUDA')
+
+    # Фиды для агрегаторов (app/feeds.py): каталог файлов и период пересборки
+    # в секундах (0 - только командой `flask generate-feeds`, например из cron)
+    FEED_DIR = os.environ.get('FEED_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'feeds'))
+    FEED_INTERVAL = int(os.environ.get('FEED_INTERVAL', 3600))
+
+    # Шаблоны (app/templating.py). Перечитывать изменённые файлы: 1 / 0, без
+    # значения - только при DEBUG. Каталог кеша байткода ('' - без кеша; заполняет
+    # `flask precompile-templates`) и прогрев шаблонов сайта при create_app
+    TEMPLATES_AUTO_RELOAD = {'1': True, '0': False}.get(os.environ.get('TEMPLATES_AUTO_RELOAD', ''))
+    TEMPLATE_CACHE_DIR = os.environ.get(
+        'TEMPLATE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.jinja_cache')
+    )
+    TEMPLATE_WARMUP = os.environ.get('TEMPLATE_WARMUP', '0' if DEBUG else '1') == '1'
+
+    # Статика (app/assets.py): asset_url() отдаёт собранные `flask build-assets`
+    # файлы из static/dist по manifest.json; 0 - исходники из static/ (разработка)
+    ASSETS_USE_MANIFEST = os.environ.get('ASSETS_USE_MANIFEST', '0' if DEBUG else '1') == '1'
+
+    # ASGI-режим (asgi.py): потоки для синхронных представлений и пул httpx
+    ASGI_SYNC_THREADS = int(os.environ.get('ASGI_SYNC_THREADS', 10))
+    ASGI_HTTP_MAX_CONNECTIONS = int(os.environ.get('ASGI_HTTP_MAX_CONNECTIONS', 100))
+    ASGI_HTTP_TIMEOUT = float(os.environ.get('ASGI_HTTP_TIMEOUT', 10.0))
+
     # DaData API
     DADATA_API_KEY = os.environ.get('DADATA_API_KEY') or '101eb3d6682561b0db5bf155c592a3f8dad52dcf'
\ No newline at end of file
@@ -0,0 +1,47 @@
+# gunicorn.conf.py
+# Запуск: gunicorn -c gunicorn.conf.py wsgi:app
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+# Асинхронный режим: GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker и
+# точка входа asgi:app (см. asgi.py)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+# preload_app: приложение импортируется один раз в мастере, воркеры
+# получают его через fork (copy-on-write) - быстрый старт и перезапуск
+# воркеров, меньше памяти. create_app не делает I/O, поэтому это безопасно.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def _telegram_bot():
+    """Бот с настройками из config.Config (в мастере приложение может быть не загружено)"""
+    from flask import Flask
+    from app.telegram_bot import telegram_bot
+    if not telegram_bot.token:
+        config_app = Flask(__name__)
+        config_app.config.from_object('config.Config')
+        telegram_bot.init_app(config_app)
+    return telegram_bot
+
+
+def when_ready(server):
+    """Мастер готов принимать соединения - одно уведомление на запуск"""
+    _telegram_bot().send_startup_notification()
+
+
+def post_fork(server, worker):
+    """Соединения из пула мастера не должны делиться между воркерами"""
+    if server.app.cfg.preload_app:
+        from app import db
+        # Под uvicorn-воркером wsgi() возвращает ASGI-обёртку над Flask
+        flask_app = getattr(server.app.wsgi(), 'flask_app', server.app.wsgi())
+        with flask_app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+
+def on_exit(server):
+    _telegram_bot().send_shutdown_notification()
@@ -0,0 +1,46 @@
+"""Add coordinates to city
+
+Revision ID: a9b0c1d2e3f4
+Revises: f7a8b9c0d1e2
+Create Date: 2026-10-19 13:02:44.350871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9b0c1d2e3f4'
+down_revision = 'f7a8b9c0d1e2'
+branch_labels = None
+depends_on = None
+
+
+def _has_postgis(bind):
+    return bind.dialect.name == 'postgresql' and bind.execute(
+        sa.text("SELECT 1 FROM pg_extension WHERE extname = 'postgis'")
+    ).first() is not None
+
+
+def upgrade():
+    with op.batch_alter_table('city', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+
+    # Пространственный индекс - только если PostGIS установлен
+    # (иначе app/geo.py использует индекс в памяти)
+    if _has_postgis(op.get_bind()):
+        op.execute("""
+            CREATE INDEX ix_city_geog ON city USING gist (
+                (geography(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)))
+            )
+        """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_city_geog')
+
+    with op.batch_alter_table('city', schema=None) as batch_op:
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
@@ -0,0 +1,79 @@
+"""Add unique keys for bulk location import
+
+Revision ID: b1c4e2a9d301
+Revises: 8a7b461332ff
+Create Date: 2026-10-19 10:12:41.208114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1c4e2a9d301'
+down_revision = '8a7b461332ff'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Сливаем дубликаты регионов верхнего уровня в регион с минимальным id
+    op.execute("""
+        UPDATE city SET region_id = (
+            SELECT MIN(r2.id) FROM region r1
+            JOIN region r2 ON r2.name = r1.name AND r2.parent_id IS NULL
+            WHERE r1.id = city.region_id AND r1.parent_id IS NULL
+        )
+        WHERE region_id IN (SELECT id FROM region WHERE parent_id IS NULL)
+    """)
+    op.execute("""
+        UPDATE product SET region_id = (
+            SELECT MIN(r2.id) FROM region r1
+            JOIN region r2 ON r2.name = r1.name AND r2.parent_id IS NULL
+            WHERE r1.id = product.region_id AND r1.parent_id IS NULL
+        )
+        WHERE region_id IN (SELECT id FROM region WHERE parent_id IS NULL)
+    """)
+    op.execute("""
+        UPDATE region SET parent_id = (
+            SELECT MIN(r2.id) FROM region r1
+            JOIN region r2 ON r2.name = r1.name AND r2.parent_id IS NULL
+            WHERE r1.id = region.parent_id AND r1.parent_id IS NULL
+        )
+        WHERE parent_id IN (SELECT id FROM region WHERE parent_id IS NULL)
+    """)
+    op.execute("""
+        DELETE FROM region
+        WHERE parent_id IS NULL
+          AND id NOT IN (SELECT MIN(id) FROM region WHERE parent_id IS NULL GROUP BY name)
+    """)
+
+    # Сливаем дубликаты городов внутри региона
+    op.execute("""
+        UPDATE product SET city_id = (
+            SELECT MIN(c2.id) FROM city c1
+            JOIN city c2 ON c2.name = c1.name AND c2.region_id = c1.region_id
+            WHERE c1.id = product.city_id
+        )
+        WHERE city_id IS NOT NULL
+    """)
+    op.execute("""
+        DELETE FROM city
+        WHERE id NOT IN (SELECT MIN(id) FROM city GROUP BY name, region_id)
+    """)
+
+    with op.batch_alter_table('city', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_city_name_region', ['name', 'region_id'])
+
+    op.create_index(
+        'uq_region_root_name', 'region', ['name'], unique=True,
+        postgresql_where=sa.text('parent_id IS NULL'),
+        sqlite_where=sa.text('parent_id IS NULL')
+    )
+
+
+def downgrade():
+    op.drop_index('uq_region_root_name', table_name='region')
+
+    with op.batch_alter_table('city', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_city_name_region', type_='unique')
@@ -0,0 +1,37 @@
+"""Add category_product_count summary table
+
+Revision ID: d2e3f4a5b6c7
+Revises: c7d8e9f0a1b2
+Create Date: 2026-10-19 11:05:17.482913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2e3f4a5b6c7'
+down_revision = 'c7d8e9f0a1b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('category_product_count',
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('published', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['category.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('category_id')
+    )
+
+    # Начальное заполнение из текущих товаров (status = 1 - опубликован)
+    op.execute("""
+        INSERT INTO category_product_count (category_id, published)
+        SELECT category_id, COUNT(*) FROM product
+        WHERE status = 1
+        GROUP BY category_id
+    """)
+
+
+def downgrade():
+    op.drop_table('category_product_count')
@@ -0,0 +1,31 @@
+"""Add product indexes for catalog listing and facet counts
+
+Revision ID: e5f6a7b8c9d0
+Revises: d2e3f4a5b6c7
+Create Date: 2026-10-19 11:48:52.913406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f6a7b8c9d0'
+down_revision = 'd2e3f4a5b6c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_status_created', ['status', 'created_at'], unique=False)
+        batch_op.create_index(
+            'ix_product_facets', ['status', 'category_id'], unique=False,
+            postgresql_include=['price', 'condition', 'delivery', 'vat_included', 'price_type', 'manufacturer']
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_facets')
+        batch_op.drop_index('ix_product_status_created')
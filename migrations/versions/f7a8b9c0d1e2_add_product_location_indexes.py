@@ -0,0 +1,28 @@
+"""Add product indexes for location filtering
+
+Revision ID: f7a8b9c0d1e2
+Revises: e5f6a7b8c9d0
+Create Date: 2026-10-19 12:26:03.117592
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7a8b9c0d1e2'
+down_revision = 'e5f6a7b8c9d0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_region_status_created', ['region_id', 'status', 'created_at'], unique=False)
+        batch_op.create_index('ix_product_city_status_created', ['city_id', 'status', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_city_status_created')
+        batch_op.drop_index('ix_product_region_status_created')
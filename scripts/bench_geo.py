@@ -0,0 +1,102 @@
+# bench_geo.py
+"""Замер поиска «в радиусе N км» (app/geo.py).
+
+1) Индекс в памяти против полного перебора на синтетических городах:
+
+    python scripts/bench_geo.py --points 50000
+
+2) Каталог: фильтр по городу (как раньше) против фильтра по радиусу на
+   текущей базе (нужны координаты: flask load-city-coordinates):
+
+    DATABASE_URL=... python scripts/bench_geo.py --city-id 12 --radius 100
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.geo import GeoIndex, haversine_km
+
+QUERIES = [(55.75, 37.62, 50), (55.75, 37.62, 300), (56.84, 60.61, 100), (43.12, 131.89, 500)]
+
+
+def median_ms(func, runs):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), result
+
+
+def bench_index(points, runs):
+    random.seed(42)
+    # Города в границах России
+    data = [(i, random.uniform(41.0, 78.0), random.uniform(19.0, 180.0)) for i in range(points)]
+    t0 = time.perf_counter()
+    index = GeoIndex(data)
+    print(f"  построение индекса: {(time.perf_counter() - t0) * 1000:.1f} мс на {points} точек")
+    print(f"  {'запрос':<24} {'индекс, мс':>12} {'перебор, мс':>12} {'найдено':>9}")
+    for lat, lon, radius in QUERIES:
+        index_ms, found = median_ms(lambda: index.within(lat, lon, radius), runs)
+        brute_ms, brute = median_ms(
+            lambda: [p for p in data if haversine_km(lat, lon, p[1], p[2]) <= radius], runs
+        )
+        mark = '' if len(found) == len(brute) else '  ❌ расхождение'
+        print(f"  {f'{lat},{lon} r={radius}':<24} {index_ms:>12.2f} {brute_ms:>12.2f} {len(found):>9}{mark}")
+
+
+def bench_catalog(city_id, radius, runs):
+    from werkzeug.datastructures import MultiDict
+    from app import create_app, db
+    from app.models import Product
+    from app.catalog_search import search_catalog, location_criteria, nearby_criteria, distance_order
+
+    app = create_app()
+    with app.app_context():
+        base = [Product.status == Product.STATUS_PUBLISHED]
+        exact_ms, exact = median_ms(
+            lambda: search_catalog(base + [location_criteria(f'city_{city_id}')], MultiDict()), runs
+        )
+        criteria, distances = nearby_criteria(f'city_{city_id}', radius)
+        if criteria is None:
+            print("  ❌ У города нет координат (flask load-city-coordinates)")
+            return 1
+        near_ms, near = median_ms(
+            lambda: search_catalog(base + [nearby_criteria(f'city_{city_id}', radius)[0]], MultiDict()), runs
+        )
+        sort_ms, _ = median_ms(
+            lambda: search_catalog(base + [criteria], MultiDict(), order_by=[distance_order(distances)]), runs
+        )
+        db.session.rollback()
+    print(f"  только город:              {exact_ms:8.1f} мс, товаров {exact.total}")
+    print(f"  радиус {radius:>5} км ({len(distances):>4} гор.): {near_ms:8.1f} мс, товаров {near.total}")
+    print(f"  радиус + по расстоянию:    {sort_ms:8.1f} мс")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--points', type=int, default=20000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--city-id', type=int, default=None)
+    parser.add_argument('--radius', type=float, default=100)
+    args = parser.parse_args()
+
+    print("🌍 ЗАМЕР ГЕОПОИСКА")
+    print("=" * 60)
+    bench_index(args.points, args.runs)
+    code = 0
+    if args.city_id:
+        print("-" * 60)
+        code = bench_catalog(args.city_id, args.radius, args.runs)
+    print("=" * 60)
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+# bench_listing.py
+"""Замер модели чтения списков (app/listing.py) против ORM-объектов Product.
+
+Сравниваются два способа получить --cards карточек:
+  ORM   - Product.query + joinedload(product_category), как раньше в ленте;
+  rows  - listing_select() -> ProductRow (колонки карточки, отрывок описания).
+
+Для каждого - медиана времени запроса с материализацией и память
+(tracemalloc: пик и сколько занимает готовый список).
+
+Если товаров меньше --cards, добавьте их (заголовок 'bench-', с описанием
+--description-size символов) на отдельной базе:
+
+    DATABASE_URL=... python scripts/bench_listing.py --seed 5000
+    DATABASE_URL=... python scripts/bench_listing.py --cards 1000 --runs 5
+    DATABASE_URL=... python scripts/bench_listing.py --cleanup
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, delete
+from sqlalchemy.orm import joinedload
+
+from app import create_app, db
+from app.models import Product, Category, User
+from app.listing import listing_select, load_rows
+
+WORDS = ['станок', 'привод', 'подшипник', 'кабель', 'редуктор', 'насос', 'остатки', 'склад', 'партия', 'новый']
+
+
+def seed(count, description_size, batch=5000):
+    user = User.query.filter_by(role='admin').first() or User.query.first()
+    category_ids = [c.id for c in Category.query.all()]
+    if not user or not category_ids:
+        print("❌ Нужны хотя бы один пользователь и категория (flask bootstrap)")
+        return False
+
+    now = datetime.utcnow()
+    print(f"📦 Генерируем {count} товаров...")
+    for start in range(0, count, batch):
+        rows = []
+        for i in range(start, min(start + batch, count)):
+            description = ' '.join(random.choice(WORDS) for _ in range(description_size // 7))
+            rows.append({
+                'title': f'bench-{i}',
+                'description': description[:description_size],
+                'price': round(random.uniform(100, 100000), 2),
+                'category_id': random.choice(category_ids),
+                'user_id': user.id,
+                'images': [f'bench_{i}_{n}.jpg' for n in range(random.randint(0, 6))],
+                'status': Product.STATUS_PUBLISHED,
+                'created_at': now - timedelta(minutes=i),
+                'updated_at': now - timedelta(minutes=i),
+                'region': 'Московская область',
+                'city': 'Москва',
+            })
+        db.session.execute(insert(Product), rows)
+        db.session.commit()
+    print("  ✅ Готово")
+    return True
+
+
+def load_orm(cards):
+    return (
+        Product.query.options(joinedload(Product.product_category))
+        .filter(Product.status == Product.STATUS_PUBLISHED)
+        .order_by(Product.created_at.desc(), Product.id.desc())
+        .limit(cards)
+        .all()
+    )
+
+
+def load_listing(cards):
+    return load_rows(
+        listing_select(Product.status == Product.STATUS_PUBLISHED)
+        .order_by(Product.created_at.desc(), Product.id.desc())
+        .limit(cards)
+    )
+
+
+def measure(loader, cards, runs):
+    """(медиана мс, пик КБ, удерживается КБ, строк)"""
+    samples = []
+    for _ in range(runs):
+        db.session.expunge_all()
+        t0 = time.perf_counter()
+        items = loader(cards)
+        # Поля, которые читает карточка
+        for item in items:
+            item.title, item.price, item.first_image, item.created_at, item.status_text
+        samples.append((time.perf_counter() - t0) * 1000)
+        del items
+
+    db.session.expunge_all()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    items = loader(cards)
+    for item in items:
+        item.first_image, item.status_text
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return statistics.median(samples), peak / 1024, retained / 1024, len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cards', type=int, default=1000, help='карточек в замере')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0, help='сгенерировать столько товаров')
+    parser.add_argument('--description-size', type=int, default=2000, help='длина описания сгенерированных товаров')
+    parser.add_argument('--cleanup', action='store_true', help='удалить сгенерированные товары')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.cleanup:
+            deleted = db.session.execute(delete(Product).where(Product.title.like('bench-%'))).rowcount
+            db.session.commit()
+            print(f"🧹 Удалено {deleted} товаров")
+            return 0
+        if args.seed and not seed(args.seed, args.description_size):
+            return 1
+
+        print(f"🔍 СПИСОК ИЗ {args.cards} КАРТОЧЕК")
+        print("=" * 70)
+        print(f"{'способ':<8} {'мс':>10} {'пик, КБ':>12} {'держит, КБ':>14} {'строк':>8}")
+        results = {}
+        for name, loader in (('ORM', load_orm), ('rows', load_listing)):
+            results[name] = measure(loader, args.cards, args.runs)
+            ms, peak, retained, count = results[name]
+            print(f"{name:<8} {ms:>10.1f} {peak:>12.0f} {retained:>14.0f} {count:>8}")
+        print("=" * 70)
+
+        orm, rows = results['ORM'], results['rows']
+        count = max(rows[3], 1)
+        per_1000 = 1000 / count
+        print(f"  На 1000 карточек: -{(orm[0] - rows[0]) * per_1000:.1f} мс, "
+              f"-{(orm[2] - rows[2]) * per_1000:.0f} КБ памяти "
+              f"({orm[0] / rows[0] if rows[0] else 0:.1f}x быстрее)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+# bench_startup.py
+"""Замер времени импорта и создания приложения (старт/перезапуск воркера).
+
+Каждый прогон - отдельный процесс, чтобы не мерить тёплый кэш модулей:
+
+    python scripts/bench_startup.py --runs 10 --max-ms 1500
+
+С --max-ms скрипт завершается с кодом 1, если медиана превышает порог
+(удобно для CI). Для разбивки по модулям: python -X importtime wsgi.py
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import time
+t0 = time.perf_counter()
+import app as package
+t1 = time.perf_counter()
+application = package.create_app()
+t2 = time.perf_counter()
+print(f"{(t1 - t0) * 1000:.1f} {(t2 - t1) * 1000:.1f}")
+"""
+
+
+def run_once():
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    import_ms, create_ms = result.stdout.strip().splitlines()[-1].split()
+    return float(import_ms), float(create_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    print("⏱️ ЗАМЕР СТАРТА ПРИЛОЖЕНИЯ")
+    print("=" * 50)
+    samples = [run_once() for _ in range(args.runs)]
+    import_ms = statistics.median(s[0] for s in samples)
+    create_ms = statistics.median(s[1] for s in samples)
+    total_ms = import_ms + create_ms
+    print(f"  import app:   {import_ms:8.1f} мс (медиана из {args.runs})")
+    print(f"  create_app(): {create_ms:8.1f} мс")
+    print(f"  итого:        {total_ms:8.1f} мс")
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"  ❌ Превышен порог {args.max_ms} мс")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+# bench_templates.py
+"""Замер профилей шаблонов (app/templating.py): первый запрос нового воркера
+и CPU на рендер страницы.
+
+Каждый профиль - отдельный процесс (как новый воркер gunicorn):
+  dev        TEMPLATES_AUTO_RELOAD=1, без кеша байткода и прогрева (как было)
+  prod-cold  перечитывание выключено, прогрев, кеш байткода ещё пуст
+  prod       то же с заполненным кешем (после `flask precompile-templates`)
+
+Для каждого - время create_app (с прогревом), время первого запроса к
+каждой странице и медиана процессорного времени последующих запросов
+(--runs). Соединение с БД открывается до замера, чтобы не смешивать его
+с компиляцией шаблонов.
+
+    DATABASE_URL=... python scripts/bench_templates.py
+    DATABASE_URL=... python scripts/bench_templates.py --runs 50 --url / --url /help
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILES = [
+    ('dev', {'TEMPLATES_AUTO_RELOAD': '1', 'TEMPLATE_CACHE_DIR': '', 'TEMPLATE_WARMUP': '0'}),
+    ('prod-cold', {'TEMPLATES_AUTO_RELOAD': '0', 'TEMPLATE_WARMUP': '1'}),
+    ('prod', {'TEMPLATES_AUTO_RELOAD': '0', 'TEMPLATE_WARMUP': '1'}),
+]
+
+PROBE = """
+import sys, json, time, statistics
+t0 = time.perf_counter()
+from app import create_app, db
+from app.models import Product
+from sqlalchemy import select, text
+app = create_app()
+create_ms = (time.perf_counter() - t0) * 1000
+urls, runs = json.loads(sys.argv[1]), int(sys.argv[2])
+with app.app_context():
+    db.session.execute(text('SELECT 1'))
+    product_id = db.session.scalar(
+        select(Product.id).where(Product.status == Product.STATUS_PUBLISHED).order_by(Product.id).limit(1)
+    )
+    db.session.remove()
+if product_id:
+    urls.append(f'/product/{product_id}')
+client = app.test_client()
+result = {'create_ms': create_ms, 'warmup': app.extensions.get('template_warmup'), 'pages': {}}
+for url in urls:
+    t = time.perf_counter()
+    status = client.get(url).status_code
+    first_ms = (time.perf_counter() - t) * 1000
+    samples = []
+    for _ in range(runs):
+        c = time.process_time()
+        client.get(url)
+        samples.append((time.process_time() - c) * 1000)
+    result['pages'][url] = {'status': status, 'first_ms': first_ms, 'cpu_ms': statistics.median(samples)}
+print(json.dumps(result))
+"""
+
+
+def run_profile(env_overrides, urls, runs):
+    env = dict(os.environ, **env_overrides)
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE, json.dumps(urls), str(runs)],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise SystemExit(f"❌ Профиль завершился с кодом {result.returncode}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', action='append', help='Страница для замера (по умолчанию / и /help)')
+    parser.add_argument('--runs', type=int, default=20, help='Запросов для медианы CPU')
+    args = parser.parse_args()
+    urls = args.url or ['/', '/help']
+
+    print("⏱️ ЗАМЕР ПРОФИЛЕЙ ШАБЛОНОВ")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory(prefix='jinja-bench-') as cache_dir:
+        results = {}
+        for name, overrides in PROFILES:
+            overrides = dict(overrides)
+            overrides.setdefault('TEMPLATE_CACHE_DIR', cache_dir)
+            results[name] = run_profile(overrides, list(urls), args.runs)
+
+    for name, result in results.items():
+        warmup = result['warmup']
+        warmup_text = f", прогрев {warmup['templates']} шаблонов за {warmup['ms']} мс" if warmup else ''
+        print(f"\n📋 {name}: create_app {result['create_ms']:.0f} мс{warmup_text}")
+        for url, page in result['pages'].items():
+            print(f"  {url:<24} HTTP {page['status']}  первый запрос {page['first_ms']:8.1f} мс"
+                  f"  CPU на рендер {page['cpu_ms']:6.2f} мс")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
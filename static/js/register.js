@@ -27,7 +27,10 @@ document.addEventListener('DOMContentLoaded', function () {
                     'Content-Type': 'application/json',
                     'X-CSRFToken': csrfToken
                 },
-                body: JSON.stringify({ captcha: captchaValue })
+                body: JSON.stringify({
+                    captcha: captchaValue,
+                    captcha_id: document.getElementById('register-captcha-id').value
+                })
             })
                 .then(response => response.json())
                 .then(data => {